@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import logging
+import pathlib
+import sqlite3
+from contextlib import closing
+from dataclasses import dataclass
+from datetime import UTC, datetime
+
+import pandas as pd
+
+from .alerts import ALERT_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+DELTA_COLUMNS = ["status", *ALERT_COLUMNS, "first_seen"]
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    run_at TEXT NOT NULL,
+    n_alerts INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS alerts (
+    run_id INTEGER NOT NULL,
+    code TEXT NOT NULL,
+    sku TEXT NOT NULL,
+    severity TEXT,
+    message TEXT,
+    metric REAL,
+    asof TEXT,
+    status TEXT,
+    first_seen TEXT,
+    PRIMARY KEY (run_id, code, sku)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS runs_at ON runs (run_at);
+'''
+
+# The incoming alerts of run :run, flagged against run :prev by (code, sku):
+# persisting ones keep their first_seen, new ones start at this run. Inserted
+# in key order, so the (run_id, code, sku) primary key grows by appends.
+_INSERT = '''
+INSERT INTO alerts (run_id, code, sku, severity, message, metric, asof, status, first_seen)
+SELECT :run, i.code, i.sku, i.severity, i.message, i.metric, i.asof,
+    CASE WHEN p.first_seen IS NULL THEN 'new' ELSE 'persisting' END, COALESCE(p.first_seen, :run_at)
+FROM incoming i LEFT JOIN alerts p ON p.run_id = :prev AND p.code = i.code AND p.sku = i.sku
+ORDER BY i.code, i.sku
+'''
+
+# New rows of run :run; resolved ones are the previous run's keys missing
+# from the incoming alerts.
+_DELTA = '''
+SELECT status, code, severity, sku, message, metric, asof, first_seen
+FROM alerts WHERE run_id = :run AND status = 'new'
+UNION ALL
+SELECT 'resolved', code, severity, sku, message, metric, asof, first_seen
+FROM alerts a WHERE run_id = :prev
+    AND NOT EXISTS (SELECT 1 FROM incoming i WHERE i.code = a.code AND i.sku = a.sku)
+'''
+
+
+@dataclass(frozen=True)
+class AlertHistory:
+    '''
+    SQLite store of the alerts of every run, one per (run, code, sku) (an
+    alert raised twice in a run, e.g. from a duplicated stock row, is kept
+    once), indexed by that key and run timestamp. `record` bulk-inserts a run and flags its alerts against
+    the previous run in the database with indexed set operations: new,
+    persisting (first_seen kept) or resolved. Only the last `keep_runs`
+    runs are kept. A connection is opened per call, so the store can be
+    shared by successive runs and processes (SQLite serialises writers).
+    '''
+
+    path: pathlib.Path
+    keep_runs: int = 90
+
+    def __post_init__(self) -> None:
+        if self.keep_runs < 2:
+            raise ValueError(f"keep_runs must be at least 2 (the previous run is needed), got {self.keep_runs}")
+        object.__setattr__(self, "path", pathlib.Path(self.path))
+
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        return conn
+
+    def record(self, alerts: pd.DataFrame, run_at: datetime | None = None) -> pd.DataFrame:
+        '''
+        Store `alerts` (ALERT_COLUMNS) as a new run and return the delta with
+        the previous run: its new alerts and the resolved ones (as last
+        seen), as DELTA_COLUMNS.
+        '''
+        stamp = (run_at or datetime.now(UTC)).isoformat(timespec="seconds")
+        asof = pd.to_datetime(alerts["asof"]).dt.strftime("%Y-%m-%d")
+        metric = pd.to_numeric(alerts["metric"]).astype(float)
+        rows = pd.DataFrame(
+            {
+                "code": alerts["code"].astype(str),
+                "sku": alerts["sku"].astype(str),
+                "severity": alerts["severity"].astype(str),
+                "message": alerts["message"].astype(str),
+                "metric": metric.astype(object).where(metric.notna(), None),
+                "asof": asof.astype(object).where(asof.notna(), None),
+            }
+        ).drop_duplicates(["code", "sku"], ignore_index=True)
+        with closing(self._connect()) as conn, conn:
+            run = conn.execute("INSERT INTO runs (run_at, n_alerts) VALUES (?, ?)", (stamp, len(rows))).lastrowid
+            prev = conn.execute("SELECT MAX(run_id) FROM runs WHERE run_id < ?", (run,)).fetchone()[0]
+            conn.execute("CREATE TEMP TABLE incoming (code, sku, severity, message, metric, asof)")
+            conn.executemany("INSERT INTO incoming VALUES (?, ?, ?, ?, ?, ?)", rows.itertuples(index=False, name=None))
+            conn.execute("CREATE UNIQUE INDEX temp.incoming_key ON incoming (code, sku)")
+            params = {"run": run, "prev": prev if prev is not None else -1, "run_at": stamp}
+            conn.execute(_INSERT, params)
+            delta = pd.DataFrame(conn.execute(_DELTA, params).fetchall(), columns=DELTA_COLUMNS)
+            pruned = self._prune(conn)
+        delta = delta.sort_values(["status", "severity", "code", "metric", "sku"], kind="stable", ignore_index=True)
+        logger.info(
+            "event=alert_history run=%s new=%s resolved=%s pruned_runs=%s",
+            run,
+            int((delta["status"] == "new").sum()),
+            int((delta["status"] == "resolved").sum()),
+            pruned,
+        )
+        return delta
+
+    def _prune(self, conn: sqlite3.Connection) -> int:
+        'Drop the runs (and their alerts) older than the last keep_runs.'
+        cutoff = conn.execute(
+            "SELECT run_id FROM runs ORDER BY run_id DESC LIMIT 1 OFFSET ?", (self.keep_runs - 1,)
+        ).fetchone()
+        if cutoff is None:
+            return 0
+        conn.execute("DELETE FROM alerts WHERE run_id < ?", cutoff)
+        return conn.execute("DELETE FROM runs WHERE run_id < ?", cutoff).rowcount
+
+    def runs(self) -> pd.DataFrame:
+        'Stored runs (run_id, run_at, n_alerts), oldest first.'
+        with closing(self._connect()) as conn:
+            return pd.read_sql_query("SELECT run_id, run_at, n_alerts FROM runs ORDER BY run_id", conn)
+
+    def alerts(self, run_id: int | None = None) -> pd.DataFrame:
+        'Alerts of one stored run (default: the last one), by (code, sku), with their status and first_seen.'
+        with closing(self._connect()) as conn:
+            return pd.read_sql_query(
+                "SELECT status, code, severity, sku, message, metric, asof, first_seen FROM alerts "
+                "WHERE run_id = COALESCE(?, (SELECT MAX(run_id) FROM runs)) ORDER BY code, sku",
+                conn,
+                params=(run_id,),
+            )
@@ -1,12 +1,18 @@
 from __future__ import annotations
 
-from collections.abc import Callable
-from dataclasses import dataclass
+import inspect
+import json
+import pathlib
+from collections.abc import Callable, Mapping, Sequence
+from dataclasses import dataclass, field
 from datetime import date
+from typing import Any
 
 import numpy as np
 import pandas as pd
 
+ALERT_COLUMNS = ["code", "severity", "sku", "message", "metric", "asof"]
+
 
 @dataclass(frozen=True)
 class Alert:
@@ -18,74 +24,253 @@ class Alert:
     asof: date | None = None
 
 
-Rule = Callable[..., list[Alert]]
+# A rule takes its input frame plus keyword thresholds and returns alert rows
+# (ALERT_COLUMNS). Custom rules may still return a list of Alert.
+Rule = Callable[..., pd.DataFrame | list[Alert]]
+
+
+def _alert_frame(
+    code: str,
+    severity: str | np.ndarray,
+    rows: pd.DataFrame,
+    message: str | pd.Series,
+    metric: pd.Series,
+) -> pd.DataFrame:
+    'One alert per row of `rows`, built column-wise.'
+    return pd.DataFrame(
+        {
+            "code": code,
+            "severity": severity,
+            "sku": rows["sku"].astype(str).to_numpy(),
+            "message": message if isinstance(message, str) else message.to_numpy(),
+            "metric": metric.to_numpy(dtype=float),
+            "asof": rows["snapshot_date"].to_numpy(),
+        },
+        index=pd.RangeIndex(len(rows)),
+        columns=ALERT_COLUMNS,
+    )
 
 
-def rule_low_coverage(coverage: pd.DataFrame, threshold_days: float = 7.0) -> list[Alert]:
+def rule_low_coverage(coverage: pd.DataFrame, threshold_days: float = 7.0) -> pd.DataFrame:
     'Rupture probable: coverage_days < threshold.'
-    alerts: list[Alert] = []
-    df = coverage.replace([np.inf], np.nan).dropna(subset=["coverage_days"])
-    bad = df[df["coverage_days"] < threshold_days].sort_values("coverage_days")
-    for _, r in bad.head(50).iterrows():
-        alerts.append(
-            Alert(
-                code="LOW_COVERAGE",
-                severity="critical" if r["coverage_days"] < (threshold_days / 2) else "warning",
-                sku=str(r["sku"]),
-                message=f"Couverture faible ({r['coverage_days']:.1f} jours)",
-                metric=float(r["coverage_days"]),
-                asof=r["snapshot_date"],
-            )
-        )
-    return alerts
-
-
-def rule_dead_sku(dormant: pd.DataFrame, lookback_days: int = 60) -> list[Alert]:
-    'Référence morte: stock > 0 et 0 vente sur N jours.'
-    alerts: list[Alert] = []
-    for _, r in dormant.head(50).iterrows():
-        alerts.append(
-            Alert(
-                code="DEAD_SKU",
-                severity="warning",
-                sku=str(r["sku"]),
-                message=f"Aucune vente sur {lookback_days}j avec stock>0",
-                metric=float(r["on_hand_qty"]),
-                asof=r["snapshot_date"],
-            )
-        )
-    return alerts
-
-
-def rule_data_quality_issues(issues_df: pd.DataFrame) -> list[Alert]:
+    bad = coverage[coverage["coverage_days"] < threshold_days].sort_values("coverage_days")
+    days = bad["coverage_days"]
+    return _alert_frame(
+        "LOW_COVERAGE",
+        np.where(days < threshold_days / 2, "critical", "warning"),
+        bad,
+        "Couverture faible (" + days.map("{:.1f}".format) + " jours)",
+        days,
+    )
+
+
+def rule_low_coverage_streak(
+    history: pd.DataFrame, threshold_days: float = 7.0, min_snapshots: int = 3
+) -> pd.DataFrame:
+    '''
+    Rupture persistante: coverage_days < threshold sur les N derniers snapshots consécutifs.
+
+    Snapshots are ranked over the whole history: the run ends at the latest
+    snapshot date, and a snapshot the SKU has no stock row at breaks it.
+    '''
+    rank = history["snapshot_date"].rank(method="dense")
+    # One row per (sku, snapshot), its highest coverage: a snapshot is below when all its rows are.
+    df = (
+        history.assign(rank=rank)
+        .sort_values(["sku", "rank", "coverage_days"], na_position="last")
+        .drop_duplicates(["sku", "rank"], keep="last")
+    )
+    below = df[df["coverage_days"] < threshold_days]
+    # A row below is in the run ending at the latest snapshot when every later snapshot has one too.
+    after = below.groupby("sku", observed=True).cumcount(ascending=False)
+    run = below[below["rank"] + after == rank.max()]
+    run = run.assign(streak=run.groupby("sku", observed=True)["rank"].transform("size"))
+    latest = run[run["rank"] == rank.max()]
+    bad = latest[latest["streak"] >= min_snapshots].sort_values("coverage_days")
+    return _alert_frame(
+        "LOW_COVERAGE_STREAK",
+        "critical",
+        bad,
+        f"Couverture < {threshold_days:g} jours sur " + bad["streak"].astype(str) + " snapshots consécutifs",
+        bad["coverage_days"],
+    )
+
+
+def low_coverage_streak_rows(
+    history: pd.DataFrame, threshold_days: float = 7.0, min_snapshots: int = 3
+) -> pd.DataFrame:
+    '''
+    The rows of a coverage history (in snapshot order, as
+    compute_coverage_history returns it) rule_low_coverage_streak depends on,
+    for the same parameters: per SKU, the last snapshot not below the
+    threshold and the ones after it, plus one row of every snapshot date so
+    the rule ranks snapshots as on the whole history. The rule gives the same
+    alerts on them (or on the rows of several such subsets stacked) as on the
+    whole history.
+    '''
+    below = history["coverage_days"] < threshold_days
+    run_id = (~below).groupby(history["sku"], observed=True).cumsum()
+    last_run = run_id == run_id.groupby(history["sku"], observed=True).transform("max")
+    return history[last_run | ~history["snapshot_date"].duplicated()]
+
+
+def lookback_horizons(lookback_days: float | Sequence[float]) -> list[int]:
+    'dead_sku lookback(s) as sorted whole days; JSON configs may spell them 60.0.'
+    days = np.atleast_1d(np.asarray(lookback_days, dtype=float))
+    if (days != np.round(days)).any():
+        raise ValueError(f"dead_sku: lookback_days must be whole days, got {lookback_days}")
+    return sorted({int(d) for d in days})
+
+
+def rule_dead_sku(
+    aging: pd.DataFrame, lookback_days: float | Sequence[float] = 60, critical_days: int | None = None
+) -> pd.DataFrame:
+    '''
+    Référence morte: stock > 0 et 0 vente sur N jours. With several
+    `lookback_days`, each SKU is alerted once, at the longest horizon it is
+    dormant for; horizons >= `critical_days` are critical.
+
+    `aging` is kpis.compute_stock_aging output (dormant_<N>d columns); a
+    compute_dormant_stock frame is accepted for a single horizon.
+    '''
+    horizons = lookback_horizons(lookback_days)
+    if len(horizons) == 1 and f"dormant_{horizons[0]}d" not in aging.columns:
+        horizon = np.full(len(aging), horizons[0])
+    else:
+        horizon = np.zeros(len(aging), dtype=np.int64)
+        for h in horizons:
+            if f"dormant_{h}d" not in aging.columns:
+                raise ValueError(f"dead_sku: no dormant_{h}d column, add {h} to the aging horizons")
+            horizon[aging[f"dormant_{h}d"].to_numpy(dtype=bool)] = h
+    rows = aging.assign(horizon=horizon)[horizon > 0]
+    rows = rows.sort_values(["on_hand_qty", "sku"], ascending=[False, True], kind="stable")
+    critical = rows["horizon"] >= critical_days if critical_days is not None else np.zeros(len(rows), dtype=bool)
+    return _alert_frame(
+        "DEAD_SKU",
+        np.where(critical, "critical", "warning"),
+        rows,
+        "Aucune vente sur " + rows["horizon"].astype(str) + "j avec stock>0",
+        rows["on_hand_qty"],
+    )
+
+
+def rule_data_quality_issues(issues_df: pd.DataFrame) -> pd.DataFrame:
     'Data quality: erreurs/warnings issues lors de la validation.'
-    alerts: list[Alert] = []
     if issues_df.empty or "level" not in issues_df.columns:
-        return alerts
-    errs = issues_df[issues_df["level"] == "error"]
-    if not errs.empty:
-        alerts.append(
-            Alert(
-                code="DATA_QUALITY",
-                severity="critical",
-                sku="*",
-                message=f"{len(errs)} erreur(s) de validation (voir issues.csv)",
-                metric=float(len(errs)),
-            )
-        )
-    return alerts
+        return pd.DataFrame(columns=ALERT_COLUMNS)
+    n_errors = int((issues_df["level"] == "error").sum())
+    if not n_errors:
+        return pd.DataFrame(columns=ALERT_COLUMNS)
+    return pd.DataFrame(
+        [["DATA_QUALITY", "critical", "*", f"{n_errors} erreur(s) de validation (voir issues.csv)", float(n_errors), None]],
+        columns=ALERT_COLUMNS,
+    )
 
 
 DEFAULT_RULES: dict[str, Rule] = {
     "low_coverage": rule_low_coverage,
+    "low_coverage_streak": rule_low_coverage_streak,
     "dead_sku": rule_dead_sku,
     "data_quality": rule_data_quality_issues,
 }
 
+# Pipeline frame each rule reads: coverage | coverage_history | aging | issues.
+RULE_INPUTS: dict[str, str] = {
+    "low_coverage": "coverage",
+    "low_coverage_streak": "coverage_history",
+    "dead_sku": "aging",
+    "data_quality": "issues",
+}
+
+
+@dataclass(frozen=True)
+class RuleConfig:
+    rule: str
+    params: dict[str, Any] = field(default_factory=dict)
+    enabled: bool = True
+
+
+@dataclass(frozen=True)
+class AlertConfig:
+    '''
+    Rules to evaluate, in order, with their thresholds. `max_per_rule` keeps
+    only the first N alerts of each rule (most severe first); None keeps all.
+    '''
+
+    rules: tuple[RuleConfig, ...]
+    max_per_rule: int | None = None
+
+    def params(self, rule: str) -> dict[str, Any]:
+        return next((r.params for r in self.rules if r.rule == rule), {})
+
+
+DEFAULT_ALERT_CONFIG = AlertConfig(
+    rules=(
+        RuleConfig("low_coverage", {"threshold_days": 7.0}),
+        # Off by default: it needs the whole coverage history (see alerts.example.json to turn it on).
+        RuleConfig("low_coverage_streak", {"threshold_days": 7.0, "min_snapshots": 3}, enabled=False),
+        RuleConfig("dead_sku", {"lookback_days": 60}),
+        RuleConfig("data_quality"),
+    )
+)
+
+
+def load_alert_config(path: str | pathlib.Path, rules: Mapping[str, Rule] = DEFAULT_RULES) -> AlertConfig:
+    '''
+    Read a JSON config {"max_per_rule"?: int, "rules": [{"rule": name,
+    "enabled"?: bool, <threshold>: value, ...}]}. Unknown rules or
+    thresholds are rejected here rather than mid-run.
+    '''
+    p = pathlib.Path(path)
+    doc = json.loads(p.read_text(encoding="utf-8"))
+
+    parsed: list[RuleConfig] = []
+    for entry in doc["rules"]:
+        entry = dict(entry)
+        name = entry.pop("rule")
+        enabled = bool(entry.pop("enabled", True))
+        if name not in rules:
+            raise ValueError(f"{p}: unknown alert rule {name!r} (known: {', '.join(rules)})")
+        accepted = list(inspect.signature(rules[name]).parameters)[1:]
+        unknown = sorted(set(entry) - set(accepted))
+        if unknown:
+            raise ValueError(f"{p}: rule {name!r} has no parameter(s) {unknown} (accepted: {accepted})")
+        parsed.append(RuleConfig(name, entry, enabled))
+
+    max_per_rule = doc.get("max_per_rule")
+    return AlertConfig(rules=tuple(parsed), max_per_rule=int(max_per_rule) if max_per_rule is not None else None)
+
+
+def evaluate_rules(
+    frames: Mapping[str, pd.DataFrame],
+    config: AlertConfig = DEFAULT_ALERT_CONFIG,
+    rules: Mapping[str, Rule] = DEFAULT_RULES,
+    inputs: Mapping[str, str] = RULE_INPUTS,
+) -> pd.DataFrame:
+    'Run every enabled rule of `config` on its input frame; one sorted alert frame.'
+    parts: list[pd.DataFrame] = []
+    for rc in config.rules:
+        if not rc.enabled:
+            continue
+        out = rules[rc.rule](frames[inputs[rc.rule]], **rc.params)
+        if isinstance(out, list):
+            out = pd.DataFrame([a.__dict__ for a in out], columns=ALERT_COLUMNS)
+        if config.max_per_rule is not None:
+            out = out.head(config.max_per_rule)
+        if not out.empty:
+            parts.append(out[ALERT_COLUMNS])
+    return _sort_alerts(pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=ALERT_COLUMNS))
+
+
+def _sort_alerts(df: pd.DataFrame) -> pd.DataFrame:
+    if df.empty:
+        return df
+    df["asof"] = pd.to_datetime(df["asof"])
+    df["metric"] = df["metric"].astype(float)
+    return df.sort_values(["severity", "code", "metric"], kind="stable")
+
 
 def alerts_to_frame(alerts: list[Alert]) -> pd.DataFrame:
     if not alerts:
-        return pd.DataFrame(columns=["code", "severity", "sku", "message", "metric", "asof"])
-    return pd.DataFrame([a.__dict__ for a in alerts]).sort_values(
-        ["severity", "code", "metric"], ascending=[True, True, True]
-    )
+        return pd.DataFrame(columns=ALERT_COLUMNS)
+    return _sort_alerts(pd.DataFrame([a.__dict__ for a in alerts], columns=ALERT_COLUMNS))
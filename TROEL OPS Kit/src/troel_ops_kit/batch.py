@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import json
+import logging
+import pathlib
+import time
+from collections.abc import Callable, Mapping
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+
+import pandas as pd
+
+from .cache import InputCache
+from .config import DEFAULT_MAX_BYTES
+from .pipeline import run as run_pipeline
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class SiteRun:
+    site: str
+    sales: str
+    stock: str
+    catalog: str
+    out_dir: str
+    mapping: Mapping[str, Mapping[str, str]] | None = None
+
+
+@dataclass(frozen=True)
+class SiteOutcome:
+    site: str
+    status: str  # ok | failed
+    alerts: int
+    seconds: float
+    error: str = ""
+
+
+@dataclass
+class BatchResult:
+    outcomes: list[SiteOutcome]
+    alerts: pd.DataFrame
+    alerts_path: pathlib.Path
+    summary_path: pathlib.Path
+
+    @property
+    def failed(self) -> list[SiteOutcome]:
+        return [o for o in self.outcomes if o.status != "ok"]
+
+
+def load_manifest(path: str | pathlib.Path, out_root: str | pathlib.Path) -> list[SiteRun]:
+    '''
+    Read a JSON manifest {"sites": [{"site", "sales", "stock", "catalog", "mapping"?}]}.
+    Relative paths are resolved against the manifest folder; `mapping` is a
+    mapping file path or an inline mapping object. Each site writes to out_root/<site>.
+    '''
+    p = pathlib.Path(path)
+    base = p.parent
+    doc = json.loads(p.read_text(encoding="utf-8"))
+
+    sites: list[SiteRun] = []
+    for entry in doc["sites"]:
+        mapping = entry.get("mapping")
+        if isinstance(mapping, str):
+            mapping = json.loads((base / mapping).read_text(encoding="utf-8"))
+        sites.append(
+            SiteRun(
+                site=str(entry["site"]),
+                sales=str(base / entry["sales"]),
+                stock=str(base / entry["stock"]),
+                catalog=str(base / entry["catalog"]),
+                out_dir=str(pathlib.Path(out_root) / str(entry["site"])),
+                mapping=mapping,
+            )
+        )
+    if len({s.site for s in sites}) != len(sites):
+        raise ValueError(f"{p}: site names must be unique")
+    return sites
+
+
+def _run_site(
+    site: SiteRun, cache_dir: str | None, use_cache: bool, cache_max_bytes: int = DEFAULT_MAX_BYTES
+) -> tuple[SiteOutcome, pd.DataFrame]:
+    'Worker entry point: one site, failures returned rather than raised.'
+    start = time.perf_counter()
+    try:
+        cache = InputCache(cache_dir, max_bytes=cache_max_bytes) if use_cache else None
+        res = run_pipeline(site.sales, site.stock, site.catalog, out_dir=site.out_dir, mapping=site.mapping, cache=cache)
+    except Exception as exc:
+        logger.exception("event=site_failed site=%s", site.site)
+        elapsed = round(time.perf_counter() - start, 3)
+        return SiteOutcome(site.site, "failed", 0, elapsed, f"{type(exc).__name__}: {exc}"), pd.DataFrame()
+    alerts = res.alerts if res.alerts is not None else pd.DataFrame()
+    return SiteOutcome(site.site, "ok", len(alerts), round(time.perf_counter() - start, 3)), alerts
+
+
+def run_batch(
+    sites: list[SiteRun],
+    out_root: str | pathlib.Path,
+    workers: int = 1,
+    cache_dir: str | None = None,
+    use_cache: bool = True,
+    on_done: Callable[[SiteOutcome], None] | None = None,
+    cache_max_bytes: int = DEFAULT_MAX_BYTES,
+) -> BatchResult:
+    '''
+    Run the pipeline for every site on a pool of `workers` processes (each
+    worker imports pandas once and serves many sites). A failing site is
+    reported in the summary without stopping the others. The workers share
+    the input cache in `cache_dir`, capped at `cache_max_bytes`. Writes
+    alerts_all_sites.csv and batch_summary.csv under out_root.
+    '''
+    out = pathlib.Path(out_root)
+    out.mkdir(parents=True, exist_ok=True)
+    logger.info("event=start_batch sites=%s workers=%s", len(sites), workers)
+
+    outcomes: list[SiteOutcome] = []
+    frames: list[pd.DataFrame] = []
+
+    def collect(outcome: SiteOutcome, alerts: pd.DataFrame) -> None:
+        outcomes.append(outcome)
+        if not alerts.empty:
+            frames.append(alerts.assign(site=outcome.site))
+        logger.info("event=site_done site=%s status=%s seconds=%.2f", outcome.site, outcome.status, outcome.seconds)
+        if on_done is not None:
+            on_done(outcome)
+
+    if workers <= 1:
+        for site in sites:
+            collect(*_run_site(site, cache_dir, use_cache, cache_max_bytes))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(_run_site, site, cache_dir, use_cache, cache_max_bytes): site for site in sites}
+            for fut in as_completed(futures):
+                site = futures[fut]
+                try:
+                    collect(*fut.result())
+                except Exception as exc:  # worker process died (e.g. out of memory)
+                    collect(SiteOutcome(site.site, "failed", 0, 0.0, f"{type(exc).__name__}: {exc}"), pd.DataFrame())
+
+    order = {s.site: i for i, s in enumerate(sites)}
+    outcomes.sort(key=lambda o: order[o.site])
+
+    alerts_cols = ["site", "code", "severity", "sku", "message", "metric", "asof"]
+    alerts = pd.concat(frames, ignore_index=True)[alerts_cols] if frames else pd.DataFrame(columns=alerts_cols)
+    alerts = alerts.sort_values(["site", "severity", "code"], kind="stable").reset_index(drop=True)
+    alerts_path = out / "alerts_all_sites.csv"
+    alerts.to_csv(alerts_path, index=False)
+
+    summary_path = out / "batch_summary.csv"
+    pd.DataFrame([o.__dict__ for o in outcomes], columns=["site", "status", "alerts", "seconds", "error"]).to_csv(
+        summary_path, index=False
+    )
+    logger.info("event=batch_done sites=%s failed=%s", len(outcomes), sum(o.status != "ok" for o in outcomes))
+    return BatchResult(outcomes=outcomes, alerts=alerts, alerts_path=alerts_path, summary_path=summary_path)
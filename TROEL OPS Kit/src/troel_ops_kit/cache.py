@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import itertools
+import json
+import logging
+import os
+import pathlib
+from collections.abc import Mapping, Sequence
+from dataclasses import asdict
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from . import __version__
+from .config import DEFAULT_MAX_BYTES
+from .io import FRAME_FORMAT, ReadOptions
+
+logger = logging.getLogger(__name__)
+
+
+def default_cache_dir() -> pathlib.Path:
+    base = os.environ.get("XDG_CACHE_HOME") or pathlib.Path.home() / ".cache"
+    return pathlib.Path(base) / "troel-ops-kit"
+
+
+def _utf8_column(values: np.ndarray) -> dict[str, np.ndarray]:
+    'Strings as one UTF-8 byte buffer plus end offsets (Arrow-style), no object arrays.'
+    encoded = [v.encode() for v in values]
+    return {
+        "offsets": np.cumsum([len(b) for b in encoded], dtype=np.int64),
+        "data": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+    }
+
+
+def _utf8_values(data: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    raw, bounds = data.tobytes(), [0, *offsets.tolist()]
+    return np.array([raw[a:b].decode() for a, b in itertools.pairwise(bounds)], dtype=object)
+
+
+def encode_frame(df: pd.DataFrame) -> dict[str, np.ndarray] | None:
+    '''
+    Column arrays of `df` plus a JSON manifest (names, dtypes, layout), or
+    None when a column has no pickle-free layout (mixed Python objects).
+    Numeric, boolean and datetime columns are stored as is; string columns as
+    dictionary codes (-1 for missing) over their UTF-8 encoded uniques.
+    '''
+    arrays: dict[str, np.ndarray] = {}
+    columns: list[dict[str, Any]] = []
+    for i, (name, s) in enumerate(df.items()):
+        if isinstance(s.dtype, np.dtype) and s.dtype != object:
+            arrays[f"{i}.values"] = s.to_numpy()
+            columns.append({"name": name, "dtype": s.dtype.str, "layout": "array"})
+            continue
+        if not (isinstance(s.dtype, pd.StringDtype) or s.dtype == object):
+            return None
+        codes, index = pd.factorize(s, use_na_sentinel=True)
+        uniques = np.asarray(index, dtype=object)
+        if not all(isinstance(v, str) for v in uniques):
+            return None
+        arrays[f"{i}.codes"] = codes.astype(np.int32 if len(uniques) < 2**31 else np.int64)
+        arrays.update({f"{i}.{part}": a for part, a in _utf8_column(uniques).items()})
+        columns.append({"name": name, "dtype": str(s.dtype), "layout": "utf8"})
+    manifest = {"rows": len(df), "columns": columns}
+    arrays["manifest"] = np.frombuffer(json.dumps(manifest).encode(), dtype=np.uint8)
+    return arrays
+
+
+def decode_frame(npz: Any) -> pd.DataFrame:
+    manifest = json.loads(npz["manifest"].tobytes())
+    data: dict[int, pd.Series] = {}
+    for i, col in enumerate(manifest["columns"]):
+        if col["layout"] == "array":
+            data[i] = pd.Series(npz[f"{i}.values"], copy=False)
+            continue
+        uniques = _utf8_values(npz[f"{i}.data"], npz[f"{i}.offsets"])
+        values = np.append(uniques, np.nan)[npz[f"{i}.codes"]]  # code -1 picks the trailing NaN
+        data[i] = pd.Series(values, dtype=col["dtype"])
+    df = pd.DataFrame(data, index=pd.RangeIndex(manifest["rows"]))
+    df.columns = pd.Index([col["name"] for col in manifest["columns"]])
+    return df
+
+
+class InputCache:
+    '''
+    Local cache of parsed, typed input frames.
+
+    Entries are keyed by file content hash + read options + column mapping +
+    coerced date columns + kit version and frame format, so an edited file or
+    a new release never hits a stale entry. Frames are stored column by
+    column in an .npz file with a JSON dtype manifest and read back without
+    pickle (the cache folder may be shared), dtypes preserved exactly. Least
+    recently used entries are evicted once the folder exceeds `max_bytes`.
+    '''
+
+    suffix = ".npz"
+
+    def __init__(self, root: str | pathlib.Path | None = None, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.root = pathlib.Path(root) if root is not None else default_cache_dir()
+        self.max_bytes = max_bytes
+
+    def key(
+        self,
+        path: str | pathlib.Path,
+        mapping: Mapping[str, str] | None,
+        date_cols: Sequence[str],
+        options: ReadOptions | None = None,
+    ) -> str:
+        with open(path, "rb") as f:
+            content = hashlib.file_digest(f, "sha256").hexdigest()
+        params = json.dumps(
+            {
+                "mapping": dict(mapping or {}),
+                "date_cols": list(date_cols),
+                "read": asdict(options or ReadOptions()),
+                "version": __version__,
+                "format": FRAME_FORMAT,
+            },
+            sort_keys=True,
+        )
+        return hashlib.sha256(f"{content}:{params}".encode()).hexdigest()
+
+    def _entry(self, key: str) -> pathlib.Path:
+        return self.root / f"{key}{self.suffix}"
+
+    def get(self, key: str) -> pd.DataFrame | None:
+        entry = self._entry(key)
+        if not entry.exists():
+            return None
+        try:
+            with np.load(entry, allow_pickle=False) as npz:
+                df = decode_frame(npz)
+        except Exception:
+            logger.warning("event=cache_corrupt path=%s", entry)
+            entry.unlink(missing_ok=True)
+            return None
+        with contextlib.suppress(FileNotFoundError):
+            os.utime(entry)  # mtime doubles as last-access time for LRU eviction
+        logger.debug("event=cache_hit key=%s", key)
+        return df
+
+    def put(self, key: str, df: pd.DataFrame) -> None:
+        arrays = encode_frame(df)
+        if arrays is None:
+            logger.debug("event=cache_skip key=%s reason=object_columns", key)
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        entry = self._entry(key)
+        tmp = entry.with_suffix(f".{os.getpid()}.tmp")  # batch workers may write the same key
+        with open(tmp, "wb") as f:
+            np.savez(f, allow_pickle=False, **arrays)
+        tmp.replace(entry)
+        logger.debug("event=cache_store key=%s bytes=%s", key, entry.stat().st_size)
+        self.evict()
+
+    def evict(self) -> None:
+        'Drop least recently used entries until the folder fits in max_bytes.'
+        entries: list[tuple[float, int, pathlib.Path]] = []
+        for p in self.root.glob(f"*{self.suffix}"):
+            try:
+                st = p.stat()
+            except FileNotFoundError:  # evicted concurrently by another process
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        for _, size, p in entries:
+            if total <= self.max_bytes:
+                break
+            total -= size
+            p.unlink(missing_ok=True)
+            logger.debug("event=cache_evict path=%s", p)
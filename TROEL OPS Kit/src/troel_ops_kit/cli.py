@@ -1,16 +1,47 @@
 from __future__ import annotations
 
+import contextlib
 import json
+import os
 import pathlib
+import threading
+import time
+from dataclasses import asdict, replace
+from typing import TYPE_CHECKING
 
 import typer
 from rich.console import Console
+from rich.progress import Progress
 from rich.table import Table
 
-from .demo import generate_demo
+from .config import (
+    ALERT_HISTORY_FILE,
+    DEFAULT_AGING_HORIZONS,
+    DEFAULT_CHUNKSIZE,
+    DEFAULT_CLASSIFICATION,
+    DEFAULT_FORECAST,
+    DEFAULT_GRID,
+    DEFAULT_MAX_BYTES,
+    DEMAND_MODELS,
+    OUTPUT_FORMATS,
+    OUTPUTS,
+    PRESETS,
+    RESULTS_DB_FILE,
+    TABLE_OUTPUTS,
+    ClassificationConfig,
+    ForecastConfig,
+    SweepGrid,
+    parse_days,
+)
 from .logging_config import configure_logging
-from .pipeline import run as run_pipeline
-from .report import markdown_to_pdf
+from .skuindex import SKU_INDEX_FILE, SkuIndex, jsonable
+
+if TYPE_CHECKING:
+    from .cache import InputCache
+    from .pipeline import RunResult
+
+# The KPI modules (pandas, numpy) are imported by the commands that run them,
+# so quick commands such as `query` start without them.
 
 app = typer.Typer(add_completion=False, help="TROEL OPS Kit - Supply Chain KPI & Alerts Toolkit.")
 demo_app = typer.Typer(help="Demo dataset utilities.")
@@ -28,10 +59,69 @@ def main(
 
 
 @demo_app.command("generate")
-def demo_generate(out: str = typer.Option("./data/demo", help="Output folder for demo CSV files")) -> None:
+def demo_generate(
+    out: str = typer.Option("./data/demo", help="Output folder for demo CSV files"),
+    preset: str = typer.Option("small", help=f"Dataset size: {' | '.join(PRESETS)}"),
+    skus: int | None = typer.Option(None, help="Override the preset number of SKUs"),
+    days: int | None = typer.Option(None, help="Override the preset number of days of sales"),
+    snapshots: int | None = typer.Option(None, help="Override the preset number of weekly stock snapshots"),
+    seed: int = typer.Option(7, help="Random seed"),
+) -> None:
     "Generate synthetic datasets (sales/stock/catalog) as CSV."
-    generate_demo(out)
-    console.print(f"[green]OK[/green] Demo data generated in: {out}")
+    from .demo import generate_dataset
+
+    if preset not in PRESETS:
+        raise typer.BadParameter(f"unknown preset {preset!r} (choose from {', '.join(PRESETS)})", param_hint="--preset")
+    overrides = {"n_skus": skus, "days": days, "snapshots": snapshots}
+    spec = replace(PRESETS[preset], **{k: v for k, v in overrides.items() if v is not None})
+    rows = generate_dataset(out, spec, seed=seed)
+    console.print(
+        f"[green]OK[/green] Demo data generated in: {out} "
+        f"({spec.n_skus} SKUs, {spec.days} days, {rows} sales rows, {spec.snapshots} stock snapshot(s))"
+    )
+
+
+def _pair(spec: str) -> tuple[float, float]:
+    values = [float(v) for v in spec.split(",")]
+    if len(values) != 2:
+        raise ValueError(f"expected two comma-separated cut-offs, got {spec!r}")
+    return values[0], values[1]
+
+
+def _parse_output_format(spec: str) -> str | dict[str, str]:
+    'csv | parquet | ... for all outputs, optionally followed by output=format overrides.'
+    default, per_output = "csv", {}
+    for item in (i.strip() for i in spec.split(",") if i.strip()):
+        name, sep, fmt = item.partition("=")
+        if sep:
+            per_output[name.strip()] = fmt.strip()
+        else:
+            default = item
+    if bad := sorted({default, *per_output.values()} - set(OUTPUT_FORMATS)):
+        raise typer.BadParameter(f"unknown formats {bad} (choose from {', '.join(OUTPUT_FORMATS)})")
+    if bad := sorted(set(per_output) - set(TABLE_OUTPUTS)):
+        raise typer.BadParameter(f"no tabular output named {bad} (choose from {', '.join(TABLE_OUTPUTS)})")
+    if not per_output:
+        return default
+    return {o: per_output.get(o, default) for o in TABLE_OUTPUTS}
+
+
+def _input_cache(no_cache: bool, cache_dir: str | None, cache_max_mb: int) -> InputCache | None:
+    from .cache import InputCache
+
+    return None if no_cache else InputCache(cache_dir, max_bytes=cache_max_mb * 1024**2)
+
+
+def _parse_demand_model(spec: str, alpha: float, beta: float) -> ForecastConfig:
+    'mean | ses | ... for all SKUs, optionally followed by class=model overrides (A=holt,C=sba).'
+    model, by_class = "mean", []
+    for item in (i.strip() for i in spec.split(",") if i.strip()):
+        klass, sep, name = item.partition("=")
+        if sep:
+            by_class.append((klass.strip(), name.strip()))
+        else:
+            model = item
+    return ForecastConfig(model, tuple(by_class), alpha=alpha, beta=beta)
 
 
 @app.command()
@@ -41,15 +131,191 @@ def run(
     catalog: str = typer.Option(..., help="Path to catalog CSV/XLSX"),
     out: str = typer.Option("./out", help="Output folder"),
     mapping: str | None = typer.Option(None, help="Optional JSON mapping file for columns"),
+    sales_chunksize: int | None = typer.Option(
+        None, help="Stream the sales file in chunks of N rows (memory bounded by chunk size)"
+    ),
+    incremental: bool = typer.Option(
+        False, "--incremental", help="Only process sales appended since the last run into this --out folder"
+    ),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Always re-parse inputs"),
+    cache_dir: str | None = typer.Option(None, help="Parsed input cache folder (default: ~/.cache/troel-ops-kit)"),
+    cache_max_mb: int = typer.Option(DEFAULT_MAX_BYTES // 1024**2, help="Cache size cap in MB (LRU eviction)"),
+    profile: bool = typer.Option(
+        False, "--profile", help="Trace allocations per stage and save a cProfile dump of the slowest stage"
+    ),
+    alerts_config: str | None = typer.Option(
+        None, help="JSON file with alert rules and thresholds (see alerts.example.json)"
+    ),
+    max_alerts_per_rule: int | None = typer.Option(
+        None, help="Keep only the N most severe alerts of each rule (default: all)"
+    ),
+    only: str | None = typer.Option(
+        None, help=f"Comma-separated outputs to produce (default: all): {','.join(OUTPUTS)}"
+    ),
+    io_workers: int = typer.Option(
+        1, help="Read inputs in parallel and write outputs on N background threads (slow or network disks)"
+    ),
+    abc_periods: str = typer.Option(
+        ",".join(map(str, DEFAULT_CLASSIFICATION.periods)), help="Trailing periods in days of kpi_abc_xyz.csv"
+    ),
+    abc_cutoffs: str = typer.Option(
+        ",".join(map(str, DEFAULT_CLASSIFICATION.abc_cutoffs)), help="Cumulative value shares closing classes A,B"
+    ),
+    xyz_cutoffs: str = typer.Option(
+        ",".join(map(str, DEFAULT_CLASSIFICATION.xyz_cutoffs)), help="Coefficients of variation closing classes X,Y"
+    ),
+    output_format: str = typer.Option(
+        "csv",
+        help=f"Output format ({','.join(OUTPUT_FORMATS)}) for all files, and/or per output: csv.gz,coverage=parquet",
+    ),
+    aging_horizons: str = typer.Option(
+        ",".join(map(str, DEFAULT_AGING_HORIZONS)), help="Stock aging horizons in days (kpi_stock_aging)"
+    ),
+    shards: int = typer.Option(
+        0, min=0, help="Out-of-core run: partition sales and stock by SKU into N on-disk shards (memory bounded by shard size)"
+    ),
+    workers: int = typer.Option(1, help="Worker processes computing the shards of a --shards run"),
+    demand_model: str = typer.Option(
+        "mean",
+        help=f"Daily demand model behind coverage ({','.join(DEMAND_MODELS)}), and/or per ABC class: ses,A=holt,C=sba",
+    ),
+    demand_alpha: float = typer.Option(DEFAULT_FORECAST.alpha, help="Level smoothing of ses/holt/croston/sba"),
+    demand_beta: float = typer.Option(DEFAULT_FORECAST.beta, help="Trend smoothing of holt"),
+    alert_history: str | None = typer.Option(
+        None,
+        help=f"SQLite alert history to record this run in (e.g. out/{ALERT_HISTORY_FILE}); writes alerts_delta.csv",
+    ),
+    history_keep_runs: int = typer.Option(90, min=2, help="Runs kept in the alert history"),
+    results_db: bool = typer.Option(
+        False, "--results-db", help=f"Also load every output table into {RESULTS_DB_FILE} (indexed by sku, category, ...)"
+    ),
 ) -> None:
     "End-to-end run: ingest + validate + KPIs + alerts + report.md."
+    from .alerthistory import AlertHistory
+    from .alerts import DEFAULT_ALERT_CONFIG, load_alert_config
+
     mapping_obj = None
     if mapping:
         mapping_obj = json.loads(pathlib.Path(mapping).read_text(encoding="utf-8"))
+    alert_config = load_alert_config(alerts_config) if alerts_config else DEFAULT_ALERT_CONFIG
+    if max_alerts_per_rule is not None:
+        alert_config = replace(alert_config, max_per_rule=max_alerts_per_rule)
+    outputs = [o.strip() for o in only.split(",") if o.strip()] if only else None
+    if outputs is not None and (unknown := [o for o in outputs if o not in OUTPUTS]):
+        raise typer.BadParameter(f"unknown outputs {unknown} (choose from {', '.join(OUTPUTS)})", param_hint="--only")
+    cache = _input_cache(no_cache, cache_dir, cache_max_mb)
+    formats = _parse_output_format(output_format)
+    history = AlertHistory(pathlib.Path(alert_history), history_keep_runs) if alert_history else None
+    try:
+        classification = ClassificationConfig(
+            periods=tuple(int(p) for p in abc_periods.split(",")),
+            abc_cutoffs=_pair(abc_cutoffs),
+            xyz_cutoffs=_pair(xyz_cutoffs),
+        )
+        horizons = tuple(int(h) for h in aging_horizons.split(","))
+        if min(horizons) <= 0:
+            raise ValueError(f"aging horizons must be positive numbers of days, got {aging_horizons}")
+        forecast = _parse_demand_model(demand_model, demand_alpha, demand_beta)
+    except ValueError as exc:
+        raise typer.BadParameter(str(exc)) from exc
 
-    res = run_pipeline(sales, stock, catalog, out_dir=out, mapping=mapping_obj)
-    console.print(f"[green]OK[/green] Report: {res.report_path}")
+    if shards:
+        if incremental:
+            raise typer.BadParameter("--shards and --incremental cannot be combined", param_hint="--shards")
+        if outputs is not None and "coverage_history" in outputs:
+            raise typer.BadParameter("coverage_history is not available with --shards", param_hint="--only")
+        # Sharded runs stream their inputs into partitions: no input cache, no I/O thread pool.
+        unsupported = {
+            "--io-workers": io_workers != 1,
+            "--no-cache": no_cache,
+            "--cache-dir": cache_dir is not None,
+            "--cache-max-mb": cache_max_mb != DEFAULT_MAX_BYTES // 1024**2,
+        }
+        if used := [option for option, given in unsupported.items() if given]:
+            raise typer.BadParameter(f"{', '.join(used)} cannot be combined with --shards", param_hint="--shards")
+        from .sharded import run_sharded
 
+        res = run_sharded(
+            sales,
+            stock,
+            catalog,
+            out_dir=out,
+            shards=shards,
+            workers=workers,
+            mapping=mapping_obj,
+            chunksize=sales_chunksize or DEFAULT_CHUNKSIZE,
+            profile=profile,
+            alert_config=alert_config,
+            outputs=outputs,
+            output_format=formats,
+            classification=classification,
+            aging_horizons=horizons,
+            forecast=forecast,
+            alert_history=history,
+            results_db=results_db,
+        )
+    else:
+        from .pipeline import run as run_pipeline
+
+        res = run_pipeline(
+            sales,
+            stock,
+            catalog,
+            out_dir=out,
+            mapping=mapping_obj,
+            sales_chunksize=sales_chunksize,
+            cache=cache,
+            incremental=incremental,
+            profile=profile,
+            alert_config=alert_config,
+            outputs=outputs,
+            io_workers=io_workers,
+            output_format=formats,
+            classification=classification,
+            aging_horizons=horizons,
+            forecast=forecast,
+            alert_history=history,
+            results_db=results_db,
+        )
+    if res.report_path is not None:
+        console.print(f"[green]OK[/green] Report: {res.report_path}")
+    else:
+        console.print(f"[green]OK[/green] Outputs in: {out}")
+    if res.issue_counts is not None and (found := res.issue_counts[res.issue_counts["issues"] > 0]).size:
+        console.print(
+            "[yellow]Validation[/yellow] "
+            + ", ".join(f"{r.dataset}.{r.check}={r.issues}" for r in found.itertuples(index=False))
+            + " (voir issues.csv)"
+        )
+    if res.results_db_path is not None:
+        console.print(f"[green]OK[/green] Results database: {res.results_db_path}")
+    if res.alerts_delta is not None:
+        status = res.alerts_delta["status"]
+        console.print(
+            f"[cyan]Alert history[/cyan] {int((status == 'new').sum())} new, "
+            f"{int((status == 'resolved').sum())} resolved since the previous run (alerts_delta)"
+        )
+
+    if profile and res.metrics is not None:
+        m = res.metrics
+        pt = Table(title=f"Stages ({m.wall_s:.2f}s wall, {m.cpu_s:.2f}s CPU, peak RSS {m.peak_rss_mb or 0:.0f} MB)")
+        for col in ["stage", "wall_s", "cpu_s", "rss_delta_mb", "alloc_peak_mb", "rows"]:
+            pt.add_column(col, justify="left" if col == "stage" else "right")
+        for st in m.stages:
+            pt.add_row(
+                st.stage,
+                f"{st.wall_s:.3f}",
+                f"{st.cpu_s:.3f}",
+                f"{st.peak_rss_delta_mb or 0:.1f}",
+                f"{st.peak_alloc_mb or 0:.1f}",
+                str(st.rows),
+            )
+        console.print(pt)
+        if m.profile_path:
+            console.print(f"cProfile of the slowest stage: {m.profile_path} (python -m pstats)")
+
+    if res.alerts is None:
+        return
     t = Table(title="Top alerts (demo)")
     for col in ["severity", "code", "sku", "message", "metric"]:
         t.add_column(col)
@@ -64,6 +330,266 @@ def run(
     console.print(t)
 
 
+@app.command("run-batch")
+def run_batch_cmd(
+    manifest: str = typer.Option(..., help="JSON manifest listing sites and their input files"),
+    out: str = typer.Option("./out", help="Output root folder (one sub-folder per site)"),
+    workers: int = typer.Option(os.cpu_count() or 1, help="Number of worker processes"),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Always re-parse inputs"),
+    cache_dir: str | None = typer.Option(None, help="Parsed input cache folder (default: ~/.cache/troel-ops-kit)"),
+    cache_max_mb: int = typer.Option(DEFAULT_MAX_BYTES // 1024**2, help="Cache size cap in MB (LRU eviction)"),
+) -> None:
+    "Run the pipeline for many sites in parallel and consolidate their alerts."
+    from .batch import SiteOutcome, load_manifest, run_batch
+
+    sites = load_manifest(manifest, out)
+    with Progress(console=console) as progress:
+        task = progress.add_task("Sites", total=len(sites))
+
+        def on_done(outcome: SiteOutcome) -> None:
+            progress.advance(task)
+            if outcome.status != "ok":
+                progress.console.print(f"[red]FAILED[/red] {outcome.site}: {outcome.error}")
+
+        res = run_batch(
+            sites,
+            out,
+            workers=workers,
+            cache_dir=cache_dir,
+            use_cache=not no_cache,
+            on_done=on_done,
+            cache_max_bytes=cache_max_mb * 1024**2,
+        )
+
+    console.print(
+        f"[green]OK[/green] {len(sites) - len(res.failed)}/{len(sites)} sites, alerts: {res.alerts_path}"
+    )
+    if res.failed:
+        raise typer.Exit(code=1)
+
+
+@app.command()
+def watch(
+    sales: str = typer.Option(..., help="Path to sales CSV/XLSX"),
+    stock: str = typer.Option(..., help="Path to stock CSV/XLSX"),
+    catalog: str = typer.Option(..., help="Path to catalog CSV/XLSX"),
+    out: str = typer.Option("./out", help="Output folder"),
+    mapping: str | None = typer.Option(None, help="Optional JSON mapping file for columns"),
+    alerts_config: str | None = typer.Option(None, help="JSON file with alert rules and thresholds"),
+    only: str | None = typer.Option(None, help=f"Comma-separated outputs to produce ({','.join(OUTPUTS)})"),
+    output_format: str = typer.Option("csv", help=f"Output format ({','.join(OUTPUT_FORMATS)}), see `run`"),
+    interval: float = typer.Option(2.0, help="Seconds between input file checks"),
+    debounce: float = typer.Option(2.0, help="Seconds a changed file must stay unchanged before a rerun"),
+    full: bool = typer.Option(False, "--full", help="Refold the whole sales file on every run (no --incremental)"),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Always re-parse inputs"),
+    cache_dir: str | None = typer.Option(None, help="Parsed input cache folder (default: ~/.cache/troel-ops-kit)"),
+    cache_max_mb: int = typer.Option(DEFAULT_MAX_BYTES // 1024**2, help="Cache size cap in MB (LRU eviction)"),
+    alert_history: str | None = typer.Option(None, help="SQLite alert history recording every run, see `run`"),
+    results_db: bool = typer.Option(False, "--results-db", help=f"Reload {RESULTS_DB_FILE} on every run, see `run`"),
+) -> None:
+    "Run the pipeline, then rerun the affected stages whenever an input file changes."
+    from .alerthistory import AlertHistory
+    from .alerts import DEFAULT_ALERT_CONFIG, load_alert_config
+    from .watch import WatchSession
+
+    mapping_obj = json.loads(pathlib.Path(mapping).read_text(encoding="utf-8")) if mapping else None
+    outputs = [o.strip() for o in only.split(",") if o.strip()] if only else None
+    if outputs is not None and (unknown := [o for o in outputs if o not in OUTPUTS]):
+        raise typer.BadParameter(f"unknown outputs {unknown} (choose from {', '.join(OUTPUTS)})", param_hint="--only")
+
+    def on_run(res: RunResult, changed: list[str], reused: list[str], seconds: float) -> None:
+        n_alerts = len(res.alerts) if res.alerts is not None else 0
+        delta = ""
+        if res.alerts_delta is not None:
+            status = res.alerts_delta["status"]
+            delta = f" ({int((status == 'new').sum())} new, {int((status == 'resolved').sum())} resolved)"
+        console.print(
+            f"[green]OK[/green] {time.strftime('%H:%M:%S')} changed: {', '.join(changed)}; "
+            f"reused: {', '.join(reused) or '-'}; {n_alerts} alerts{delta}; {seconds:.2f}s"
+        )
+
+    session = WatchSession(
+        sales,
+        stock,
+        catalog,
+        out,
+        debounce_s=debounce,
+        on_run=on_run,
+        mapping=mapping_obj,
+        cache=_input_cache(no_cache, cache_dir, cache_max_mb),
+        incremental=not full,
+        alert_config=load_alert_config(alerts_config) if alerts_config else DEFAULT_ALERT_CONFIG,
+        outputs=outputs,
+        output_format=_parse_output_format(output_format),
+        alert_history=AlertHistory(pathlib.Path(alert_history)) if alert_history else None,
+        results_db=results_db,
+    )
+    session.run()
+    console.print(f"Watching {sales}, {stock}, {catalog} every {interval:g}s (Ctrl+C to stop)")
+    with contextlib.suppress(KeyboardInterrupt):
+        session.watch(interval, threading.Event())
+
+
+def _days_option(values: tuple[float, ...]) -> str:
+    return ",".join(f"{v:g}" for v in values)
+
+
+@app.command()
+def sweep(
+    sales: str = typer.Option(..., help="Path to sales CSV/XLSX"),
+    stock: str = typer.Option(..., help="Path to stock CSV/XLSX"),
+    catalog: str = typer.Option(..., help="Path to catalog CSV/XLSX"),
+    out: str = typer.Option("./out", help="Output folder of sweep.csv"),
+    mapping: str | None = typer.Option(None, help="Optional JSON mapping file for columns"),
+    thresholds: str = typer.Option("3-21", help="Coverage alert thresholds in days (ranges allowed: 3-21)"),
+    windows: str = typer.Option(_days_option(DEFAULT_GRID.windows), help="Trailing demand windows in days"),
+    lookbacks: str = typer.Option(_days_option(DEFAULT_GRID.lookbacks), help="dead_sku lookbacks in days"),
+    min_snapshots: int = typer.Option(DEFAULT_GRID.min_snapshots, help="Snapshots of a low_coverage_streak"),
+    output_format: str = typer.Option("csv", help=f"Output format ({','.join(OUTPUT_FORMATS)})"),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Always re-parse inputs"),
+    cache_dir: str | None = typer.Option(None, help="Parsed input cache folder (default: ~/.cache/troel-ops-kit)"),
+    cache_max_mb: int = typer.Option(DEFAULT_MAX_BYTES // 1024**2, help="Cache size cap in MB (LRU eviction)"),
+) -> None:
+    "What-if: alert counts and affected stock value for every threshold x window x lookback combination."
+    from .sweep import run_sweep
+
+    mapping_obj = json.loads(pathlib.Path(mapping).read_text(encoding="utf-8")) if mapping else None
+    try:
+        grid = SweepGrid(
+            thresholds=parse_days(thresholds),
+            windows=tuple(int(w) for w in parse_days(windows)),
+            lookbacks=tuple(int(lb) for lb in parse_days(lookbacks)),
+            min_snapshots=min_snapshots,
+        )
+    except ValueError as exc:
+        raise typer.BadParameter(str(exc)) from exc
+    if output_format not in OUTPUT_FORMATS:
+        raise typer.BadParameter(f"unknown format {output_format!r} (choose from {', '.join(OUTPUT_FORMATS)})")
+    matrix, path = run_sweep(
+        sales,
+        stock,
+        catalog,
+        out,
+        grid,
+        mapping=mapping_obj,
+        cache=_input_cache(no_cache, cache_dir, cache_max_mb),
+        output_format=output_format,
+    )
+
+    # Coverage alerts do not depend on the lookback: one threshold x window table.
+    coverage = matrix.assign(n=matrix["low_coverage"] + matrix["low_coverage_streak"])
+    pivot = coverage.drop_duplicates(["threshold_days", "window_days"]).pivot(
+        index="threshold_days", columns="window_days", values="n"
+    )
+    t = Table(title="Coverage alerts (low_coverage + low_coverage_streak)")
+    t.add_column("threshold \\ window")
+    for window in pivot.columns:
+        t.add_column(f"{window}d", justify="right")
+    for threshold, counts in pivot.iterrows():
+        t.add_row(f"{threshold:g}d", *(str(int(c)) for c in counts))
+    console.print(t)
+    console.print(f"[green]OK[/green] {len(matrix)} combinations: {path}")
+
+
+@app.command()
+def serve(
+    sales: str = typer.Option(..., help="Path to sales CSV/XLSX"),
+    stock: str = typer.Option(..., help="Path to stock CSV/XLSX"),
+    catalog: str = typer.Option(..., help="Path to catalog CSV/XLSX"),
+    out: str = typer.Option("./out/serve", help="Output folder of the server's pipeline runs"),
+    mapping: str | None = typer.Option(None, help="Optional JSON mapping file for columns"),
+    alerts_config: str | None = typer.Option(None, help="JSON file with alert rules and thresholds"),
+    host: str = typer.Option("127.0.0.1", help="Interface to listen on"),
+    port: int = typer.Option(8765, help="TCP port"),
+    reload_interval: float = typer.Option(2.0, help="Seconds between input change checks (0: no hot reload)"),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Always re-parse inputs"),
+    cache_dir: str | None = typer.Option(None, help="Parsed input cache folder (default: ~/.cache/troel-ops-kit)"),
+    cache_max_mb: int = typer.Option(DEFAULT_MAX_BYTES // 1024**2, help="Cache size cap in MB (LRU eviction)"),
+) -> None:
+    "Keep KPIs in memory and answer coverage/alert queries over local HTTP (JSON)."
+    from .alerts import DEFAULT_ALERT_CONFIG, load_alert_config
+    from .server import KpiService
+    from .server import serve as serve_forever
+
+    mapping_obj = json.loads(pathlib.Path(mapping).read_text(encoding="utf-8")) if mapping else None
+    alert_config = load_alert_config(alerts_config) if alerts_config else DEFAULT_ALERT_CONFIG
+    service = KpiService(
+        sales,
+        stock,
+        catalog,
+        out,
+        mapping=mapping_obj,
+        cache=_input_cache(no_cache, cache_dir, cache_max_mb),
+        alert_config=alert_config,
+    )
+    snap = service.snapshot
+    console.print(
+        f"[green]OK[/green] {len(snap.coverage)} SKUs loaded in {snap.load_s:.2f}s, serving on http://{host}:{port} "
+        "(/health /sku/<sku> /category/<name> /coverage?n= /alerts?n=)"
+    )
+    with contextlib.suppress(KeyboardInterrupt):
+        serve_forever(service, host, port, reload_interval_s=reload_interval or None)
+
+
+@app.command("load-test")
+def load_test(
+    url: str = typer.Option("http://127.0.0.1:8765", help="Base URL of a running `troel-ops serve`"),
+    requests: int = typer.Option(2000, help="Total number of requests"),
+    concurrency: int = typer.Option(8, help="Concurrent clients (one keep-alive connection each)"),
+    paths: int = typer.Option(200, help="Distinct queries in the generated mix"),
+) -> None:
+    "Measure latency percentiles and throughput of a running server."
+    from .loadtest import default_paths, run_load_test
+
+    mix = default_paths(url, n=paths)
+    res = run_load_test(url, mix, requests=requests, concurrency=concurrency)
+    t = Table(title=f"Load test: {url}")
+    t.add_column("metric")
+    t.add_column("value", justify="right")
+    for name, value in asdict(res).items():
+        t.add_row(name, str(value))
+    console.print(t)
+    if res.errors:
+        raise typer.Exit(code=1)
+
+
+@app.command()
+def query(
+    sku: list[str] = typer.Option(..., "--sku", help="SKU to look up (repeat for several)"),
+    index: str = typer.Option(f"./out/{SKU_INDEX_FILE}", help="SKU index written by `troel-ops run`"),
+    as_json: bool = typer.Option(False, "--json", help="Print one JSON object per SKU"),
+) -> None:
+    "Look up per-SKU results (coverage, demand, dormant, ABC, alerts) in the index of a previous run."
+    missing: list[str] = []
+    t = Table(title=f"SKU index: {index}")
+    for col in ["sku", "on_hand_qty", "avg_daily_demand", "coverage_days", "dormant", "abc", "category", "alerts"]:
+        t.add_column(col)
+    with SkuIndex(index) as ix:
+        for s in sku:
+            rec = ix.get(s)
+            if rec is None:
+                missing.append(s)
+            elif as_json:
+                console.print_json(json.dumps(jsonable(rec), ensure_ascii=False))
+            else:
+                t.add_row(
+                    s,
+                    f"{rec['on_hand_qty']:g}",
+                    f"{rec['avg_daily_demand']:.3f}",
+                    f"{rec['coverage_days']:.1f}",
+                    "yes" if rec["dormant"] else "no",
+                    str(rec["abc"] or ""),
+                    str(rec["category"] or ""),
+                    ", ".join(f"{a['severity']}:{a['code']}" for a in rec["alerts"]),
+                )
+    if not as_json and t.row_count:
+        console.print(t)
+    for s in missing:
+        console.print(f"[red]NOT FOUND[/red] {s}")
+    if missing:
+        raise typer.Exit(code=1)
+
+
 @app.command()
 def report(
     in_dir: str = typer.Option("./out", help="Folder containing report.md"),
@@ -79,6 +605,8 @@ def report(
         raise typer.Exit(code=0)
 
     if format.lower() == "pdf":
+        from .report import markdown_to_pdf
+
         pdf_path = pathlib.Path(in_dir) / "report.pdf"
         markdown_to_pdf(in_path, pdf_path)
         console.print(f"[green]OK[/green] PDF generated: {pdf_path}")
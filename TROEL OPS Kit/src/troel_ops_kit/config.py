@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+# Option dataclasses, defaults and output names, kept free of pandas so the CLI
+# can declare its options without importing the KPI stack.
+
+DEFAULT_CHUNKSIZE = 1_000_000
+# Output formats: file suffix per format name.
+OUTPUT_FORMATS: dict[str, str] = {"csv": ".csv", "csv.gz": ".csv.gz", "parquet": ".parquet"}
+DEFAULT_MAX_BYTES = 2 * 1024**3  # input cache size cap
+ALERT_HISTORY_FILE = "alert_history.sqlite"
+RESULTS_DB_FILE = "results.sqlite"
+
+OUTPUTS = (
+    "issues",
+    "issues_summary",
+    "coverage",
+    "coverage_history",
+    "dormant",
+    "aging",
+    "abc",
+    "abc_xyz",
+    "alerts",
+    "report",
+    "index",
+)
+# Written on top of the requested alerts when the run has an alert history.
+HISTORY_OUTPUTS = ("alerts_delta",)
+# Outputs written as tables (the pipeline checks these against its stages).
+TABLE_OUTPUTS = (
+    "issues",
+    "issues_summary",
+    "coverage",
+    "coverage_history",
+    "dormant",
+    "aging",
+    "abc",
+    "abc_xyz",
+    "alerts",
+    "alerts_delta",
+)
+
+DEMAND_MODELS = ("mean", "ses", "holt", "croston", "sba")
+
+
+@dataclass(frozen=True)
+class ForecastConfig:
+    '''
+    Daily demand model behind coverage: "mean" (trailing mean over
+    `window_days`), "ses" (simple exponential smoothing), "holt" (additive
+    trend), "croston" or "sba" (Croston with the Syntetos-Boylan correction)
+    for intermittent demand. `by_class` overrides `model` per ABC class, e.g.
+    (("A", "holt"), ("C", "sba")). `alpha` smooths the level (Croston: sizes
+    and intervals), `beta` the Holt trend.
+    '''
+
+    model: str = "mean"
+    by_class: tuple[tuple[str, str], ...] = ()
+    alpha: float = 0.1
+    beta: float = 0.05
+    window_days: int = 28
+
+    def __post_init__(self) -> None:
+        for model in (self.model, *(m for _, m in self.by_class)):
+            if model not in DEMAND_MODELS:
+                raise ValueError(f"unknown demand model {model!r} (choose from {', '.join(DEMAND_MODELS)})")
+        if bad := sorted({c for c, _ in self.by_class} - set("ABC")):
+            raise ValueError(f"by_class keys must be ABC classes, got {bad}")
+        if not 0 < self.alpha <= 1 or not 0 <= self.beta <= 1:
+            raise ValueError(f"smoothing needs 0 < alpha <= 1 and 0 <= beta <= 1, got {self.alpha}, {self.beta}")
+        if self.window_days <= 0:
+            raise ValueError(f"window_days must be positive, got {self.window_days}")
+
+    def model_of(self, abc_class: str | None) -> str:
+        return dict(self.by_class).get(abc_class or "", self.model)
+
+    @property
+    def is_mean(self) -> bool:
+        'Trailing mean for every SKU (the ABC classes are not needed).'
+        return all(m == "mean" for m in (self.model, *(m for _, m in self.by_class)))
+
+
+DEFAULT_FORECAST = ForecastConfig()
+
+DEFAULT_AGING_HORIZONS = (30, 60, 90, 180, 365)
+
+
+@dataclass(frozen=True)
+class ClassificationConfig:
+    '''
+    ABC/XYZ settings. `periods` are trailing windows in days (up to the as-of
+    date); `abc_cutoffs` are cumulative consumption-value shares closing the
+    A and B classes; `xyz_cutoffs` are coefficients of variation of demand per
+    `bucket_days` bucket closing the X and Y classes.
+    '''
+
+    periods: tuple[int, ...] = (90, 180, 365)
+    abc_cutoffs: tuple[float, float] = (0.80, 0.95)
+    xyz_cutoffs: tuple[float, float] = (0.5, 1.0)
+    bucket_days: int = 7
+
+    def __post_init__(self) -> None:
+        if not self.periods or min(self.periods) <= 0:
+            raise ValueError(f"periods must be positive numbers of days, got {self.periods}")
+        for name, cutoffs in (("abc_cutoffs", self.abc_cutoffs), ("xyz_cutoffs", self.xyz_cutoffs)):
+            if len(cutoffs) != 2 or not 0 <= cutoffs[0] <= cutoffs[1]:
+                raise ValueError(f"{name} must be two increasing non-negative bounds, got {cutoffs}")
+        if self.bucket_days <= 0:
+            raise ValueError(f"bucket_days must be positive, got {self.bucket_days}")
+
+
+DEFAULT_CLASSIFICATION = ClassificationConfig()
+
+
+@dataclass(frozen=True)
+class DemoSpec:
+    'Size and demand shape of a synthetic dataset.'
+
+    n_skus: int = 200
+    days: int = 120
+    snapshots: int = 1  # weekly stock snapshots, the last one on the end date
+    seasonality: float = 0.3  # amplitude of the yearly cycle (phase per category)
+    promo_rate: float = 0.02  # share of selling sku-days multiplied x5..x11
+    intermittent_share: float = 0.3  # share of skus that only sell on a few days
+
+
+PRESETS: dict[str, DemoSpec] = {
+    "small": DemoSpec(n_skus=200, days=120),
+    "medium": DemoSpec(n_skus=5_000, days=365, snapshots=4),
+    "large": DemoSpec(n_skus=20_000, days=730, snapshots=8),
+    "xl": DemoSpec(n_skus=100_000, days=1095, snapshots=13),
+}
+
+
+@dataclass(frozen=True)
+class SweepGrid:
+    '''
+    What-if grid, every combination of: coverage thresholds of the
+    low_coverage and low_coverage_streak rules, trailing windows of the
+    average daily demand coverage divides by, and dead_sku lookbacks (days).
+    '''
+
+    thresholds: tuple[float, ...] = tuple(float(t) for t in range(3, 22))
+    windows: tuple[int, ...] = (7, 14, 28, 56)
+    lookbacks: tuple[int, ...] = (30, 60, 90)
+    min_snapshots: int = 3
+
+    def __post_init__(self) -> None:
+        for name in ("thresholds", "windows", "lookbacks"):
+            values = getattr(self, name)
+            if not values or min(values) <= 0:
+                raise ValueError(f"{name} must be positive numbers of days, got {values}")
+        if self.min_snapshots <= 0:
+            raise ValueError(f"min_snapshots must be positive, got {self.min_snapshots}")
+
+
+DEFAULT_GRID = SweepGrid()
+
+
+def parse_days(spec: str) -> tuple[float, ...]:
+    'Comma-separated days, with inclusive integer ranges: "3-21" or "7,14,28,56".'
+    values: list[float] = []
+    for item in (i.strip() for i in spec.split(",") if i.strip()):
+        lo, sep, hi = item.partition("-")
+        if sep:
+            values.extend(float(d) for d in range(int(lo), int(hi) + 1))
+        else:
+            values.append(float(item))
+    if not values:
+        raise ValueError(f"expected days, got {spec!r}")
+    return tuple(values)
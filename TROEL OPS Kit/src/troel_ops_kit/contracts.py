@@ -1,11 +1,15 @@
 from __future__ import annotations
 
 from datetime import date
+from typing import ClassVar
 
 from pydantic import BaseModel, Field, field_validator
 
 
 class SalesRow(BaseModel):
+    # Fields whose only custom validator is ">= 0"; validate.py checks them column-wise.
+    non_negative_fields: ClassVar[tuple[str, ...]] = ("qty",)
+
     date: date
     sku: str = Field(min_length=1)
     qty: float
@@ -19,6 +23,8 @@ class SalesRow(BaseModel):
 
 
 class StockRow(BaseModel):
+    non_negative_fields: ClassVar[tuple[str, ...]] = ("on_hand_qty",)
+
     snapshot_date: date
     sku: str = Field(min_length=1)
     on_hand_qty: float
@@ -1,67 +1,104 @@
 from __future__ import annotations
 
+import logging
 import pathlib
 from datetime import date, timedelta
 
 import numpy as np
 import pandas as pd
 
+from .config import DemoSpec
+
+logger = logging.getLogger(__name__)
+
+CHUNK_CELLS = 4_000_000  # sku x day cells drawn (and written) at once: bounds generator memory
+CATEGORIES = ["AUDIO", "CABLE", "POWER", "DISPLAY", "CONSUMABLE"]
+SUPPLIERS = ["SUP-ALPHA", "SUP-BETA", "SUP-GAMMA"]
+WEEKDAY_FACTORS = np.array([0.9, 0.95, 1.0, 1.0, 1.15, 1.3, 0.7])  # Monday .. Sunday
+
 
 def generate_demo(out_dir: str | pathlib.Path, n_skus: int = 200, days: int = 120, seed: int = 7) -> None:
     'Generate synthetic datasets: sales.csv, stock.csv, catalog.csv.'
-    rng = np.random.default_rng(seed)
-    out_dir = pathlib.Path(out_dir)
-    out_dir.mkdir(parents=True, exist_ok=True)
+    generate_dataset(out_dir, DemoSpec(n_skus=n_skus, days=days), seed=seed)
 
-    skus = [f"SKU-{i:04d}" for i in range(1, n_skus + 1)]
-    categories = ["AUDIO", "CABLE", "POWER", "DISPLAY", "CONSUMABLE"]
-    suppliers = ["SUP-ALPHA", "SUP-BETA", "SUP-GAMMA"]
 
-    catalog = pd.DataFrame(
+def generate_dataset(
+    out_dir: str | pathlib.Path,
+    spec: DemoSpec,
+    seed: int = 7,
+    end: date | None = None,
+) -> int:
+    '''
+    Write sales.csv, stock.csv and catalog.csv for `spec`; returns the number
+    of sales rows.
+
+    Each SKU sells on a random share of days (a few percent for intermittent
+    SKUs), with Poisson quantities shaped by a weekday profile, a yearly cycle
+    and occasional promo spikes. Sales are drawn and appended to the CSV a
+    block of days at a time, so memory stays bounded by CHUNK_CELLS whatever
+    the size. Demo scenarios (5+ SKUs): the first three SKUs hold 1 unit (low
+    coverage) and the fifth has no sales in the last 60 days (dormant).
+    '''
+    rng = np.random.default_rng(seed)
+    out = pathlib.Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    n_skus = spec.n_skus
+    width = max(4, len(str(n_skus)))
+    skus = np.array([f"SKU-{i:0{width}d}" for i in range(1, n_skus + 1)], dtype=object)
+
+    category = rng.integers(0, len(CATEGORIES), size=n_skus)
+    pd.DataFrame(
         {
             "sku": skus,
             "description": [f"Product {s}" for s in skus],
-            "category": rng.choice(categories, size=n_skus, replace=True),
-            "supplier": rng.choice(suppliers, size=n_skus, replace=True),
+            "category": np.array(CATEGORIES)[category],
+            "supplier": rng.choice(SUPPLIERS, size=n_skus, replace=True),
             "unit_cost": np.round(rng.uniform(1.0, 120.0, size=n_skus), 2),
         }
-    )
-    catalog.to_csv(out_dir / "catalog.csv", index=False)
-
-    end = date.today()
-    start = end - timedelta(days=days - 1)
-    all_days = [start + timedelta(days=i) for i in range(days)]
-
-    rows = []
-    for d in all_days:
-        active = rng.choice(skus, size=max(1, int(n_skus * 0.25)), replace=False)
-        for sku in active:
-            base = int(rng.poisson(lam=float(rng.uniform(0.2, 3.0))))
-            if base == 0:
-                continue
-            if rng.random() < 0.02:
-                base *= int(rng.integers(5, 12))
-            rows.append((d.isoformat(), sku, float(base)))
-
-    sales = pd.DataFrame(rows, columns=["date", "sku", "qty"])
-    sales.to_csv(out_dir / "sales.csv", index=False)
-
-    stock = pd.DataFrame(
-        {
-            "snapshot_date": [end.isoformat()] * n_skus,
-            "sku": skus,
-            "on_hand_qty": np.round(rng.uniform(0, 250, size=n_skus), 0),
-        }
-    )
+    ).to_csv(out / "catalog.csv", index=False)
+
+    intermittent = rng.random(n_skus) < spec.intermittent_share
+    sell_prob = np.where(intermittent, rng.uniform(0.01, 0.08, n_skus), rng.uniform(0.15, 0.35, n_skus))
+    rate = np.where(intermittent, rng.uniform(1.0, 6.0, n_skus), rng.uniform(0.2, 3.0, n_skus))
+    phase = category * (2 * np.pi / len(CATEGORIES))
+    scenarios = n_skus >= 5
+    dormant = 4 if scenarios else -1
+
+    end = end or date.today()
+    calendar = pd.date_range(end=pd.Timestamp(end), periods=spec.days, freq="D")
+    day_labels = calendar.strftime("%Y-%m-%d").to_numpy(dtype=object)
+    season = 2 * np.pi * calendar.dayofyear.to_numpy() / 365.25
+    weekday = WEEKDAY_FACTORS[calendar.dayofweek.to_numpy()]
+    dormant_from = spec.days - 61  # first day of the 60-day lookback before end
+
+    block = max(1, CHUNK_CELLS // max(n_skus, 1))
+    n_rows = 0
+    with open(out / "sales.csv", "w", encoding="utf-8", newline="") as f:
+        f.write("date,sku,qty\n")
+        for d0 in range(0, spec.days, block):
+            d1 = min(d0 + block, spec.days)
+            day, sku = np.nonzero(rng.random((d1 - d0, n_skus)) < sell_prob)
+            day += d0
+            lam = rate[sku] * (1 + spec.seasonality * np.sin(season[day] + phase[sku])) * weekday[day]
+            qty = rng.poisson(lam)
+            promo = rng.random(len(qty)) < spec.promo_rate
+            qty[promo] *= rng.integers(5, 12, size=int(promo.sum()))
 
-    if len(skus) >= 5:
-        for s in skus[:3]:
-            stock.loc[stock["sku"] == s, "on_hand_qty"] = 1
+            keep = (qty > 0) & ~((sku == dormant) & (day >= dormant_from))
+            part = pd.DataFrame({"date": day_labels[day[keep]], "sku": skus[sku[keep]], "qty": qty[keep]})
+            part.to_csv(f, header=False, index=False)
+            n_rows += len(part)
 
-        dormant_sku = skus[4]
-        sales2 = sales.copy()
-        sales2["date_dt"] = pd.to_datetime(sales2["date"]).dt.date
-        sales2 = sales2[~((sales2["sku"] == dormant_sku) & (sales2["date_dt"] >= end - timedelta(days=60)))]
-        sales2.drop(columns=["date_dt"]).to_csv(out_dir / "sales.csv", index=False)
+    with open(out / "stock.csv", "w", encoding="utf-8", newline="") as f:
+        f.write("snapshot_date,sku,on_hand_qty\n")
+        for k in reversed(range(spec.snapshots)):
+            on_hand = np.round(rng.uniform(0, 250, size=n_skus))
+            if scenarios:
+                on_hand[:3] = 1
+            snapshot = (end - timedelta(days=7 * k)).isoformat()
+            pd.DataFrame({"snapshot_date": snapshot, "sku": skus, "on_hand_qty": on_hand.astype(np.int64)}).to_csv(
+                f, header=False, index=False
+            )
 
-    stock.to_csv(out_dir / "stock.csv", index=False)
+    logger.info("event=demo_generated skus=%s days=%s sales_rows=%s out_dir=%s", n_skus, spec.days, n_rows, out)
+    return n_rows
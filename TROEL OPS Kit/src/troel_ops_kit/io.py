@@ -1,24 +1,187 @@
 from __future__ import annotations
 
+import importlib.util
+import os
 import pathlib
-from collections.abc import Mapping
+from collections.abc import Iterator, Mapping
+from dataclasses import dataclass
+from typing import Any
 
+import numpy as np
 import pandas as pd
 
+from .config import OUTPUT_FORMATS
 
-def read_tabular(path: str | pathlib.Path) -> pd.DataFrame:
+FRAME_FORMAT = 2  # bump when coerce_dates / prepare_datasets output dtypes change (cache, state)
+
+_FLOAT32_EXACT = 2**24
+
+
+# Columns the kit reads from each dataset (under their expected names).
+KIT_COLUMNS: dict[str, tuple[str, ...]] = {
+    "sales": ("date", "sku", "qty"),
+    "stock": ("snapshot_date", "sku", "on_hand_qty"),
+    "catalog": ("sku", "description", "category", "supplier", "unit_cost"),
+}
+
+
+@dataclass(frozen=True)
+class ReadOptions:
+    '''
+    How to read one input file. `sheet` (name or 0-based index) only applies
+    to workbooks; `header` is the 0-based row holding column names; `usecols`
+    lists the file columns to keep (None keeps all of them).
+    '''
+
+    sheet: str | int = 0
+    header: int = 0
+    usecols: tuple[str, ...] | None = None
+
+    def keeps(self, column: object) -> bool:
+        return self.usecols is None or str(column) in self.usecols
+
+
+def read_options(mapping_doc: Mapping[str, Any] | None, dataset: str) -> ReadOptions:
+    '''
+    ReadOptions for `dataset` from a mapping file: an optional top-level
+    "read" section {"sales": {"sheet": "Ventes", "header": 2, "usecols": [...]}}.
+    By default only the kit columns (and any other mapped column) are read,
+    under their file names; "usecols": "all" keeps every column.
+    '''
+    doc = mapping_doc or {}
+    opts = dict((doc.get("read") or {}).get(dataset) or {})
+    usecols = opts.get("usecols")
+    if usecols is None:
+        names = dict(doc.get(dataset) or {})
+        usecols = tuple(dict.fromkeys([*(names.get(c, c) for c in KIT_COLUMNS[dataset]), *names.values()]))
+    elif usecols == "all":
+        usecols = None
+    else:
+        usecols = tuple(str(c) for c in usecols)
+    return ReadOptions(sheet=opts.get("sheet", 0), header=int(opts.get("header", 0)), usecols=usecols)
+
+
+def excel_engine() -> str:
+    'calamine (Rust reader, `pip install troel-ops-kit[excel]`) when installed, else streamed openpyxl.'
+    return "calamine" if importlib.util.find_spec("python_calamine") is not None else "openpyxl"
+
+
+def _excel_frame(records: list[tuple[Any, ...]], columns: list[str], start: int) -> pd.DataFrame:
+    df = pd.DataFrame.from_records(records, columns=columns, coerce_float=True)
+    df.index = pd.RangeIndex(start, start + len(df))
+    return df.infer_objects()
+
+
+def _iter_xlsx_stream(path: pathlib.Path, options: ReadOptions, chunksize: int | None) -> Iterator[pd.DataFrame]:
+    '''
+    Stream a worksheet through openpyxl read-only mode: rows come straight
+    from the XML as value tuples, only the kept columns are copied, and
+    frames of `chunksize` rows are yielded (one frame when None).
+    '''
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True, data_only=True, keep_links=False)
+    try:
+        ws = wb[options.sheet] if isinstance(options.sheet, str) else wb.worksheets[options.sheet]
+        rows = ws.iter_rows(min_row=options.header + 1, values_only=True)
+        header = next(rows, None)
+        if header is None:
+            yield pd.DataFrame()
+            return
+        names = [str(h) if h is not None else f"Unnamed: {i}" for i, h in enumerate(header)]
+        keep = [i for i, name in enumerate(names) if options.keeps(name)]
+        columns = [names[i] for i in keep]
+
+        buf: list[tuple[Any, ...]] = []
+        done = 0
+        for row in rows:
+            values = tuple(row[i] if i < len(row) else None for i in keep)
+            if all(v is None for v in values):
+                continue  # blank line, as pandas skips them
+            buf.append(values)
+            if chunksize is not None and len(buf) == chunksize:
+                yield _excel_frame(buf, columns, done)
+                done += len(buf)
+                buf = []
+        if buf or not done:
+            yield _excel_frame(buf, columns, done)
+    finally:
+        wb.close()
+
+
+def _read_excel(p: pathlib.Path, options: ReadOptions) -> pd.DataFrame:
+    engine = excel_engine()
+    if engine == "calamine":
+        return pd.read_excel(
+            p, engine="calamine", sheet_name=options.sheet, header=options.header, usecols=options.keeps
+        )
+    if p.suffix.lower() == ".xls":  # legacy format: openpyxl cannot read it, leave it to pandas (xlrd)
+        return pd.read_excel(p, sheet_name=options.sheet, header=options.header, usecols=options.keeps)
+    return next(_iter_xlsx_stream(p, options, chunksize=None))
+
+
+def read_tabular(path: str | pathlib.Path, options: ReadOptions | None = None) -> pd.DataFrame:
     'Read CSV or Excel into a DataFrame.'
     p = pathlib.Path(path)
     if not p.exists():
         raise FileNotFoundError(str(p))
+    options = options or ReadOptions()
 
     if p.suffix.lower() in {".csv", ".txt"}:
-        return pd.read_csv(p)
+        return pd.read_csv(p, header=options.header, usecols=options.keeps)
     if p.suffix.lower() in {".xlsx", ".xls"}:
-        return pd.read_excel(p, engine="openpyxl")
+        return _read_excel(p, options)
     raise ValueError(f"Unsupported file type: {p.suffix}")
 
 
+def iter_tabular(path: str | pathlib.Path, chunksize: int, options: ReadOptions | None = None) -> Iterator[pd.DataFrame]:
+    '''
+    Read CSV in chunks of `chunksize` rows; the index keeps counting file rows.
+    .xlsx sheets are streamed in chunks too when read through openpyxl; with
+    calamine (or for .xls) the sheet is read at once and then sliced.
+    '''
+    p = pathlib.Path(path)
+    if not p.exists():
+        raise FileNotFoundError(str(p))
+    options = options or ReadOptions()
+
+    if p.suffix.lower() in {".csv", ".txt"}:
+        with pd.read_csv(p, chunksize=chunksize, header=options.header, usecols=options.keeps) as reader:
+            yield from reader
+        return
+    if p.suffix.lower() == ".xlsx" and excel_engine() == "openpyxl":
+        yield from _iter_xlsx_stream(p, options, chunksize)
+        return
+    df = read_tabular(p, options)
+    for start in range(0, max(len(df), 1), chunksize):
+        yield df.iloc[start : start + chunksize]
+
+
+def write_frame(df: pd.DataFrame, stem: pathlib.Path, fmt: str = "csv") -> pathlib.Path:
+    '''
+    Write `df` to `stem` + the suffix of `fmt` (see OUTPUT_FORMATS): plain or
+    gzipped CSV, or snappy-compressed Parquet (optional extra, needs pyarrow).
+    The file is written next to its final path and renamed over it, so
+    readers see either the previous or the complete new file.
+    '''
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f"Unsupported output format: {fmt} (choose from {', '.join(OUTPUT_FORMATS)})")
+    path = stem.with_name(stem.name + OUTPUT_FORMATS[fmt])
+    tmp = path.with_name(path.name + ".tmp")
+    try:
+        if fmt == "parquet":
+            try:
+                df.to_parquet(tmp, index=False)
+            except ImportError as exc:
+                raise RuntimeError("Parquet output requires 'troel-ops-kit[parquet]' to be installed.") from exc
+        else:
+            df.to_csv(tmp, index=False, compression="gzip" if fmt == "csv.gz" else None)
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+    return path
+
+
 def apply_mapping(df: pd.DataFrame, mapping: Mapping[str, str] | None) -> pd.DataFrame:
     '''
     Rename columns using a mapping dict {expected_name: actual_column_in_file}.
@@ -37,7 +200,91 @@ def ensure_columns(df: pd.DataFrame, required: list[str], df_name: str) -> None:
 
 
 def coerce_dates(df: pd.DataFrame, cols: list[str]) -> pd.DataFrame:
+    'Parse date columns once, as midnight datetime64 (NaT when unparseable).'
     for c in cols:
         if c in df.columns:
-            df[c] = pd.to_datetime(df[c], errors="coerce").dt.date
+            df[c] = pd.to_datetime(df[c], errors="coerce").dt.normalize()
     return df
+
+
+def compact_quantity(s: pd.Series) -> pd.Series:
+    '''
+    Smallest exact numeric dtype for a quantity column: int32 for integers in
+    range, float32 for integral floats whose total stays below 2**24 (every
+    partial sum is then exact), float64 otherwise. Non-numeric cells become NaN.
+    '''
+    v = s if pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s) else pd.to_numeric(s, errors="coerce")
+    if pd.api.types.is_integer_dtype(v):
+        info = np.iinfo(np.int32)
+        if v.empty or (v.min() >= info.min and v.max() <= info.max):
+            return v.astype(np.int32)
+        return v
+    values = v.to_numpy(dtype=np.float64, na_value=np.nan)
+    finite = values[~np.isnan(values)]
+    if np.array_equal(finite, np.round(finite)) and np.abs(finite).sum() < _FLOAT32_EXACT:
+        return pd.Series(values.astype(np.float32), index=s.index, name=s.name)
+    return pd.Series(values, index=s.index, name=s.name)
+
+
+def _sku_labels(s: pd.Series) -> tuple[np.ndarray, pd.Index]:
+    'factorize a sku column; labels as strings (like astype(str)), missing skus coded -1.'
+    codes, uniques = pd.factorize(s)
+    return codes, pd.Index(uniques).astype(str)
+
+
+def _encode_skus(codes: np.ndarray, labels: pd.Index, dtype: pd.CategoricalDtype) -> pd.Categorical:
+    remap = np.append(dtype.categories.get_indexer(labels), -1)  # code -1 (missing) stays -1
+    return pd.Categorical.from_codes(remap[codes], dtype=dtype)
+
+
+@dataclass
+class PreparedDatasets:
+    '''
+    Inputs parsed once into the compact form every KPI works on: datetime64
+    dates, SKUs as categoricals over one sorted dictionary shared by sales,
+    stock and catalog (joins and lookups compare small int codes), and
+    quantities in the narrowest exact dtype (see compact_quantity).
+    '''
+
+    sales: pd.DataFrame  # date, sku, qty
+    stock: pd.DataFrame  # snapshot_date, sku, on_hand_qty
+    catalog: pd.DataFrame  # all catalog columns, sku encoded
+    sku_dtype: pd.CategoricalDtype
+
+    def encode_skus(self, s: pd.Series) -> pd.Series:
+        'Encode another sku column over the shared dictionary (unknown skus -> NaN).'
+        return pd.Series(_encode_skus(*_sku_labels(s), self.sku_dtype), index=s.index, name=s.name)
+
+
+def _as_datetime(s: pd.Series) -> pd.Series:
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return s
+    return pd.to_datetime(s, errors="coerce").dt.normalize()
+
+
+def prepare_datasets(sales: pd.DataFrame, stock: pd.DataFrame, catalog: pd.DataFrame) -> PreparedDatasets:
+    '''
+    Build the PreparedDatasets view of mapped, date-coerced inputs. Only the
+    columns KPIs read are kept for sales and stock; row indexes are preserved.
+    '''
+    labelled = [_sku_labels(df["sku"]) for df in (sales, stock, catalog)]
+    categories = pd.Index(sorted(set().union(*(labels for _, labels in labelled))), dtype="str")
+    sku_dtype = pd.CategoricalDtype(categories)
+    sales_sku, stock_sku, catalog_sku = (_encode_skus(codes, labels, sku_dtype) for codes, labels in labelled)
+
+    return PreparedDatasets(
+        sales=pd.DataFrame(
+            {"date": _as_datetime(sales["date"]), "sku": sales_sku, "qty": compact_quantity(sales["qty"])},
+            index=sales.index,
+        ),
+        stock=pd.DataFrame(
+            {
+                "snapshot_date": _as_datetime(stock["snapshot_date"]),
+                "sku": stock_sku,
+                "on_hand_qty": compact_quantity(stock["on_hand_qty"]),
+            },
+            index=stock.index,
+        ),
+        catalog=catalog.assign(sku=catalog_sku),
+        sku_dtype=sku_dtype,
+    )
@@ -1,116 +1,591 @@
 from __future__ import annotations
 
-from datetime import date, timedelta
+from collections.abc import Sequence
+from datetime import date
 
 import numpy as np
 import pandas as pd
+from pandas.api.indexers import BaseIndexer
+
+from .config import (
+    DEFAULT_AGING_HORIZONS,
+    DEFAULT_CLASSIFICATION,
+    DEFAULT_FORECAST,
+    DEMAND_MODELS,
+    ClassificationConfig,
+    ForecastConfig,
+)
+
+
+def _days(s: pd.Series) -> pd.Series:
+    'Date column as midnight datetime64 (prepared datasets already are).'
+    d = s if pd.api.types.is_datetime64_any_dtype(s) else pd.to_datetime(s)
+    return d.dt.normalize()
+
+
+def _like(days: pd.Series, original: pd.Series) -> pd.Series:
+    'Dates back in the caller representation: datetime64 stays, anything else becomes datetime.date.'
+    return days if pd.api.types.is_datetime64_any_dtype(original) else days.dt.date
+
+
+def _widen(s: pd.Series) -> pd.Series:
+    'Sums of compact (int32 / float32) quantities reported as int64 / float64.'
+    if s.dtype == np.float32:
+        return s.astype(np.float64)
+    return s.astype(np.int64) if s.dtype == np.int32 else s
 
 
 def compute_daily_demand(sales: pd.DataFrame) -> pd.DataFrame:
     'Returns demand per day and sku.'
-    df = sales.copy()
-    df["date"] = pd.to_datetime(df["date"]).dt.date
-    out = df.groupby(["date", "sku"], as_index=False).agg(demand_qty=("qty", "sum"))
+    out = (
+        sales.assign(date=_days(sales["date"]))
+        .groupby(["date", "sku"], as_index=False, observed=True)
+        .agg(demand_qty=("qty", "sum"))
+    )
+    out["date"] = _like(out["date"], sales["date"])
+    out["demand_qty"] = _widen(out["demand_qty"])
     return out
 
 
+def fold_daily_demand(chunk: pd.DataFrame, row_offset: int) -> pd.DataFrame:
+    '''
+    Aggregate one chunk of sales rows by (date, sku), for combine_daily_demand.
+
+    The aggregate keeps demand_qty plus the first file row and the number of
+    rows of each key, so a streamed file never has to be held in memory. Unlike compute_daily_demand,
+    keys with a missing date or sku are kept (their qty still counts for ABC).
+    '''
+    return (
+        chunk.assign(first_row=np.arange(row_offset, row_offset + len(chunk)))
+        .groupby(["date", "sku"], as_index=False, sort=False, dropna=False)
+        .agg(demand_qty=("qty", "sum"), first_row=("first_row", "min"), n_rows=("first_row", "size"))
+    )
+
+
+def combine_daily_demand(parts: pd.DataFrame) -> pd.DataFrame:
+    'One (date, sku) aggregate from stacked fold_daily_demand aggregates, in one groupby.'
+    return parts.groupby(["date", "sku"], as_index=False, sort=False, dropna=False).agg(
+        demand_qty=("demand_qty", "sum"), first_row=("first_row", "min"), n_rows=("n_rows", "sum")
+    )
+
+
+class _SkuBlockWindow(BaseIndexer):
+    'Trailing window of `window_size` rows, clipped to the start of each SKU block.'
+
+    window_size: int
+    block_start: np.ndarray
+
+    def get_window_bounds(
+        self,
+        num_values: int = 0,
+        min_periods: int | None = None,
+        center: bool | None = None,
+        closed: str | None = None,
+        step: int | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        end = np.arange(1, num_values + 1, dtype=np.int64)
+        start = np.maximum(end - self.window_size, self.block_start)
+        return start, end
+
+
 def compute_avg_daily_demand(
     demand: pd.DataFrame, window_days: int = 28, end_date: date | None = None
 ) -> pd.DataFrame:
-    'For each sku, compute rolling average demand/day.'
-    if demand.empty:
+    '''
+    For each sku, compute rolling average demand/day.
+
+    Every SKU gets one row per calendar day from its first sale to
+    max(last sale, end_date), missing days counting as zero demand. All SKUs are
+    laid out back to back in a single flat day x SKU array and the rolling mean
+    runs once over it, with windows clipped at each SKU boundary (min_periods=1).
+    '''
+    day_values = pd.to_datetime(demand["date"]).to_numpy(dtype="datetime64[D]")
+    keep = demand["sku"].notna().to_numpy() & ~np.isnat(day_values)
+    if not keep.any():  # no rows, or none with both a sku and a date
+        return pd.DataFrame(columns=["date", "sku", "avg_daily_demand"])
+    codes, skus = pd.factorize(demand["sku"][keep], sort=True)
+    days = day_values[keep].astype(np.int64)
+    qty = demand["demand_qty"].to_numpy(dtype=float)[keep]
+
+    global_end = days.max()
+    if end_date is not None:
+        global_end = np.datetime64(pd.Timestamp(end_date).date(), "D").astype(np.int64)
+
+    n_skus = len(skus)
+    first = np.full(n_skus, np.iinfo(np.int64).max)
+    last = np.full(n_skus, np.iinfo(np.int64).min)
+    np.minimum.at(first, codes, days)
+    np.maximum.at(last, codes, days)
+    last = np.maximum(last, global_end)
+
+    lengths = last - first + 1
+    offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    total = int(lengths.sum())
+    values = np.bincount(offsets[codes] + (days - first[codes]), weights=qty, minlength=total)
+
+    block_start = np.repeat(offsets, lengths)
+    window = _SkuBlockWindow(window_size=window_days, block_start=block_start)
+    avg = pd.Series(values).rolling(window, min_periods=1).mean()
+
+    sku_idx = np.repeat(np.arange(n_skus), lengths)
+    flat_days = first[sku_idx] + (np.arange(total) - block_start)
+    return pd.DataFrame(
+        {
+            "date": _like(pd.Series(flat_days.astype("datetime64[D]")), demand["date"]),
+            "sku": skus.take(sku_idx),
+            "avg_daily_demand": avg.to_numpy(),
+        }
+    )
+
+
+def compute_avg_daily_demand_asof(
+    demand: pd.DataFrame,
+    first_sale: pd.Series,
+    window_days: int,
+    asof: date,
+    since: date | None = None,
+) -> pd.DataFrame:
+    '''
+    compute_avg_daily_demand for the days from `since` (default: asof) to
+    `asof` only, reading just the demand those windows can see. `first_sale`
+    (sku -> first demand date) keeps the min_periods=1 clipping for SKUs that
+    started selling inside the first window.
+    '''
+    end = pd.Timestamp(asof)
+    first_day = pd.Timestamp(since) if since is not None else end
+    start = first_day - pd.Timedelta(days=window_days - 1)
+    d = pd.to_datetime(demand["date"])
+    recent = demand.loc[(d >= start) & (d <= end), ["date", "sku", "demand_qty"]]
+
+    first = pd.to_datetime(first_sale).dropna()
+    first = first[first <= end]
+    pad = pd.DataFrame({"date": first.where(first >= start, start).to_numpy(), "sku": first.index, "demand_qty": 0.0})
+
+    out = compute_avg_daily_demand(pd.concat([recent, pad], ignore_index=True), window_days, end_date=asof)
+    keep = pd.to_datetime(out["date"])
+    return out[(keep >= first_day) & (keep <= end)].reset_index(drop=True)
+
+
+def forecast_daily_demand(
+    demand: pd.DataFrame, at: Sequence[date], model: str = "ses", alpha: float = 0.1, beta: float = 0.05
+) -> pd.DataFrame:
+    '''
+    Daily demand forecast of every SKU as of each date of `at` (after that
+    day's demand), as (date, sku, avg_daily_demand) rows for the SKUs sold on
+    or before it, ready for compute_coverage_days.
+
+    Each SKU starts at its first sale, days without sales counting as zero
+    demand; forecasts are clipped at zero. The recursions run day by day over
+    all SKUs at once (one array update per calendar day, no per-SKU fit), so
+    the cost is days x SKUs element operations.
+    '''
+    if model not in DEMAND_MODELS[1:]:
+        raise ValueError(f"unknown forecast model {model!r} (choose from {', '.join(DEMAND_MODELS[1:])})")
+    at_days = np.unique(np.array([np.datetime64(pd.Timestamp(d).date(), "D") for d in at], dtype="datetime64[D]"))
+    if demand.empty or not len(at_days):
         return pd.DataFrame(columns=["date", "sku", "avg_daily_demand"])
 
-    df = demand.copy()
-    df["date"] = pd.to_datetime(df["date"])
-    df = df.sort_values(["sku", "date"])
-    global_end = pd.Timestamp(end_date) if end_date is not None else df["date"].max()
-
-    per_sku: list[pd.DataFrame] = []
-    for sku, g in df.groupby("sku", sort=False):
-        sku_end = max(g["date"].max(), global_end)
-        full_range = pd.date_range(start=g["date"].min(), end=sku_end, freq="D")
-        series = (
-            g[["date", "demand_qty"]]
-            .set_index("date")
-            .reindex(full_range, fill_value=0.0)
-            .rename_axis("date")
-        )
-        series["avg_daily_demand"] = series["demand_qty"].rolling(window_days, min_periods=1).mean()
-        series = series.reset_index()
-        series["date"] = series["date"].dt.date
-        series["sku"] = sku
-        per_sku.append(series[["date", "sku", "avg_daily_demand"]])
-
-    return pd.concat(per_sku, ignore_index=True)
+    day_values = pd.to_datetime(demand["date"]).to_numpy(dtype="datetime64[D]")
+    codes, skus = pd.factorize(demand["sku"], sort=True)
+    keep = (codes >= 0) & ~np.isnat(day_values)
+    codes, days = codes[keep], day_values[keep].astype(np.int64)
+    qty = demand["demand_qty"].to_numpy(dtype=float)[keep]
+    order = np.argsort(days, kind="stable")
+    codes, days, qty = codes[order], days[order], qty[order]
+
+    n = len(skus)
+    first = np.full(n, np.iinfo(np.int64).max)
+    np.minimum.at(first, codes, days)
+    start, end = int(days.min()), int(at_days.astype(np.int64).max())
+    bounds = np.searchsorted(days, np.arange(start, end + 2))
+    snapshots = set(at_days.astype(np.int64).tolist())
+
+    level, trend = np.zeros(n), np.zeros(n)  # ses / holt; croston: sizes
+    interval, since = np.ones(n), np.zeros(n)  # croston: smoothed and current inter-demand interval
+    y = np.zeros(n)
+    out_days: list[np.ndarray] = []
+    out_codes: list[np.ndarray] = []
+    out_values: list[np.ndarray] = []
+    for i, day in enumerate(range(start, end + 1)):
+        lo, hi = bounds[i], bounds[i + 1]
+        y[:] = 0.0
+        y[codes[lo:hi]] = qty[lo:hi]
+        new = codes[lo:hi][first[codes[lo:hi]] == day]
+        # SKUs not started yet hold zero state and see zero demand, which the
+        # level and trend updates keep at zero.
+        if model == "ses":
+            level += alpha * (y - level)
+            level[new] = y[new]
+        elif model == "holt":
+            previous = level
+            level = alpha * y + (1 - alpha) * (level + trend)
+            trend += beta * (level - previous - trend)
+            level[new], trend[new] = y[new], 0.0
+        else:
+            since += 1
+            hit = codes[lo:hi][y[codes[lo:hi]] > 0]
+            level[hit] += alpha * (y[hit] - level[hit])
+            interval[hit] += alpha * (since[hit] - interval[hit])
+            since[hit] = 0
+            level[new], interval[new], since[new] = y[new], 1.0, 0
+        if day in snapshots:
+            started = np.flatnonzero(first <= day)
+            if model == "holt":
+                value = level[started] + trend[started]
+            elif model == "ses":
+                value = level[started].copy()
+            else:
+                value = level[started] / interval[started] * (1 - alpha / 2 if model == "sba" else 1.0)
+            out_days.append(np.full(len(started), day))
+            out_codes.append(started)
+            out_values.append(np.maximum(value, 0.0))
+
+    flat_days = np.concatenate(out_days) if out_days else np.zeros(0, dtype=np.int64)
+    sku_idx = np.concatenate(out_codes) if out_codes else np.zeros(0, dtype=np.int64)
+    values = np.concatenate(out_values) if out_values else np.zeros(0)
+    order = np.lexsort((flat_days, sku_idx))
+    return pd.DataFrame(
+        {
+            "date": _like(pd.Series(flat_days[order].astype("datetime64[D]")), demand["date"]),
+            "sku": skus.take(sku_idx[order]),
+            "avg_daily_demand": values[order],
+        }
+    )
+
+
+def compute_demand_forecast(
+    demand: pd.DataFrame,
+    at: Sequence[date],
+    config: ForecastConfig = DEFAULT_FORECAST,
+    classes: pd.Series | None = None,
+) -> pd.DataFrame:
+    '''
+    Daily demand under `config`, for compute_coverage_days / _history at the
+    `at` snapshot dates. `classes` (sku -> ABC class, e.g. compute_abc) picks
+    each SKU's model when `config.by_class` is set; unclassified SKUs use
+    `config.model`. "mean" SKUs get compute_avg_daily_demand rows.
+    '''
+    end = max(pd.Timestamp(d) for d in at).date() if len(at) else None
+    if config.is_mean or classes is None:
+        groups = {config.model: demand}
+    else:
+        skus = demand["sku"].astype(str)
+        lookup = pd.Series(classes.to_numpy(), index=classes.index.astype(str))
+        models = skus.map(lookup).map(config.model_of, na_action="ignore").fillna(config.model)
+        groups = {m: demand[models == m] for m in dict.fromkeys(models)}
+
+    parts = [
+        compute_avg_daily_demand(rows, config.window_days, end_date=end)
+        if model == "mean"
+        else forecast_daily_demand(rows, at, model, config.alpha, config.beta)
+        for model, rows in groups.items()
+    ]
+    return parts[0] if len(parts) == 1 else pd.concat(parts, ignore_index=True)
+
+
+def _join_avg_demand(st: pd.DataFrame, avg_demand: pd.DataFrame) -> pd.DataFrame:
+    '''
+    Attach to each stock row the last avg_daily_demand of its sku on or before
+    its snapshot_date (one sorted as-of join), keeping the stock row order and
+    labels.
+    '''
+    left = st.assign(_t=pd.to_datetime(st["snapshot_date"]).astype("datetime64[ns]"), _pos=np.arange(len(st)))
+    right = avg_demand.assign(_t=pd.to_datetime(avg_demand["date"]).astype("datetime64[ns]"))
+    right = right[["_t", "sku", "avg_daily_demand"]]
+    right = right.dropna(subset=["_t"]).astype({"sku": left["sku"].dtype})
+    df = pd.merge_asof(
+        left.sort_values("_t", kind="stable"),
+        right.sort_values("_t", kind="stable"),
+        on="_t",
+        by="sku",
+        direction="backward",
+    )
+    df = df.sort_values("_pos").set_axis(st.index)
+    df["avg_daily_demand"] = df["avg_daily_demand"].astype(float).fillna(0.0)
+    df["coverage_days"] = np.where(df["avg_daily_demand"] > 0, df["on_hand_qty"] / df["avg_daily_demand"], np.inf)
+    return df[["snapshot_date", "sku", "on_hand_qty", "avg_daily_demand", "coverage_days"]]
 
 
 def compute_coverage_days(stock: pd.DataFrame, avg_demand: pd.DataFrame, asof: date | None = None) -> pd.DataFrame:
     'coverage_days = on_hand_qty / avg_daily_demand.'
-    st = stock.copy()
-    st["snapshot_date"] = pd.to_datetime(st["snapshot_date"]).dt.date
-
-    if asof is None:
-        asof = st["snapshot_date"].max()
-
-    st_asof = st[st["snapshot_date"] == asof].copy()
-    ad = avg_demand.copy()
-    ad["date"] = pd.to_datetime(ad["date"]).dt.date
-    ad_asof = (
-        ad[ad["date"] <= asof]
-        .sort_values(["sku", "date"])
-        .groupby("sku", as_index=False)
-        .tail(1)[["sku", "avg_daily_demand"]]
-    )
+    days = _days(stock["snapshot_date"])
+    asof_day = days.max() if asof is None else pd.Timestamp(asof)
 
-    df = st_asof.merge(ad_asof, how="left", on="sku")
-    df["avg_daily_demand"] = df["avg_daily_demand"].fillna(0.0)
-    df["coverage_days"] = np.where(df["avg_daily_demand"] > 0, df["on_hand_qty"] / df["avg_daily_demand"], np.inf)
-    df = df[["snapshot_date", "sku", "on_hand_qty", "avg_daily_demand", "coverage_days"]]
+    st = stock.assign(snapshot_date=_like(days, stock["snapshot_date"]))
+    df = _join_avg_demand(st[days == asof_day], avg_demand)
     return df.sort_values("coverage_days", ascending=True)
 
 
-def compute_dormant_stock(sales: pd.DataFrame, stock: pd.DataFrame, lookback_days: int = 60) -> pd.DataFrame:
-    'Dormant = stock > 0 and no sales in lookback window.'
-    asof = pd.to_datetime(stock["snapshot_date"]).dt.date.max()
-    start = asof - timedelta(days=lookback_days)
+def compute_coverage_history(stock: pd.DataFrame, avg_demand: pd.DataFrame) -> pd.DataFrame:
+    '''
+    coverage_days for every (snapshot_date, sku) of the stock file at once,
+    i.e. compute_coverage_days for each snapshot without re-scanning avg_demand.
+    '''
+    st = stock.assign(snapshot_date=_like(_days(stock["snapshot_date"]), stock["snapshot_date"]))
+    df = _join_avg_demand(st, avg_demand)
+    return df.sort_values(["snapshot_date", "sku"]).reset_index(drop=True)
 
-    s = sales.copy()
-    s["date"] = pd.to_datetime(s["date"]).dt.date
-    recent = (
-        s[(s["date"] >= start) & (s["date"] <= asof)]
-        .groupby("sku", as_index=False)
-        .agg(sales_lookback_qty=("qty", "sum"))
-    )
 
-    st = stock[stock["snapshot_date"] == asof].copy()
-    out = st.merge(recent, how="left", on="sku")
-    out["sales_lookback_qty"] = out["sales_lookback_qty"].fillna(0.0)
+def compute_sales_recency(sales: pd.DataFrame, asof: date, horizons: Sequence[int]) -> pd.DataFrame:
+    '''
+    Per-SKU recency index of the sales up to `asof`, from one pass over the
+    rows: last_sale (last date with qty > 0) and, for each horizon H,
+    sales_Hd, the qty sold over the H days ending at `asof` (both bounds
+    included, like the dormant window). One row per SKU sold before `asof`,
+    sku in the sales dtype; dormant and aging analyses for any number of
+    horizons are then column lookups.
+    '''
+    horizons = sorted(set(horizons))
+    if not horizons or horizons[0] <= 0:
+        raise ValueError(f"horizons must be positive numbers of days, got {horizons}")
+    days = _days(sales["date"])
+    asof_day = pd.Timestamp(asof)
+    age = (asof_day - days).dt.days.to_numpy(dtype=float, na_value=np.nan)
+    keep = (age >= 0) & sales["sku"].notna().to_numpy()
+
+    codes, uniques = pd.factorize(sales["sku"][keep])
+    qty = np.nan_to_num(pd.to_numeric(sales["qty"], errors="coerce").to_numpy(dtype=float)[keep])
+    ages = age[keep].astype(np.int64)
+    n, k = len(uniques), len(horizons)
+
+    # rings[i]: ages in (horizons[i-1], horizons[i]]; ring k holds older sales (last_sale only).
+    rings = np.searchsorted(horizons, ages, side="left")
+    by_ring = np.bincount(codes * (k + 1) + rings, weights=qty, minlength=n * (k + 1)).reshape(n, k + 1)
+    upto = by_ring[:, :k].cumsum(axis=1)
+    last_age = np.full(n, np.inf)
+    sold = qty > 0
+    np.minimum.at(last_age, codes[sold], ages[sold])
+
+    never = np.isinf(last_age)
+    last_sale = asof_day - pd.to_timedelta(np.where(never, 0, last_age), unit="D")
+    out = pd.DataFrame({"sku": uniques, "last_sale": pd.Series(last_sale).where(~never)})
+    integral = pd.api.types.is_integer_dtype(sales["qty"])
+    for i, h in enumerate(horizons):
+        out[f"sales_{h}d"] = upto[:, i].astype(np.int64) if integral else upto[:, i]
+    return out
+
+
+def compute_dormant_stock(
+    sales: pd.DataFrame,
+    stock: pd.DataFrame,
+    lookback_days: int = 60,
+    recency: pd.DataFrame | None = None,
+    asof: date | None = None,
+) -> pd.DataFrame:
+    '''
+    Dormant = stock > 0 and no sales in lookback window, at the `asof`
+    snapshot (default: the last one). `recency` (from compute_sales_recency,
+    with a `lookback_days` horizon) is built from `sales` when not given.
+    Rows keep their stock row labels.
+    '''
+    snapshot_days = _days(stock["snapshot_date"])
+    asof = snapshot_days.max() if asof is None else pd.Timestamp(asof)
+    col = f"sales_{lookback_days}d"
+    if recency is None or col not in recency.columns:
+        recency = compute_sales_recency(sales, asof, [lookback_days])
+    recent = recency[["sku", col]].rename(columns={col: "sales_lookback_qty"})
+
+    st = stock.loc[snapshot_days == asof, ["snapshot_date", "sku", "on_hand_qty"]]
+    out = st.merge(recent.astype({"sku": st["sku"].dtype}), how="left", on="sku").set_axis(st.index)
+    out["sales_lookback_qty"] = out["sales_lookback_qty"].fillna(0.0).astype(np.float64)
     out = out[(out["on_hand_qty"] > 0) & (out["sales_lookback_qty"] == 0)]
     return out[["snapshot_date", "sku", "on_hand_qty", "sales_lookback_qty"]].sort_values("on_hand_qty", ascending=False)
 
 
-def compute_abc(sales: pd.DataFrame, catalog: pd.DataFrame) -> pd.DataFrame:
+def compute_stock_aging(
+    stock: pd.DataFrame,
+    recency: pd.DataFrame,
+    catalog: pd.DataFrame,
+    horizons: Sequence[int] = DEFAULT_AGING_HORIZONS,
+    asof: date | None = None,
+) -> pd.DataFrame:
+    '''
+    Aging of the stock on hand at the `asof` snapshot (default: the last
+    one), every horizon at once
+    (`recency` from compute_sales_recency must cover them). One row per SKU
+    with on_hand_qty > 0: last sale, days_since_last_sale, sales_Hd and
+    dormant_Hd (nothing sold over H days) per horizon, and aging_bucket, the
+    shortest horizon with sales ("<=30d") or ">365d". stock_value is
+    on_hand_qty * catalog unit_cost (NaN without a cost) and
+    dormant_value_Hd is the stock value of SKUs dormant at H. Oldest stock
+    first (never sold, then by days since last sale), then by value; rows
+    keep their stock row labels.
+    '''
+    horizons = sorted(set(horizons))
+    missing = [h for h in horizons if f"sales_{h}d" not in recency.columns]
+    if missing:
+        raise ValueError(f"recency has no sales for horizons {missing}")
+    snapshot_days = _days(stock["snapshot_date"])
+    asof = snapshot_days.max() if asof is None else pd.Timestamp(asof)
+    st = stock.loc[(snapshot_days == asof) & (stock["on_hand_qty"] > 0), ["snapshot_date", "sku", "on_hand_qty"]]
+    out = st.merge(recency.astype({"sku": st["sku"].dtype}), how="left", on="sku").set_axis(st.index)
+
+    c = catalog if "unit_cost" in catalog.columns else catalog.assign(unit_cost=np.nan)
+    c = c[["sku", "unit_cost"]].dropna(subset=["sku"]).drop_duplicates("sku")
+    out = out.merge(c.astype({"sku": st["sku"].dtype}), how="left", on="sku").set_axis(st.index)
+    out["unit_cost"] = pd.to_numeric(out["unit_cost"], errors="coerce")
+    out["stock_value"] = _widen(out["on_hand_qty"]) * out["unit_cost"]
+    out["days_since_last_sale"] = (asof - out["last_sale"]).dt.days
+
+    bucket = np.full(len(out), f">{horizons[-1]}d", dtype=object)
+    for h in reversed(horizons):
+        out[f"sales_{h}d"] = out[f"sales_{h}d"].fillna(0).astype(recency[f"sales_{h}d"].dtype)
+        sold = out[f"sales_{h}d"].to_numpy() != 0
+        out[f"dormant_{h}d"] = ~sold
+        out[f"dormant_value_{h}d"] = out["stock_value"].where(~sold, 0.0)
+        bucket[sold] = f"<={h}d"
+    out["aging_bucket"] = bucket
+
+    cols = ["snapshot_date", "sku", "on_hand_qty", "unit_cost", "stock_value", "last_sale", "days_since_last_sale"]
+    cols += [f"{name}_{h}d" for name in ("sales", "dormant", "dormant_value") for h in horizons]
+    out = out.sort_values(
+        ["days_since_last_sale", "stock_value"], ascending=False, na_position="first", kind="stable"
+    )
+    return out[[*cols, "aging_bucket"]]
+
+
+def classify(values: np.ndarray, cutoffs: Sequence[float], labels: str) -> np.ndarray:
+    '''
+    labels[i] for values in (cutoffs[i-1], cutoffs[i]] (upper bounds
+    inclusive), vectorized; NaN values get None.
+    '''
+    values = np.asarray(values, dtype=float)
+    out = np.array(list(labels), dtype=object)[np.searchsorted(np.asarray(cutoffs), values, side="left")]
+    out[np.isnan(values)] = None
+    return out
+
+
+def compute_abc(
+    sales: pd.DataFrame, catalog: pd.DataFrame, cutoffs: Sequence[float] = DEFAULT_CLASSIFICATION.abc_cutoffs
+) -> pd.DataFrame:
     'ABC basé sur la valeur de consommation (qty * unit_cost) sur toute la période.'
-    s = sales.copy().groupby("sku", as_index=False).agg(total_qty=("qty", "sum"))
-    c = catalog.copy()
-    if "unit_cost" not in c.columns:
-        c["unit_cost"] = np.nan
+    s = sales.groupby("sku", as_index=False, observed=True).agg(total_qty=("qty", "sum"))
+    s["total_qty"] = _widen(s["total_qty"])
+    c = catalog if "unit_cost" in catalog.columns else catalog.assign(unit_cost=np.nan)
+    c = c[["sku", "unit_cost", "category", "supplier", "description"]].astype({"sku": s["sku"].dtype})
 
-    df = s.merge(c[["sku", "unit_cost", "category", "supplier", "description"]], how="left", on="sku")
+    df = s.merge(c, how="left", on="sku")
     df["unit_cost"] = pd.to_numeric(df["unit_cost"], errors="coerce")
     df["consumption_value"] = np.where(df["unit_cost"].notna(), df["total_qty"] * df["unit_cost"], df["total_qty"])
     df = df.sort_values("consumption_value", ascending=False).reset_index(drop=True)
 
     total = df["consumption_value"].sum()
     df["cum_pct"] = df["consumption_value"].cumsum() / (total if total else 1.0)
+    df["abc"] = classify(df["cum_pct"].to_numpy(), cutoffs, "ABC")
+    return df[["sku", "total_qty", "unit_cost", "consumption_value", "cum_pct", "abc", "category", "supplier", "description"]]
 
-    def abc_bucket(p: float) -> str:
-        if p <= 0.80:
-            return "A"
-        if p <= 0.95:
-            return "B"
-        return "C"
 
-    df["abc"] = df["cum_pct"].apply(abc_bucket)
-    return df[["sku", "total_qty", "unit_cost", "consumption_value", "cum_pct", "abc", "category", "supplier", "description"]]
+def abc_xyz_profile(
+    sales: pd.DataFrame,
+    catalog: pd.DataFrame,
+    config: ClassificationConfig = DEFAULT_CLASSIFICATION,
+    asof: date | None = None,
+) -> pd.DataFrame:
+    '''
+    The per-SKU half of compute_abc_xyz: catalog info, qty_Pd and cv_Pd for
+    every period, one row per SKU sold during the longest period, sorted by
+    SKU. Nothing in it depends on other SKUs, so profiles of disjoint SKU
+    sets can be concatenated before classify_abc_xyz.
+
+    Sales are aggregated once (SKU x period ring for the ABC quantities, exact
+    to the day; SKU x age bucket for XYZ, i.e. the coefficient of variation of
+    demand over the complete buckets of the period, zero-demand buckets
+    included), so no per-period copy of the sales is made.
+    '''
+    periods = sorted(set(config.periods))
+    bucket_days = config.bucket_days
+    days = _days(sales["date"])
+    asof_day = days.max() if asof is None else pd.Timestamp(asof)
+    age = (asof_day - days).dt.days.to_numpy(dtype=float, na_value=np.nan)
+    keep = (age >= 0) & (age < periods[-1]) & sales["sku"].notna().to_numpy()
+
+    codes, uniques = pd.factorize(sales["sku"].to_numpy()[keep], sort=True)
+    skus = pd.Index(uniques).astype(str)
+    qty = pd.to_numeric(sales["qty"], errors="coerce").to_numpy(dtype=float)[keep]
+    qty = np.nan_to_num(qty)  # rows with invalid quantities are reported by validation
+    n = len(skus)
+    n_days = periods[-1]
+
+    # The shared aggregation, two views of the same rows: quantity per SKU and
+    # "ring" (rings[k] = ages in [periods[k-1], periods[k])), running-summed
+    # into per-period totals, and quantity per SKU and age bucket for XYZ.
+    ages = age[keep].astype(np.int64)
+    rings = np.searchsorted(periods, ages, side="right")
+    by_ring = np.bincount(codes * len(periods) + rings, weights=qty, minlength=n * len(periods))
+    qty_upto = by_ring.reshape(n, len(periods)).cumsum(axis=1)
+    n_buckets = -(-n_days // bucket_days)
+    buckets = np.bincount(codes * n_buckets + ages // bucket_days, weights=qty, minlength=n * n_buckets)
+    buckets = buckets.reshape(n, n_buckets)
+
+    c = catalog if "unit_cost" in catalog.columns else catalog.assign(unit_cost=np.nan)
+    c = c.astype({"sku": str}).drop_duplicates("sku").set_index("sku")
+    info = c.reindex(skus)
+
+    out = pd.DataFrame(
+        {
+            "sku": skus,
+            "category": info["category"].to_numpy(),
+            "supplier": info["supplier"].to_numpy(),
+            "description": info["description"].to_numpy(),
+            "unit_cost": pd.to_numeric(info["unit_cost"], errors="coerce").to_numpy(),
+        }
+    )
+    integral = pd.api.types.is_integer_dtype(sales["qty"])
+    for i, p in enumerate(periods):
+        out[f"qty_{p}d"] = qty_upto[:, i].astype(np.int64) if integral else qty_upto[:, i]
+        k = p // bucket_days
+        cv = np.full(n, np.nan)
+        if k:
+            window = buckets[:, :k]
+            mean = window.mean(axis=1)
+            np.divide(window.std(axis=1), mean, out=cv, where=mean > 0)
+        out[f"cv_{p}d"] = cv
+    return out
+
+
+def classify_abc_xyz(profile: pd.DataFrame, config: ClassificationConfig = DEFAULT_CLASSIFICATION) -> pd.DataFrame:
+    '''
+    The cross-SKU half of compute_abc_xyz: consumption value, cumulative
+    share over all SKUs of `profile` and the classes. Per period P the frame
+    has qty_Pd, value_Pd, cum_pct_Pd, abc_Pd, cv_Pd, xyz_Pd and the combined
+    class_Pd ("AX" ... "CZ"); xyz is empty without demand.
+    '''
+    periods = sorted(set(config.periods))
+    n = len(profile)
+    unit_cost = profile["unit_cost"].to_numpy(dtype=float)
+    out = profile[["sku", "category", "supplier", "description", "unit_cost"]].reset_index(drop=True)
+    for p in periods:
+        total_qty = profile[f"qty_{p}d"].to_numpy(dtype=float)
+        value = np.where(np.isnan(unit_cost), total_qty, total_qty * unit_cost)
+        order = np.argsort(-value, kind="stable")
+        total = value.sum()
+        cum_pct = np.empty(n)
+        cum_pct[order] = np.cumsum(value[order]) / (total if total else 1.0)
+        cv = profile[f"cv_{p}d"].to_numpy(dtype=float)
+
+        abc, xyz = classify(cum_pct, config.abc_cutoffs, "ABC"), classify(cv, config.xyz_cutoffs, "XYZ")
+        out[f"qty_{p}d"] = profile[f"qty_{p}d"].to_numpy()
+        out[f"value_{p}d"] = value
+        out[f"cum_pct_{p}d"] = cum_pct
+        out[f"abc_{p}d"] = abc
+        out[f"cv_{p}d"] = cv
+        out[f"xyz_{p}d"] = xyz
+        combined = np.full(n, None, dtype=object)
+        has_xyz = ~pd.isna(xyz)
+        combined[has_xyz] = abc[has_xyz] + xyz[has_xyz]
+        out[f"class_{p}d"] = combined
+    return out
+
+
+def compute_abc_xyz(
+    sales: pd.DataFrame,
+    catalog: pd.DataFrame,
+    config: ClassificationConfig = DEFAULT_CLASSIFICATION,
+    asof: date | None = None,
+) -> pd.DataFrame:
+    '''
+    ABC and XYZ classes for every trailing period of `config` at once, one
+    row per SKU sold during the longest period (ending at `asof`, default:
+    last sale date): classify_abc_xyz of abc_xyz_profile.
+    '''
+    return classify_abc_xyz(abc_xyz_profile(sales, catalog, config, asof), config)
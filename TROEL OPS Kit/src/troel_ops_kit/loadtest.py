@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import http.client
+import itertools
+import json
+import random
+import threading
+import time
+from collections.abc import Sequence
+from dataclasses import dataclass
+from typing import Any
+from urllib.parse import quote, urlsplit
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class LoadTestReport:
+    'Client-side latency (ms) and throughput of a load test.'
+
+    requests: int
+    errors: int
+    concurrency: int
+    seconds: float
+    throughput_rps: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    max_ms: float
+
+
+def _get_json(conn: http.client.HTTPConnection, path: str) -> Any:
+    conn.request("GET", path)
+    resp = conn.getresponse()
+    body = resp.read()
+    if resp.status != 200:
+        raise RuntimeError(f"GET {path} -> HTTP {resp.status}")
+    return json.loads(body)
+
+
+def default_paths(base_url: str, n: int = 200, seed: int = 7) -> list[str]:
+    '''
+    A query mix built from what the server holds: mostly per-SKU lookups,
+    plus per-category summaries and top-N coverage/alert lists.
+    '''
+    url = urlsplit(base_url)
+    conn = http.client.HTTPConnection(url.hostname or "127.0.0.1", url.port or 80, timeout=10)
+    try:
+        categories = _get_json(conn, "/health")["categories"]
+        skus = [row["sku"] for row in _get_json(conn, f"/coverage?n={max(n, 1)}")]
+    finally:
+        conn.close()
+    rng = random.Random(seed)
+    paths: list[str] = []
+    for i in range(n):
+        kind = i % 10
+        if kind < 6 and skus:
+            paths.append(f"/sku/{quote(rng.choice(skus))}")
+        elif kind < 8 and categories:
+            paths.append(f"/category/{quote(rng.choice(categories))}?n=10")
+        elif kind == 8:
+            paths.append("/coverage?n=20")
+        else:
+            paths.append("/alerts?n=20&severity=critical")
+    return paths
+
+
+def run_load_test(base_url: str, paths: Sequence[str], requests: int = 1000, concurrency: int = 8) -> LoadTestReport:
+    '''
+    Send `requests` GETs cycling through `paths` from `concurrency` threads,
+    each on its own keep-alive connection, and report latency percentiles.
+    '''
+    url = urlsplit(base_url)
+    counter = itertools.count()
+    latencies: list[float] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def client() -> None:
+        nonlocal errors
+        conn = http.client.HTTPConnection(url.hostname or "127.0.0.1", url.port or 80, timeout=10)
+        mine: list[float] = []
+        failed = 0
+        try:
+            while (i := next(counter)) < requests:
+                start = time.perf_counter()
+                try:
+                    conn.request("GET", paths[i % len(paths)])
+                    resp = conn.getresponse()
+                    resp.read()
+                    failed += resp.status != 200
+                except (OSError, http.client.HTTPException):
+                    failed += 1
+                    conn.close()  # reconnects on the next request
+                mine.append((time.perf_counter() - start) * 1000)
+        finally:
+            conn.close()
+            with lock:
+                latencies.extend(mine)
+                errors += failed
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    seconds = time.perf_counter() - start
+
+    lat = np.array(latencies) if latencies else np.zeros(1)
+    p50, p95, p99 = np.percentile(lat, [50, 95, 99])
+    return LoadTestReport(
+        requests=len(latencies),
+        errors=errors,
+        concurrency=concurrency,
+        seconds=round(seconds, 3),
+        throughput_rps=round(len(latencies) / seconds, 1) if seconds else 0.0,
+        p50_ms=round(float(p50), 3),
+        p95_ms=round(float(p95), 3),
+        p99_ms=round(float(p99), 3),
+        max_ms=round(float(lat.max()), 3),
+    )
@@ -1,113 +1,763 @@
 from __future__ import annotations
 
+import hashlib
+import json
 import logging
 import pathlib
-from collections.abc import Mapping
-from dataclasses import dataclass
+from collections import Counter
+from collections.abc import Callable, Collection, Mapping, Sequence
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import nullcontext
+from dataclasses import asdict, dataclass, field
+from datetime import UTC, datetime
+from typing import Any
 
 import pandas as pd
 
-from .alerts import DEFAULT_RULES, alerts_to_frame
-from .io import apply_mapping, coerce_dates, ensure_columns, read_tabular
+from . import __version__
+from .alerthistory import AlertHistory
+from .alerts import (
+    DEFAULT_ALERT_CONFIG,
+    RULE_INPUTS,
+    AlertConfig,
+    evaluate_rules,
+    lookback_horizons,
+)
+from .cache import InputCache
+from .config import (
+    DEFAULT_AGING_HORIZONS,
+    DEFAULT_CHUNKSIZE,
+    DEFAULT_CLASSIFICATION,
+    DEFAULT_FORECAST,
+    HISTORY_OUTPUTS,
+    OUTPUT_FORMATS,
+    OUTPUTS,
+    RESULTS_DB_FILE,
+    TABLE_OUTPUTS,
+    ClassificationConfig,
+    ForecastConfig,
+)
+from .io import (
+    FRAME_FORMAT,
+    PreparedDatasets,
+    ReadOptions,
+    apply_mapping,
+    coerce_dates,
+    ensure_columns,
+    iter_tabular,
+    prepare_datasets,
+    read_options,
+    read_tabular,
+    write_frame,
+)
 from .kpis import (
     compute_abc,
+    compute_abc_xyz,
     compute_avg_daily_demand,
+    compute_avg_daily_demand_asof,
     compute_coverage_days,
+    compute_coverage_history,
     compute_daily_demand,
+    compute_demand_forecast,
     compute_dormant_stock,
+    compute_sales_recency,
+    compute_stock_aging,
 )
+from .profiling import METRICS_FILE, RunMetrics, StageRecorder, write_metrics
 from .report import render_markdown
-from .validate import (
-    issues_to_frame,
-    validate_catalog,
-    validate_cross_datasets,
-    validate_sales,
-    validate_stock,
+from .resultsdb import write_results_db
+from .skuindex import SKU_INDEX_FILE, write_sku_index
+from .state import (
+    ISSUES_SPILL_FILE,
+    STATE_FORMAT,
+    SalesFold,
+    SalesState,
+    fold_sales,
+    hash_file,
+    load_state,
+    read_appended_csv,
+    save_state,
 )
+from .validate import issue_counts, issues_frame, sku_dictionary, validate_frame
 
 logger = logging.getLogger(__name__)
 
 
 @dataclass
 class RunResult:
-    coverage: pd.DataFrame
-    abc: pd.DataFrame
-    dormant: pd.DataFrame
-    issues: pd.DataFrame
-    alerts: pd.DataFrame
-    report_path: pathlib.Path
+    coverage: pd.DataFrame | None
+    abc: pd.DataFrame | None
+    dormant: pd.DataFrame | None
+    issues: pd.DataFrame | None
+    alerts: pd.DataFrame | None
+    report_path: pathlib.Path | None
+    metrics: RunMetrics | None = None
+    index_path: pathlib.Path | None = None
+    issue_counts: pd.DataFrame | None = None  # issues_summary: issues per dataset and check
+    aging: pd.DataFrame | None = None
+    alerts_delta: pd.DataFrame | None = None  # new / resolved alerts, with an alert history
+    results_db_path: pathlib.Path | None = None
 
 
-def run(
+def load_input(
+    path: str,
+    mapping: Mapping[str, str] | None,
+    date_cols: list[str],
+    cache: InputCache | None,
+    rec: StageRecorder,
+    options: ReadOptions | None = None,
+) -> pd.DataFrame:
+    'read_tabular + apply_mapping + coerce_dates, served from the input cache when possible.'
+    with rec.stage("read") as m:
+        key = cache.key(path, mapping, date_cols, options) if cache is not None else None
+        cached = cache.get(key) if cache is not None and key is not None else None
+        df = cached if cached is not None else read_tabular(path, options)
+        m.rows += len(df)
+    if cached is not None:
+        logger.info("event=cache_hit path=%s", path)
+        return cached
+
+    with rec.stage("mapping") as m:
+        df = coerce_dates(apply_mapping(df, mapping), date_cols)
+        m.rows += len(df)
+    if cache is not None and key is not None:
+        with rec.stage("writes"):
+            cache.put(key, df)
+    return df
+
+
+def _incremental_sales(
     sales_path: str,
-    stock_path: str,
     catalog_path: str,
-    out_dir: str,
-    mapping: Mapping[str, Mapping[str, str]] | None = None,
-) -> RunResult:
-    out = pathlib.Path(out_dir)
-    out.mkdir(parents=True, exist_ok=True)
-    logger.info("event=start_pipeline out_dir=%s", out)
+    sales_map: Mapping[str, str] | None,
+    known_skus: pd.Index,
+    out: pathlib.Path,
+    chunksize: int,
+    options: ReadOptions | None = None,
+) -> SalesFold:
+    '''
+    Fold only the sales rows appended since the last run, from the state saved
+    under `out`. Falls back to folding the whole file when there is no state,
+    when the kit version, sales mapping, read options or catalog changed, or
+    when the already-folded part of the sales file was modified.
+    '''
+    path = pathlib.Path(sales_path)
+    with open(catalog_path, "rb") as f:
+        catalog_digest = hashlib.file_digest(f, "sha256").hexdigest()
+    fingerprint = {
+        "version": __version__,
+        "format": str(FRAME_FORMAT),
+        "mapping": json.dumps(dict(sales_map or {}), sort_keys=True),
+        "read": json.dumps(asdict(options or ReadOptions()), sort_keys=True),
+        "catalog": catalog_digest,
+        "state": str(STATE_FORMAT),
+    }
+
+    state = load_state(out)
+    offset = state.sales_bytes if state is not None else 0
+    prefix_digest, full_digest, last_byte = hash_file(path, offset)
+
+    reason = ""
+    if state is None:
+        reason = "no_state"
+    elif state.fingerprint != fingerprint:
+        reason = "inputs_changed"
+    elif path.suffix.lower() not in {".csv", ".txt"}:
+        reason = "not_csv"
+    elif offset > path.stat().st_size or prefix_digest != state.sales_sha256 or last_byte != b"\n":
+        reason = "history_changed"
+    elif not state.fold.resume():
+        reason = "issues_missing"
+
+    if state is None or reason:
+        logger.info("event=incremental mode=full reason=%s", reason)
+        fold = fold_sales(SalesFold(spill=out / ISSUES_SPILL_FILE), iter_tabular(path, chunksize, options), sales_map, known_skus)
+    else:
+        logger.info("event=incremental mode=append from_byte=%s", offset)
+        fold = fold_sales(state.fold, read_appended_csv(path, offset, chunksize, options), sales_map, known_skus)
+
+    fold.compact()
+    save_state(out, SalesState(fingerprint, path.stat().st_size, full_digest, fold))
+    return fold
+
+
+@dataclass
+class StageMemo:
+    '''
+    Results kept across the runs of one session (see watch.py). The caller
+    sets `digests` (dataset -> content hash of its file) before each run:
+    inputs whose digest did not change are not re-read, and MEMO_STAGES
+    whose inputs did not change are reused instead of recomputed. Run
+    parameters are part of the keys, but the session is expected to keep
+    them fixed.
+    '''
+
+    digests: dict[str, str] = field(default_factory=dict)
+    inputs: dict[str, tuple[str, pd.DataFrame]] = field(default_factory=dict)
+    stages: dict[str, tuple[str, Any]] = field(default_factory=dict)
+    reused: list[str] = field(default_factory=list)  # stages reused by the last run
+
+
+# What each reusable stage depends on besides the run parameters: input
+# datasets (by digest) and "snapshots", the stock snapshot dates (the
+# demand window, forecast dates and as-of date). A stock-only change that
+# keeps the snapshot dates reuses all of them. Demand forecast per ABC class
+# also depends on the catalog (see RunContext.memo_key).
+MEMO_STAGES: dict[str, tuple[str, ...]] = {
+    "demand": ("sales", "snapshots"),
+    "recency": ("sales", "snapshots"),
+    "abc": ("sales", "catalog"),
+    "abc_xyz": ("sales", "catalog", "snapshots"),
+}
+
+
+@dataclass
+class RunContext:
+    'Run parameters and state shared by the stage functions (of run and sharded.run_sharded).'
+
+    sales_path: str
+    stock_path: str
+    catalog_path: str
+    out: pathlib.Path
+    mapping: Mapping[str, Mapping[str, str]]
+    sales_chunksize: int | None
+    cache: InputCache | None
+    incremental: bool
+    alert_config: AlertConfig
+    rec: StageRecorder
+    output_format: str | Mapping[str, str] = "csv"
+    classification: ClassificationConfig = DEFAULT_CLASSIFICATION
+    aging_horizons: tuple[int, ...] = DEFAULT_AGING_HORIZONS
+    forecast: ForecastConfig = DEFAULT_FORECAST
+    alert_history: AlertHistory | None = None
+    pool: ThreadPoolExecutor | None = None
+    memo: StageMemo | None = None
+    fold: SalesFold | None = None
+    known_skus: pd.Index | None = None  # validate.sku_dictionary of the catalog
+
+    @property
+    def lookbacks(self) -> list[int]:
+        'dead_sku lookback(s), in days.'
+        return lookback_horizons(self.alert_config.params("dead_sku").get("lookback_days", 60))
+
+    @property
+    def lookback_days(self) -> int:
+        'Dormant stock window: the (shortest) dead_sku lookback.'
+        return self.lookbacks[0]
+
+    @property
+    def recency_horizons(self) -> list[int]:
+        'Horizons of the sales recency index: aging horizons plus the dead_sku lookbacks.'
+        return sorted({*self.aging_horizons, *self.lookbacks})
 
-    mapping = mapping or {}
-    sales_map = mapping.get("sales")
-    stock_map = mapping.get("stock")
-    catalog_map = mapping.get("catalog")
+    def format_of(self, output: str) -> str:
+        if isinstance(self.output_format, str):
+            return self.output_format
+        return self.output_format.get(output, "csv")
 
-    sales = apply_mapping(read_tabular(sales_path), sales_map)
-    stock = apply_mapping(read_tabular(stock_path), stock_map)
-    catalog = apply_mapping(read_tabular(catalog_path), catalog_map)
+    def memo_key(self, name: str, data: PreparedDatasets) -> str | None:
+        'Key of a MEMO_STAGES result in this run (None: not reusable, an input has no digest).'
+        assert self.memo is not None
+        parts = [
+            name,
+            repr(
+                (
+                    self.mapping,
+                    self.sales_chunksize,
+                    self.incremental,
+                    self.classification,
+                    self.recency_horizons,
+                    self.forecast,
+                )
+            ),
+        ]
+        deps = MEMO_STAGES[name]
+        if name == "demand" and not self.forecast.is_mean:
+            deps = (*deps, "catalog")
+        for dep in deps:
+            if dep == "snapshots":
+                dates = data.stock["snapshot_date"]
+                parts.append(",".join(str(d) for d in dates.drop_duplicates().sort_values()))
+            elif (digest := self.memo.digests.get(dep)) is None:
+                return None
+            else:
+                parts.append(digest)
+        return "|".join(parts)
+
+
+@dataclass
+class _Inputs:
+    sales: pd.DataFrame  # raw rows, or the (date, sku) fold aggregate
+    stock: pd.DataFrame
+    catalog: pd.DataFrame
+
+
+def _submit(pool: ThreadPoolExecutor | None, fn: Callable[..., Any], *args: Any) -> Future[Any]:
+    'Run `fn` on the I/O pool, or right away (as a completed future) without one.'
+    if pool is not None:
+        return pool.submit(fn, *args)
+    fut: Future[Any] = Future()
+    try:
+        fut.set_result(fn(*args))
+    except Exception as exc:
+        fut.set_exception(exc)
+    return fut
+
+
+def _stage_inputs(ctx: RunContext) -> _Inputs:
+    '''
+    Load the three inputs; with an I/O pool they are read concurrently (the
+    sales fold only waits for the catalog, whose SKUs it checks).
+    '''
+    rec = ctx.rec
+
+    def load(dataset: str, path: str, date_cols: list[str]) -> pd.DataFrame:
+        options = read_options(ctx.mapping, dataset)
+        memo = ctx.memo
+        digest = memo.digests.get(dataset) if memo is not None else None
+        if memo is not None and digest is not None:
+            key = f"{digest}|{ctx.mapping.get(dataset)!r}|{options!r}"
+            if dataset in memo.inputs and memo.inputs[dataset][0] == key:
+                return memo.inputs[dataset][1]
+        df = load_input(path, ctx.mapping.get(dataset), date_cols, ctx.cache, rec, options)
+        if memo is not None and digest is not None:
+            memo.inputs[dataset] = (key, df)
+        return df
+
+    sales_map = ctx.mapping.get("sales")
+    folded = ctx.incremental or bool(ctx.sales_chunksize)
+    stock_f = _submit(ctx.pool, load, "stock", ctx.stock_path, ["snapshot_date"])
+    catalog_f = _submit(ctx.pool, load, "catalog", ctx.catalog_path, [])
+    sales_f = None if folded else _submit(ctx.pool, load, "sales", ctx.sales_path, ["date"])
+
+    catalog = catalog_f.result()
+    ensure_columns(catalog, ["sku"], "catalog")
+    ctx.known_skus = known_skus = sku_dictionary(catalog)
+
+    sales_options = read_options(ctx.mapping, "sales")
+    if sales_f is None:
+        # Chunks are read, mapped, validated and folded in one pass: all of it counts as "read".
+        with rec.stage("read") as m:
+            chunksize = ctx.sales_chunksize or DEFAULT_CHUNKSIZE
+            if ctx.incremental:
+                fold = _incremental_sales(
+                    ctx.sales_path, ctx.catalog_path, sales_map, known_skus, ctx.out, chunksize, sales_options
+                )
+            else:
+                chunks = iter_tabular(ctx.sales_path, chunksize, sales_options)
+                fold = fold_sales(SalesFold(), chunks, sales_map, known_skus)
+            m.rows += fold.n_rows
+        ctx.fold = fold
+        # KPIs only sum qty per sku/date, so the (date, sku) aggregate stands in for raw rows.
+        sales = fold.sales_rows()
+        sales_rows = fold.n_rows
+    else:
+        sales = sales_f.result()
+        ensure_columns(sales, ["date", "sku", "qty"], "sales")
+        sales_rows = len(sales)
+
+    stock = stock_f.result()
+    ensure_columns(stock, ["snapshot_date", "sku", "on_hand_qty"], "stock")
     logger.info(
         "event=ingest sales_rows=%s stock_rows=%s catalog_rows=%s",
-        len(sales),
+        sales_rows,
         len(stock),
         len(catalog),
     )
+    return _Inputs(sales, stock, catalog)
+
+
+def _stage_issues(ctx: RunContext, inputs: _Inputs) -> pd.DataFrame:
+    '''
+    One validation pass per raw input frame, all checks at once (folded sales
+    were checked chunk by chunk). Nothing is capped: every issue is kept.
+    '''
+    if ctx.fold is not None:
+        sales = ctx.fold.issue_frames()
+    else:
+        sales = validate_frame(inputs.sales, "sales", ctx.known_skus)
+    issues = issues_frame(
+        sales + validate_frame(inputs.stock, "stock", ctx.known_skus) + validate_frame(inputs.catalog, "catalog")
+    )
+    logger.info("event=validate issues=%s", len(issues))
+    return issues
+
+
+def _stage_issues_summary(ctx: RunContext, issues: pd.DataFrame) -> pd.DataFrame:
+    counts = issue_counts(issues)
+    logger.info(
+        "event=validate_summary %s",
+        " ".join(f"{r.dataset}.{r.check}={r.issues}" for r in counts.itertuples(index=False)),
+    )
+    return counts
+
+
+def _stage_data(ctx: RunContext, inputs: _Inputs) -> PreparedDatasets:
+    return prepare_datasets(inputs.sales, inputs.stock, inputs.catalog)
+
+
+def _stage_demand(ctx: RunContext, data: PreparedDatasets, abc: pd.DataFrame | None = None) -> pd.DataFrame:
+    '''
+    Daily demand per sku up to the last stock snapshot: the rolling average,
+    or the ctx.forecast models at the snapshot dates (per ABC class with `abc`).
+    '''
+    demand = compute_daily_demand(data.sales)
+    asof = data.stock["snapshot_date"].max().date()
+    window = ctx.forecast.window_days
+    if not ctx.forecast.is_mean:
+        at = [d.date() for d in data.stock["snapshot_date"].drop_duplicates()]
+        classes = abc.set_index("sku")["abc"] if abc is not None else None
+        return compute_demand_forecast(demand, at, ctx.forecast, classes)
+    totals = ctx.fold.totals if ctx.incremental and ctx.fold is not None else None
+    if totals is not None:
+        # Only the trailing window around the stock snapshots matters on incremental runs.
+        first_snapshot = data.stock["snapshot_date"].min().date()
+        return compute_avg_daily_demand_asof(demand, totals["first_sale"], window, asof, since=first_snapshot)
+    return compute_avg_daily_demand(demand, window_days=window, end_date=asof)
+
+
+def _stage_coverage(ctx: RunContext, data: PreparedDatasets, demand: pd.DataFrame) -> pd.DataFrame:
+    return compute_coverage_days(data.stock, demand)
 
-    ensure_columns(sales, ["date", "sku", "qty"], "sales")
-    ensure_columns(stock, ["snapshot_date", "sku", "on_hand_qty"], "stock")
-    ensure_columns(catalog, ["sku"], "catalog")
 
-    sales = coerce_dates(sales, ["date"])
-    stock = coerce_dates(stock, ["snapshot_date"])
-
-    issues = []
-    issues += validate_sales(sales)
-    issues += validate_stock(stock)
-    issues += validate_catalog(catalog)
-    issues += validate_cross_datasets(sales, stock, catalog)
-    issues_df = issues_to_frame(issues)
-    issues_df.to_csv(out / "issues.csv", index=False)
-    logger.info("event=validate issues=%s", len(issues_df))
-
-    demand = compute_daily_demand(sales)
-    asof = pd.to_datetime(stock["snapshot_date"]).dt.date.max()
-    avg = compute_avg_daily_demand(demand, window_days=28, end_date=asof)
-    coverage = compute_coverage_days(stock, avg)
-    dormant = compute_dormant_stock(sales, stock, lookback_days=60)
-    abc = compute_abc(sales, catalog)
-
-    coverage.to_csv(out / "kpi_coverage.csv", index=False)
-    dormant.to_csv(out / "kpi_dormant.csv", index=False)
-    abc.to_csv(out / "kpi_abc.csv", index=False)
-
-    alerts = []
-    alerts += DEFAULT_RULES["low_coverage"](coverage, threshold_days=7.0)
-    alerts += DEFAULT_RULES["dead_sku"](dormant, lookback_days=60)
-    alerts += DEFAULT_RULES["data_quality"](issues_df)
-
-    alerts_df = alerts_to_frame(alerts)
-    alerts_df.to_csv(out / "alerts.csv", index=False)
+def _stage_coverage_history(ctx: RunContext, data: PreparedDatasets, demand: pd.DataFrame) -> pd.DataFrame:
+    return compute_coverage_history(data.stock, demand)
+
+
+def _stage_recency(ctx: RunContext, data: PreparedDatasets) -> pd.DataFrame:
+    'Last sale and trailing sales per SKU for every horizon, up to the last stock snapshot.'
+    asof = data.stock["snapshot_date"].max().date()
+    return compute_sales_recency(data.sales, asof, ctx.recency_horizons)
+
+
+def _stage_dormant(ctx: RunContext, data: PreparedDatasets, recency: pd.DataFrame) -> pd.DataFrame:
+    return compute_dormant_stock(data.sales, data.stock, lookback_days=ctx.lookback_days, recency=recency)
+
+
+def _stage_aging(ctx: RunContext, data: PreparedDatasets, recency: pd.DataFrame) -> pd.DataFrame:
+    aging = compute_stock_aging(data.stock, recency, data.catalog, ctx.recency_horizons)
+    logger.info(
+        "event=aging skus=%s %s",
+        len(aging),
+        " ".join(
+            f"dormant_{h}d={int(aging[f'dormant_{h}d'].sum())}/{aging[f'dormant_value_{h}d'].sum():.2f}"
+            for h in ctx.recency_horizons
+        ),
+    )
+    return aging
+
+
+def _stage_abc(ctx: RunContext, data: PreparedDatasets) -> pd.DataFrame:
+    if ctx.fold is not None:
+        totals = ctx.fold.sales_totals()
+        totals = totals.assign(sku=data.encode_skus(totals["sku"]))
+        return compute_abc(totals, data.catalog, ctx.classification.abc_cutoffs)
+    return compute_abc(data.sales, data.catalog, ctx.classification.abc_cutoffs)
+
+
+def _stage_abc_xyz(ctx: RunContext, data: PreparedDatasets) -> pd.DataFrame:
+    'ABC/XYZ over the trailing periods, up to the last stock snapshot like the demand KPIs.'
+    asof = data.stock["snapshot_date"].max().date()
+    return compute_abc_xyz(data.sales, data.catalog, ctx.classification, asof=asof)
+
+
+def _stage_alerts(ctx: RunContext, **frames: pd.DataFrame) -> pd.DataFrame:
+    alerts_df = evaluate_rules(frames, ctx.alert_config)
     logger.info("event=alerts total_alerts=%s", len(alerts_df))
+    return alerts_df
+
 
-    report_path = render_markdown(coverage, abc, alerts_df, out / "report.md", title="TROEL OPS Kit Report")
+def _stage_alerts_delta(ctx: RunContext, alerts: pd.DataFrame) -> pd.DataFrame:
+    'Record the alerts in ctx.alert_history; new and resolved alerts since the previous run.'
+    assert ctx.alert_history is not None
+    return ctx.alert_history.record(alerts)
+
+
+def _stage_report(ctx: RunContext, coverage: pd.DataFrame, abc: pd.DataFrame, alerts: pd.DataFrame) -> pathlib.Path:
+    tmp = render_markdown(coverage, abc, alerts, ctx.out / "report.md.tmp", title="TROEL OPS Kit Report")
+    report_path = tmp.replace(ctx.out / "report.md")  # atomic: readers never see a half-written report
     logger.info("event=report_written path=%s", report_path)
+    return report_path
+
+
+def _stage_index(
+    ctx: RunContext, coverage: pd.DataFrame, dormant: pd.DataFrame, abc: pd.DataFrame, alerts: pd.DataFrame
+) -> pathlib.Path:
+    index_path = write_sku_index(coverage, dormant, abc, alerts, ctx.out / SKU_INDEX_FILE)
+    logger.info("event=sku_index_written path=%s", index_path)
+    return index_path
+
+
+@dataclass(frozen=True)
+class Stage:
+    '''
+    One node of the run graph, computed as `compute(ctx, **{need: result})`.
+    `metric` is its StageRecorder bucket (None when the stage records its own
+    sub-steps); `output` is the file written when the stage is requested
+    (without suffix: it depends on the output format).
+    '''
+
+    needs: tuple[str, ...]
+    compute: Callable[..., Any]
+    metric: str | None
+    output: str | None = None
+
+
+# Declared in dependency order, which is then a valid execution order for any
+# subset; plan_stages moves up the needs added at run time (abc for per-class demand models).
+STAGES: dict[str, Stage] = {
+    "inputs": Stage((), _stage_inputs, None),
+    "issues": Stage(("inputs",), _stage_issues, "validate", "issues"),
+    "issues_summary": Stage(("issues",), _stage_issues_summary, "validate", "issues_summary"),
+    "data": Stage(("inputs",), _stage_data, "mapping"),
+    "demand": Stage(("data",), _stage_demand, "demand"),  # + abc with per-class forecast models
+    "coverage": Stage(("data", "demand"), _stage_coverage, "coverage", "kpi_coverage"),
+    "coverage_history": Stage(("data", "demand"), _stage_coverage_history, "coverage", "kpi_coverage_history"),
+    "recency": Stage(("data",), _stage_recency, "dormant"),
+    "dormant": Stage(("data", "recency"), _stage_dormant, "dormant", "kpi_dormant"),
+    "aging": Stage(("data", "recency"), _stage_aging, "dormant", "kpi_stock_aging"),
+    "abc": Stage(("data",), _stage_abc, "abc", "kpi_abc"),
+    "abc_xyz": Stage(("data",), _stage_abc_xyz, "abc", "kpi_abc_xyz"),
+    "alerts": Stage((), _stage_alerts, "alerts", "alerts"),  # needs the inputs of the enabled rules
+    "alerts_delta": Stage(("alerts",), _stage_alerts_delta, "alerts", "alerts_delta"),  # with an alert history
+    "report": Stage(("coverage", "abc", "alerts"), _stage_report, "report"),
+    "index": Stage(("coverage", "dormant", "abc", "alerts"), _stage_index, "index"),
+}
+
+
+def write_output(ctx: RunContext, name: str, df: pd.DataFrame) -> pathlib.Path:
+    'Write the `name` output of the run under ctx.out, in its output format.'
+    stem = STAGES[name].output
+    assert stem is not None
+    with ctx.rec.stage("writes") as m:
+        path = write_frame(df, ctx.out / stem, ctx.format_of(name))
+        m.rows += len(df)
+    return path
+
+
+def write_results(ctx: RunContext, wanted: Sequence[str], results: Mapping[str, Any]) -> pathlib.Path:
+    'Load the table outputs of the run into RESULTS_DB_FILE under ctx.out, with the run metadata.'
+    tables = {stem: results[name] for name in wanted if (stem := STAGES[name].output) is not None}
+    metadata = {
+        "kit_version": __version__,
+        "run_at": datetime.now(UTC).isoformat(timespec="seconds"),
+        "sales": ctx.sales_path,
+        "stock": ctx.stock_path,
+        "catalog": ctx.catalog_path,
+        "outputs": ",".join(wanted),
+    }
+    with ctx.rec.stage("writes") as m:
+        path = write_results_db(ctx.out / RESULTS_DB_FILE, tables, metadata)
+        m.rows += sum(len(df) for df in tables.values())
+    return path
+
+
+def _reencode(result: Any, data: PreparedDatasets) -> Any:
+    'A memoized frame with its categorical sku column moved onto the SKU dictionary of this run.'
+    if isinstance(result, pd.DataFrame) and "sku" in result.columns:
+        sku = result["sku"]
+        if isinstance(sku.dtype, pd.CategoricalDtype) and sku.dtype != data.sku_dtype:
+            return result.assign(sku=data.encode_skus(sku))
+    return result
+
+
+def check_outputs(
+    outputs: Collection[str] | None,
+    output_format: str | Mapping[str, str],
+    choices: Sequence[str] = OUTPUTS,
+    history: bool = False,
+) -> tuple[str, ...]:
+    '''
+    The requested outputs (default: all `choices`), after checking them and
+    the output format(s); with an alert `history`, alerts bring HISTORY_OUTPUTS.
+    '''
+    wanted = tuple(choices if outputs is None else outputs)
+    unknown = [o for o in wanted if o not in choices]
+    if unknown:
+        raise ValueError(f"unknown outputs {unknown} (choose from {', '.join(choices)})")
+    formats = {output_format} if isinstance(output_format, str) else set(output_format.values())
+    if bad := sorted(formats - set(OUTPUT_FORMATS)):
+        raise ValueError(f"unknown output formats {bad} (choose from {', '.join(OUTPUT_FORMATS)})")
+    if not isinstance(output_format, str) and (bad := sorted(set(output_format) - set(TABLE_OUTPUTS))):
+        raise ValueError(f"no tabular output named {bad} (choose from {', '.join(TABLE_OUTPUTS)})")
+    if history and "alerts" in wanted:
+        wanted = (*wanted, *HISTORY_OUTPUTS)
+    return wanted
+
+
+def stage_needs(name: str, ctx: RunContext) -> tuple[str, ...]:
+    'The stages `name` takes its inputs from in this run (STAGES needs plus the run-time ones).'
+    if name == "alerts":
+        return tuple(dict.fromkeys(RULE_INPUTS[r.rule] for r in ctx.alert_config.rules if r.enabled))
+    if name == "demand" and ctx.forecast.by_class and not ctx.forecast.is_mean:
+        return (*STAGES[name].needs, "abc")
+    return STAGES[name].needs
+
+
+def plan_stages(outputs: Collection[str], ctx: RunContext) -> list[str]:
+    'Stages the requested outputs depend on, in execution order.'
+    needed: set[str] = set()
+    todo = list(outputs)
+    while todo:
+        name = todo.pop()
+        if name not in needed:
+            needed.add(name)
+            todo.extend(stage_needs(name, ctx))
+    order: list[str] = []
+
+    def place(name: str) -> None:
+        if name not in order:
+            for need in stage_needs(name, ctx):
+                place(need)
+            order.append(name)
+
+    for name in STAGES:
+        if name in needed:
+            place(name)
+    return order
+
+
+def run(
+    sales_path: str,
+    stock_path: str,
+    catalog_path: str,
+    out_dir: str,
+    mapping: Mapping[str, Mapping[str, str]] | None = None,
+    sales_chunksize: int | None = None,
+    cache: InputCache | None = None,
+    incremental: bool = False,
+    profile: bool = False,
+    alert_config: AlertConfig = DEFAULT_ALERT_CONFIG,
+    outputs: Collection[str] | None = None,
+    io_workers: int = 1,
+    output_format: str | Mapping[str, str] = "csv",
+    classification: ClassificationConfig = DEFAULT_CLASSIFICATION,
+    aging_horizons: Sequence[int] = DEFAULT_AGING_HORIZONS,
+    memo: StageMemo | None = None,
+    forecast: ForecastConfig = DEFAULT_FORECAST,
+    alert_history: AlertHistory | None = None,
+    results_db: bool = False,
+) -> RunResult:
+    '''
+    End-to-end run. With `sales_chunksize`, the sales file is streamed in chunks
+    and folded into daily demand on the fly instead of being loaded whole.
+    With `cache`, parsed inputs are reused across runs on unchanged files.
+    With `incremental`, sales are folded into a state kept under `out_dir` and
+    later runs only process rows appended to the sales file; KPIs match a full
+    recompute (up to float rounding of the regrouped sums). `alert_config`
+    selects the alert rules and thresholds; the dead_sku lookback also sets
+    the dormant stock window. `classification` sets the ABC cut-offs and the
+    periods of the ABC/XYZ output; `aging_horizons` the days of the stock
+    aging output (dead_sku lookbacks are added to them). `forecast` selects
+    the daily demand model(s) coverage divides by (default: 28-day mean).
+    With `alert_history`, the alerts of the run are recorded there and the
+    ones new or resolved since the previous recorded run written to
+    alerts_delta. With `results_db`, every table output is also loaded into
+    an indexed SQLite database, results.sqlite, under `out_dir`.
+
+    `outputs` (default: all of OUTPUTS) limits the run to the STAGES those
+    outputs need; RunResult fields of other outputs are None. Every stage runs
+    at most once, and intermediate results (the raw input frames first) are
+    released as soon as their last consumer has run.
+
+    `output_format` is one of OUTPUT_FORMATS for every file, or a mapping
+    {output: format} (unlisted outputs stay CSV). With `io_workers` > 1,
+    the inputs are read concurrently and output files are written by a
+    background pool of that many threads while later stages compute;
+    results are the same as a sequential run.
+
+    With `memo`, unchanged inputs and the results of MEMO_STAGES are kept
+    between runs sharing it (watch mode); outputs are the same as a run
+    without it. Output files are always replaced atomically.
+
+    Every stage is timed into `RunResult.metrics` and metrics.json. With
+    `profile`, stages also run under tracemalloc and cProfile, and the
+    profile of the slowest one is saved as profile_<stage>.prof.
+    '''
+    wanted = check_outputs(outputs, output_format, history=alert_history is not None)
+    out = pathlib.Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    rec = StageRecorder(profile=profile)
+    ctx = RunContext(
+        sales_path,
+        stock_path,
+        catalog_path,
+        out,
+        mapping or {},
+        sales_chunksize,
+        cache,
+        incremental,
+        alert_config,
+        rec,
+        output_format,
+        classification,
+        tuple(aging_horizons),
+        forecast=forecast,
+        alert_history=alert_history,
+        memo=memo,
+    )
+    if memo is not None:
+        memo.reused = []
+    plan = plan_stages(wanted, ctx)
+    logger.info("event=start_pipeline out_dir=%s stages=%s io_workers=%s", out, ",".join(plan), io_workers)
+
+    consumers = Counter(need for name in plan for need in stage_needs(name, ctx))
+    results: dict[str, Any] = {}
+    writes: list[Future[pathlib.Path]] = []
+    with ThreadPoolExecutor(io_workers, thread_name_prefix="troel-io") if io_workers > 1 else nullcontext() as pool:
+        ctx.pool = pool
+        for name in plan:
+            stage = STAGES[name]
+            needs = stage_needs(name, ctx)
+            deps = {need: results[need] for need in needs}
+            key = ctx.memo_key(name, results["data"]) if memo is not None and name in MEMO_STAGES else None
+            if memo is not None and key is not None and memo.stages.get(name, ("",))[0] == key:
+                results[name] = _reencode(memo.stages[name][1], results["data"])
+                memo.reused.append(name)
+                logger.info("event=stage_reused stage=%s", name)
+            elif stage.metric is None:
+                results[name] = stage.compute(ctx, **deps)
+            else:
+                with rec.stage(stage.metric) as m:
+                    results[name] = stage.compute(ctx, **deps)
+                    m.rows += len(results[name]) if isinstance(results[name], pd.DataFrame) else 0
+            if memo is not None and key is not None:
+                memo.stages[name] = (key, results[name])
+            del deps
+            if name in wanted and stage.output is not None:
+                writes.append(_submit(pool, write_output, ctx, name, results[name]))
+            for need in needs:
+                consumers[need] -= 1
+                if consumers[need] == 0 and need not in wanted:
+                    del results[need]
+        for fut in writes:
+            fut.result()  # re-raise the first failed write
+    ctx.pool = None
+    db_path = write_results(ctx, wanted, results) if results_db else None
+
+    metrics = rec.finish()
+    if profile:
+        rec.dump_slowest(out)
+    write_metrics(metrics, out / METRICS_FILE)
+    logger.info(
+        "event=metrics wall_s=%.3f cpu_s=%.3f peak_rss_mb=%s %s",
+        metrics.wall_s,
+        metrics.cpu_s,
+        metrics.peak_rss_mb,
+        " ".join(f"{st.stage}_s={st.wall_s:.3f}" for st in metrics.stages),
+    )
 
     return RunResult(
-        coverage=coverage,
-        abc=abc,
-        dormant=dormant,
-        issues=issues_df,
-        alerts=alerts_df,
-        report_path=report_path,
+        coverage=results.get("coverage"),
+        abc=results.get("abc"),
+        dormant=results.get("dormant"),
+        aging=results.get("aging"),
+        issues=results.get("issues"),
+        alerts=results.get("alerts"),
+        report_path=results.get("report"),
+        metrics=metrics,
+        index_path=results.get("index"),
+        issue_counts=results.get("issues_summary"),
+        alerts_delta=results.get("alerts_delta"),
+        results_db_path=db_path,
     )
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import cProfile
+import json
+import pathlib
+import sys
+import threading
+import time
+import tracemalloc
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+
+try:
+    import resource
+except ImportError:  # Windows: no getrusage, peak RSS is reported as null
+    resource = None  # type: ignore[assignment]
+
+METRICS_FILE = "metrics.json"
+
+
+def peak_rss_mb() -> float | None:
+    'High-water mark of the process resident set size, in MB.'
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024**2 if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KB on Linux
+
+
+@dataclass
+class StageMetrics:
+    '''
+    Accumulated cost of one pipeline stage. `peak_rss_delta_mb` is how much
+    the stage raised the process RSS high-water mark (0 when it stayed under
+    an earlier peak); `peak_alloc_mb` is the tracemalloc peak above the stage
+    start, only measured with profiling on.
+    '''
+
+    stage: str
+    wall_s: float = 0.0
+    cpu_s: float = 0.0
+    peak_rss_delta_mb: float | None = None
+    peak_alloc_mb: float | None = None
+    rows: int = 0
+    calls: int = 0
+
+
+@dataclass
+class RunMetrics:
+    'Per-stage metrics of a run, in first-seen stage order.'
+
+    stages: list[StageMetrics] = field(default_factory=list)
+    wall_s: float = 0.0
+    cpu_s: float = 0.0
+    peak_rss_mb: float | None = None
+    profile_path: str | None = None
+
+    def stage(self, name: str) -> StageMetrics | None:
+        return next((s for s in self.stages if s.stage == name), None)
+
+    def to_dict(self) -> dict[str, object]:
+        return asdict(self)
+
+
+class StageRecorder:
+    '''
+    Times pipeline stages. Wall time, CPU time, RSS high-water mark and row
+    counts are always recorded (a few syscalls per stage). With
+    `profile=True`, each stage also runs under tracemalloc and its own
+    cProfile, and `dump_slowest` saves the profile of the slowest stage.
+
+    Stages may be recorded from several threads at once: their times add up
+    (so a stage can exceed the run wall time), and only main-thread blocks
+    are profiled.
+    '''
+
+    def __init__(self, profile: bool = False) -> None:
+        self.profile = profile
+        self.metrics = RunMetrics()
+        self._profiles: dict[str, cProfile.Profile] = {}
+        self._start = (time.perf_counter(), time.process_time())
+        self._started_tracemalloc = False
+        self._lock = threading.Lock()
+        if profile and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[StageMetrics]:
+        'Record the enclosed block under `name`; set `.rows` on the yielded metrics.'
+        with self._lock:
+            m = self.metrics.stage(name)
+            if m is None:
+                m = StageMetrics(name)
+                self.metrics.stages.append(m)
+
+        rss_before = peak_rss_mb()
+        prof: cProfile.Profile | None = None
+        if self.profile and threading.current_thread() is threading.main_thread():
+            tracemalloc.reset_peak()
+            alloc_before = tracemalloc.get_traced_memory()[0]
+            prof = self._profiles.setdefault(name, cProfile.Profile())
+            prof.enable()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield m
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            if prof is not None:
+                prof.disable()
+            rss_after = peak_rss_mb()
+            with self._lock:
+                m.wall_s += wall
+                m.cpu_s += cpu
+                m.calls += 1
+                if prof is not None:
+                    peak = (tracemalloc.get_traced_memory()[1] - alloc_before) / 1024**2
+                    m.peak_alloc_mb = max(m.peak_alloc_mb or 0.0, peak)
+                if rss_before is not None and rss_after is not None:
+                    m.peak_rss_delta_mb = (m.peak_rss_delta_mb or 0.0) + rss_after - rss_before
+
+    def finish(self) -> RunMetrics:
+        'Close the run totals (and tracemalloc, if this recorder started it).'
+        self.metrics.wall_s = time.perf_counter() - self._start[0]
+        self.metrics.cpu_s = time.process_time() - self._start[1]
+        self.metrics.peak_rss_mb = peak_rss_mb()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+        return self.metrics
+
+    def dump_slowest(self, out_dir: pathlib.Path) -> pathlib.Path | None:
+        'Write the cProfile stats of the slowest stage to profile_<stage>.prof (pstats format).'
+        if not self._profiles:
+            return None
+        slowest = max(
+            (s for s in self.metrics.stages if s.stage in self._profiles),
+            key=lambda s: s.wall_s,
+        )
+        path = out_dir / f"profile_{slowest.stage}.prof"
+        self._profiles[slowest.stage].dump_stats(path)
+        self.metrics.profile_path = str(path)
+        return path
+
+
+def write_metrics(metrics: RunMetrics, path: pathlib.Path) -> pathlib.Path:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(metrics.to_dict(), indent=2), encoding="utf-8")
+    tmp.replace(path)
+    return path
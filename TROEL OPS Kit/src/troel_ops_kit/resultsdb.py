@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import itertools
+import logging
+import os
+import pathlib
+import sqlite3
+import time
+from collections.abc import Mapping
+from contextlib import closing
+from datetime import date, datetime
+from typing import Any
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+INDEXED_COLUMNS = ("sku", "category", "supplier", "abc")
+BATCH_ROWS = 50_000
+
+
+def _sql_type(s: pd.Series) -> str:
+    if pd.api.types.is_bool_dtype(s) or pd.api.types.is_integer_dtype(s):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(s):
+        return "REAL"
+    return "TEXT"
+
+
+def _column_values(s: pd.Series) -> list[Any]:
+    'Python values SQLite binds directly: ISO dates, plain strings and numbers, None for missing.'
+    if pd.api.types.is_datetime64_any_dtype(s):
+        dates = s.dropna()
+        fmt = "%Y-%m-%d" if (dates == dates.dt.normalize()).all() else "%Y-%m-%dT%H:%M:%S"
+        s = s.dt.strftime(fmt)
+    elif isinstance(s.dtype, pd.CategoricalDtype) or not pd.api.types.is_numeric_dtype(s):
+        s = s.astype(object).map(
+            lambda v: v.isoformat() if isinstance(v, (date, datetime)) else v, na_action="ignore"
+        )
+    return s.astype(object).where(s.notna(), None).tolist()
+
+
+def write_results_db(
+    path: pathlib.Path, tables: Mapping[str, pd.DataFrame], metadata: Mapping[str, object]
+) -> pathlib.Path:
+    '''
+    Bulk-load `tables` (table name -> frame) into a new SQLite database at
+    `path`, in batches of BATCH_ROWS rows inside one transaction, then index
+    the INDEXED_COLUMNS of every table and store `metadata` plus the row count
+    of each table in `run_metadata` (key, value). The database is built next
+    to `path` and renamed over it, so readers see the previous or the complete
+    new results.
+    '''
+    start = time.perf_counter()
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.unlink(missing_ok=True)
+    try:
+        with closing(sqlite3.connect(tmp)) as conn:
+            conn.execute("PRAGMA journal_mode=OFF")  # a fresh file, only renamed into place once complete
+            conn.execute("PRAGMA synchronous=OFF")
+            with conn:
+                for name, df in tables.items():
+                    columns = ", ".join(f'"{c}" {_sql_type(df[c])}' for c in df.columns)
+                    conn.execute(f'CREATE TABLE "{name}" ({columns})')
+                    insert = f'INSERT INTO "{name}" VALUES ({", ".join("?" * len(df.columns))})'
+                    rows = zip(*(_column_values(df[c]) for c in df.columns), strict=True)
+                    while batch := list(itertools.islice(rows, BATCH_ROWS)):
+                        conn.executemany(insert, batch)
+                    for column in (c for c in INDEXED_COLUMNS if c in df.columns):
+                        conn.execute(f'CREATE INDEX "{name}_{column}" ON "{name}" ("{column}")')
+                conn.execute("CREATE TABLE run_metadata (key TEXT PRIMARY KEY, value TEXT)")
+                meta = {**metadata, **{f"rows.{name}": len(df) for name, df in tables.items()}}
+                conn.executemany("INSERT INTO run_metadata VALUES (?, ?)", [(k, str(v)) for k, v in meta.items()])
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+    logger.info(
+        "event=results_db path=%s tables=%s rows=%s seconds=%.3f",
+        path,
+        len(tables),
+        sum(len(df) for df in tables.values()),
+        time.perf_counter() - start,
+    )
+    return path
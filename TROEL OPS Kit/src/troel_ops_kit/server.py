@@ -0,0 +1,292 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, cast
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from .alerts import DEFAULT_ALERT_CONFIG, AlertConfig
+from .cache import InputCache
+from .pipeline import run as run_pipeline
+
+logger = logging.getLogger(__name__)
+
+SERVE_OUTPUTS = ("coverage", "dormant", "abc", "alerts")
+DEFAULT_TOP_N = 20
+MAX_TOP_N = 10_000
+
+
+def _records(df: pd.DataFrame) -> list[dict[str, Any]]:
+    'JSON-ready rows: dates as ISO strings, NaN/inf as null.'
+    cols: dict[str, Any] = {}
+    for col in df.columns:
+        s = df[col]
+        if pd.api.types.is_datetime64_any_dtype(s):
+            s = s.dt.strftime("%Y-%m-%d")
+        elif isinstance(s.dtype, pd.CategoricalDtype):
+            s = s.astype(str)
+        elif pd.api.types.is_float_dtype(s):
+            s = s.where(np.isfinite(s))
+        cols[col] = s.astype(object).where(s.notna(), None)
+    return cast(list[dict[str, Any]], pd.DataFrame(cols).to_dict("records"))
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, np.generic):
+        return value.item()
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    raise TypeError(f"not JSON serializable: {type(value).__name__}")
+
+
+@dataclass
+class KpiSnapshot:
+    '''
+    KPI frames of one pipeline run, pre-indexed for point queries: rows are
+    converted to JSON-ready dicts once at load time, so requests only do dict
+    lookups and list slices.
+    '''
+
+    loaded_at: float
+    load_s: float
+    coverage: list[dict[str, Any]]  # lowest coverage first, with abc class and category
+    alerts: list[dict[str, Any]]  # most severe first
+    by_sku: dict[str, dict[str, Any]] = field(default_factory=dict)
+    coverage_by_category: dict[str, list[dict[str, Any]]] = field(default_factory=dict)
+    alerts_by_sku: dict[str, list[dict[str, Any]]] = field(default_factory=dict)
+    alerts_by_category: dict[str, list[dict[str, Any]]] = field(default_factory=dict)
+
+    @classmethod
+    def build(
+        cls, coverage: pd.DataFrame, dormant: pd.DataFrame, abc: pd.DataFrame, alerts: pd.DataFrame, load_s: float
+    ) -> KpiSnapshot:
+        abc_cols = abc[["sku", "abc", "category", "supplier", "description", "total_qty"]].astype({"sku": str})
+        cov = coverage.astype({"sku": str}).merge(abc_cols, how="left", on="sku")
+        cov["dormant"] = cov["sku"].isin(set(dormant["sku"].astype(str)))
+        snap = cls(time.time(), load_s, _records(cov), _records(alerts))
+
+        for row in snap.coverage:
+            snap.by_sku[row["sku"]] = row
+            snap.coverage_by_category.setdefault(str(row["category"]), []).append(row)
+        for row in snap.alerts:
+            snap.alerts_by_sku.setdefault(row["sku"], []).append(row)
+            category = snap.by_sku.get(row["sku"], {}).get("category")
+            if category is not None:  # data quality alerts (sku "*") belong to no category
+                snap.alerts_by_category.setdefault(str(category), []).append(row)
+        return snap
+
+    def health(self) -> dict[str, Any]:
+        return {
+            "status": "ok",
+            "loaded_at": self.loaded_at,
+            "load_s": round(self.load_s, 3),
+            "skus": len(self.coverage),
+            "alerts": len(self.alerts),
+            "categories": sorted(self.coverage_by_category),
+        }
+
+    def sku(self, sku: str) -> dict[str, Any] | None:
+        row = self.by_sku.get(sku)
+        if row is None:
+            return None
+        return {"sku": sku, "coverage": row, "alerts": self.alerts_by_sku.get(sku, [])}
+
+    def category(self, name: str, n: int) -> dict[str, Any] | None:
+        rows = self.coverage_by_category.get(name)
+        if rows is None:
+            return None
+        days = [r["coverage_days"] for r in rows if r["coverage_days"] is not None]
+        return {
+            "category": name,
+            "skus": len(rows),
+            "median_coverage_days": float(np.median(days)) if days else None,
+            "dormant": sum(bool(r["dormant"]) for r in rows),
+            "alerts": len(self.alerts_by_category.get(name, [])),
+            "lowest_coverage": rows[:n],
+        }
+
+    def top_coverage(self, n: int, category: str | None = None) -> list[dict[str, Any]]:
+        rows = self.coverage if category is None else self.coverage_by_category.get(category, [])
+        return rows[:n]
+
+    def top_alerts(
+        self, n: int, severity: str | None = None, code: str | None = None, category: str | None = None
+    ) -> list[dict[str, Any]]:
+        rows = self.alerts if category is None else self.alerts_by_category.get(category, [])
+        if severity is None and code is None:
+            return rows[:n]
+        out: list[dict[str, Any]] = []
+        for row in rows:
+            if (severity is None or row["severity"] == severity) and (code is None or row["code"] == code):
+                out.append(row)
+                if len(out) == n:
+                    break
+        return out
+
+
+class KpiService:
+    '''
+    Runs the pipeline once and keeps the KPI snapshot in memory. `maybe_reload`
+    recomputes it when an input file changed (size or mtime); queries keep
+    being served from the previous snapshot until the new one is swapped in.
+    A failed reload is logged and the previous snapshot stays in place.
+    '''
+
+    def __init__(
+        self,
+        sales_path: str,
+        stock_path: str,
+        catalog_path: str,
+        out_dir: str,
+        mapping: Mapping[str, Mapping[str, str]] | None = None,
+        cache: InputCache | None = None,
+        alert_config: AlertConfig = DEFAULT_ALERT_CONFIG,
+    ) -> None:
+        self.paths = (sales_path, stock_path, catalog_path)
+        self.out_dir = out_dir
+        self.mapping = mapping
+        self.cache = cache
+        self.alert_config = alert_config
+        self.reloads = 0
+        self._lock = threading.Lock()
+        self._seen: tuple[tuple[int, int], ...] | None = None
+        self.snapshot = self._load()
+
+    def signature(self) -> tuple[tuple[int, int], ...]:
+        stats = [os.stat(p) for p in self.paths]
+        return tuple((st.st_size, st.st_mtime_ns) for st in stats)
+
+    def _load(self) -> KpiSnapshot:
+        self._seen = self.signature()
+        start = time.perf_counter()
+        res = run_pipeline(
+            *self.paths,
+            out_dir=self.out_dir,
+            mapping=self.mapping,
+            cache=self.cache,
+            alert_config=self.alert_config,
+            outputs=SERVE_OUTPUTS,
+        )
+        assert res.coverage is not None and res.dormant is not None and res.abc is not None and res.alerts is not None
+        snap = KpiSnapshot.build(res.coverage, res.dormant, res.abc, res.alerts, time.perf_counter() - start)
+        logger.info("event=serve_loaded skus=%s alerts=%s load_s=%.3f", len(snap.coverage), len(snap.alerts), snap.load_s)
+        return snap
+
+    def maybe_reload(self, force: bool = False) -> bool:
+        'Reload when the inputs changed since the last load; True when a new snapshot was swapped in.'
+        with self._lock:
+            try:
+                if not force and self.signature() == self._seen:
+                    return False
+                self.snapshot = self._load()
+            except Exception:
+                logger.exception("event=serve_reload_failed")
+                return False
+            self.reloads += 1
+            return True
+
+    def watch(self, interval_s: float, stop: threading.Event) -> threading.Thread:
+        'Poll the input files every `interval_s` seconds on a daemon thread until `stop` is set.'
+
+        def loop() -> None:
+            while not stop.wait(interval_s):
+                self.maybe_reload()
+
+        thread = threading.Thread(target=loop, name="troel-serve-watch", daemon=True)
+        thread.start()
+        return thread
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive: load tests reuse one connection per client
+    disable_nagle_algorithm = True  # headers and body are separate writes: avoid the 40 ms delayed-ACK stall
+    service: KpiService
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug("event=serve_request " + format, *args)
+
+    def _send(self, status: HTTPStatus, body: Any, started: float) -> None:
+        payload = json.dumps(body, ensure_ascii=False, default=_json_default).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.send_header("Server-Timing", f"app;dur={(time.perf_counter() - started) * 1000:.3f}")
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self) -> None:
+        started = time.perf_counter()
+        url = urlsplit(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        parts = [unquote(p) for p in url.path.strip("/").split("/") if p]
+        snap = self.service.snapshot  # one consistent snapshot per request, even during a reload
+        try:
+            n = int(query.get("n", DEFAULT_TOP_N))
+        except ValueError:
+            self._send(HTTPStatus.BAD_REQUEST, {"error": "n must be an integer"}, started)
+            return
+        n = max(0, min(n, MAX_TOP_N))
+
+        body: Any = None
+        if parts == ["health"]:
+            body = snap.health()
+        elif len(parts) == 2 and parts[0] == "sku":
+            body = snap.sku(parts[1])
+        elif len(parts) == 2 and parts[0] == "category":
+            body = snap.category(parts[1], n)
+        elif parts == ["coverage"]:
+            body = snap.top_coverage(n, query.get("category"))
+        elif parts == ["alerts"]:
+            body = snap.top_alerts(n, query.get("severity"), query.get("code"), query.get("category"))
+        else:
+            self._send(HTTPStatus.NOT_FOUND, {"error": f"unknown endpoint {url.path}"}, started)
+            return
+        if body is None:
+            self._send(HTTPStatus.NOT_FOUND, {"error": f"not found: {parts[1]}"}, started)
+            return
+        self._send(HTTPStatus.OK, body, started)
+
+    def do_POST(self) -> None:
+        started = time.perf_counter()
+        if urlsplit(self.path).path.strip("/") != "reload":
+            self._send(HTTPStatus.NOT_FOUND, {"error": f"unknown endpoint {self.path}"}, started)
+            return
+        reloaded = self.service.maybe_reload(force=True)
+        self._send(HTTPStatus.OK, {"reloaded": reloaded, **self.service.snapshot.health()}, started)
+
+
+def make_server(service: KpiService, host: str = "127.0.0.1", port: int = 8765) -> ThreadingHTTPServer:
+    '''
+    HTTP/JSON front of `service` (one thread per connection):
+    GET /health, /sku/<sku>, /category/<name>?n=, /coverage?n=&category=,
+    /alerts?n=&severity=&code=&category=; POST /reload forces a reload.
+    '''
+    handler = type("KpiHandler", (_Handler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def serve(service: KpiService, host: str, port: int, reload_interval_s: float | None = 2.0) -> None:
+    'Serve until interrupted, hot-reloading changed inputs every `reload_interval_s` seconds (None: never).'
+    stop = threading.Event()
+    if reload_interval_s:
+        service.watch(reload_interval_s, stop)
+    server = make_server(service, host, port)
+    logger.info("event=serve_start url=http://%s:%s", *server.server_address[:2])
+    try:
+        server.serve_forever()
+    finally:
+        stop.set()
+        server.server_close()
+
@@ -0,0 +1,436 @@
+from __future__ import annotations
+
+import logging
+import pathlib
+import pickle
+import tempfile
+import time
+from collections.abc import Collection, Iterable, Mapping, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from dataclasses import dataclass
+from datetime import date
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from .alerthistory import AlertHistory
+from .alerts import DEFAULT_ALERT_CONFIG, AlertConfig, low_coverage_streak_rows
+from .config import (
+    DEFAULT_AGING_HORIZONS,
+    DEFAULT_CHUNKSIZE,
+    DEFAULT_CLASSIFICATION,
+    DEFAULT_FORECAST,
+    ClassificationConfig,
+    ForecastConfig,
+)
+from .io import (
+    apply_mapping,
+    coerce_dates,
+    ensure_columns,
+    iter_tabular,
+    prepare_datasets,
+    read_options,
+    read_tabular,
+)
+from .kpis import (
+    abc_xyz_profile,
+    classify_abc_xyz,
+    compute_abc,
+    compute_avg_daily_demand,
+    compute_coverage_days,
+    compute_coverage_history,
+    compute_daily_demand,
+    compute_demand_forecast,
+    compute_dormant_stock,
+    compute_sales_recency,
+    compute_stock_aging,
+)
+from .pipeline import (
+    OUTPUTS,
+    STAGES,
+    RunContext,
+    RunResult,
+    check_outputs,
+    plan_stages,
+    stage_needs,
+    write_output,
+    write_results,
+)
+from .profiling import METRICS_FILE, StageRecorder, write_metrics
+from .validate import issues_frame, sku_dictionary, validate_frame
+
+logger = logging.getLogger(__name__)
+
+DATASETS = ("sales", "stock", "catalog")
+REQUIRED = {"sales": ["date", "sku", "qty"], "stock": ["snapshot_date", "sku", "on_hand_qty"], "catalog": ["sku"]}
+QUANTITY = {"sales": "qty", "stock": "on_hand_qty"}
+DATE_COLUMNS = {"sales": ["date"], "stock": ["snapshot_date"], "catalog": []}
+
+# Stages computed on every shard and merged; the other stages of the plan
+# (issues_summary, alerts, report, index) run once on the merged frames.
+# coverage_history is only computed for the low_coverage_streak alerts (the
+# rows the rule reads): the full history is as large as the stock file.
+SHARD_STAGES = ("issues", "coverage", "coverage_history", "dormant", "aging", "abc", "abc_xyz")
+# Stages computed once, after the merge, from the merged per-SKU results.
+MERGED_STAGES = ("issues_summary", "alerts", "alerts_delta", "report", "index")
+SHARDED_OUTPUTS = tuple(o for o in OUTPUTS if o != "coverage_history")
+
+
+def shard_of(skus: pd.Series, n_shards: int) -> np.ndarray:
+    '''
+    Shard of every row: a stable hash of its SKU label (as str, like the SKU
+    dictionary of prepare_datasets), the same in every process and run.
+    Rows without a SKU go to shard 0.
+    '''
+    codes, uniques = pd.factorize(skus)
+    labels = pd.Index(uniques).astype(str).to_numpy(dtype=object)
+    per_label = (pd.util.hash_array(labels) % np.uint64(n_shards)).astype(np.int64)
+    return np.append(per_label, 0)[codes]
+
+
+@dataclass
+class _Partition:
+    'What the partition pass learned about one dataset.'
+
+    rows: int
+    empty: pd.DataFrame  # columns and dtypes of the first chunk, for shards without rows
+    integral: bool  # the quantity column parsed as integers in every chunk
+    max_date: pd.Timestamp | None = None
+
+
+def _partition(
+    chunks: Iterable[pd.DataFrame],
+    dataset: str,
+    mapping: Mapping[str, str] | None,
+    n_shards: int,
+    shard_dir: pathlib.Path,
+) -> _Partition:
+    '''
+    Stream `chunks` into one file of pickled frames per shard. Chunks are
+    mapped and date-coerced like whole inputs; rows keep their file row
+    number as index label (issue rows, stock row order).
+    '''
+    rows, integral, max_date, empty = 0, True, None, None
+    with ExitStack() as stack:
+        files = [stack.enter_context(open(shard_dir / f"{dataset}-{i}.pkl", "wb")) for i in range(n_shards)]
+        for chunk in chunks:
+            chunk = coerce_dates(apply_mapping(chunk, mapping), DATE_COLUMNS[dataset])
+            ensure_columns(chunk, REQUIRED[dataset], dataset)
+            if empty is None:
+                empty = chunk.iloc[:0]
+            rows += len(chunk)
+            if dataset in QUANTITY:
+                integral &= pd.api.types.is_integer_dtype(chunk[QUANTITY[dataset]])
+            if DATE_COLUMNS[dataset] and chunk[DATE_COLUMNS[dataset][0]].notna().any():
+                chunk_max = chunk[DATE_COLUMNS[dataset][0]].max()
+                max_date = chunk_max if max_date is None else max(max_date, chunk_max)
+            ids = shard_of(chunk["sku"], n_shards)
+            order = np.argsort(ids, kind="stable")  # rows of a shard stay in file order
+            bounds = np.searchsorted(ids[order], np.arange(n_shards + 1))
+            for shard in range(n_shards):
+                if bounds[shard] < bounds[shard + 1]:
+                    part = chunk.iloc[order[bounds[shard] : bounds[shard + 1]]]
+                    pickle.dump(part, files[shard], protocol=pickle.HIGHEST_PROTOCOL)
+    if empty is None:
+        raise ValueError(f"{dataset}: empty file")
+    logger.info("event=partition dataset=%s rows=%s shards=%s", dataset, rows, n_shards)
+    return _Partition(rows, empty, integral, max_date)
+
+
+@dataclass(frozen=True)
+class _ShardTask:
+    'Everything a worker needs to compute one shard (pickled to the process pool).'
+
+    shard: int
+    shard_dir: str
+    partitions: dict[str, _Partition]
+    stages: tuple[str, ...]
+    asof: date
+    lookback_days: int
+    horizons: tuple[int, ...]
+    classification: ClassificationConfig
+    streak_params: dict[str, Any]
+    forecast: ForecastConfig = DEFAULT_FORECAST
+    classes: pd.Series | None = None  # sku -> ABC class, for per-class forecast models
+
+
+def _read_shard(task: _ShardTask, dataset: str) -> pd.DataFrame:
+    parts: list[pd.DataFrame] = []
+    with open(pathlib.Path(task.shard_dir) / f"{dataset}-{task.shard}.pkl", "rb") as f:
+        while True:
+            try:
+                parts.append(pickle.load(f))
+            except EOFError:
+                break
+    return pd.concat(parts) if parts else task.partitions[dataset].empty
+
+
+def _run_shard(task: _ShardTask) -> dict[str, Any]:
+    '''
+    Worker entry point: the SHARD_STAGES of one shard, from its files only.
+    Dates and quantities are read as the whole file would have been (as-of
+    date of all the stock, float quantities if any chunk had some), so every
+    per-SKU result is the one of an unsharded run.
+    '''
+    start = time.perf_counter()
+    frames = {dataset: _read_shard(task, dataset) for dataset in DATASETS}
+    out: dict[str, Any] = {}
+    if "issues" in task.stages:
+        known_skus = sku_dictionary(frames["catalog"])
+        out["issues"] = validate_frame(frames["sales"], "sales", known_skus) + validate_frame(
+            frames["stock"], "stock", known_skus
+        )
+    for dataset, col in QUANTITY.items():
+        if not task.partitions[dataset].integral:
+            frames[dataset][col] = pd.to_numeric(frames[dataset][col], errors="coerce").astype(np.float64)
+    data = prepare_datasets(frames["sales"], frames["stock"], frames["catalog"])
+    del frames
+    out["skus"] = data.sku_dtype.categories
+
+    stages = set(task.stages)
+    if stages & {"coverage", "coverage_history"}:
+        demand = compute_daily_demand(data.sales)
+        if task.forecast.is_mean:
+            demand = compute_avg_daily_demand(demand, window_days=task.forecast.window_days, end_date=task.asof)
+        else:
+            # This shard's snapshot dates are those its stock rows are joined at.
+            at = [d.date() for d in data.stock["snapshot_date"].dropna().drop_duplicates()]
+            demand = compute_demand_forecast(demand, at, task.forecast, task.classes)
+        if "coverage" in stages:
+            out["coverage"] = compute_coverage_days(data.stock, demand, asof=task.asof)
+        if "coverage_history" in stages:
+            history = compute_coverage_history(data.stock, demand)
+            out["coverage_history"] = low_coverage_streak_rows(history, **task.streak_params)
+    if stages & {"dormant", "aging"}:
+        recency = compute_sales_recency(data.sales, task.asof, task.horizons)
+        if "dormant" in stages:
+            out["dormant"] = compute_dormant_stock(
+                data.sales, data.stock, lookback_days=task.lookback_days, recency=recency, asof=task.asof
+            )
+        if "aging" in stages:
+            out["aging"] = compute_stock_aging(data.stock, recency, data.catalog, task.horizons, asof=task.asof)
+    if "abc" in stages:
+        # Per-SKU totals only: the cumulative shares need every SKU (see _merge).
+        totals = compute_abc(data.sales, data.catalog)[["sku", "total_qty"]]
+        out["abc"] = totals.rename(columns={"total_qty": "qty"})
+    if "abc_xyz" in stages:
+        out["abc_xyz"] = abc_xyz_profile(data.sales, data.catalog, task.classification, asof=task.asof)
+    logger.info(
+        "event=shard_done shard=%s sales_rows=%s stock_rows=%s seconds=%.3f",
+        task.shard,
+        len(data.sales),
+        len(data.stock),
+        time.perf_counter() - start,
+    )
+    return out
+
+
+def _merge(
+    name: str, parts: list[Any], sku_dtype: pd.CategoricalDtype, catalog: pd.DataFrame, ctx: RunContext
+) -> Any:
+    '''
+    One result of an unsharded run from its per-shard parts. Frames that
+    follow the stock row order are put back in file row order (their index)
+    before the final sort of their KPI, so ties come out as in a whole run.
+    '''
+    if name == "issues":
+        return issues_frame([*(f for p in parts for f in p), *validate_frame(catalog, "catalog")])
+    if name == "abc_xyz":
+        profile = pd.concat(parts, ignore_index=True).sort_values("sku", kind="stable")
+        return classify_abc_xyz(profile, ctx.classification)
+
+    df = pd.concat([p.assign(sku=p["sku"].astype(sku_dtype)) for p in parts])
+    if name == "abc":
+        encoded = catalog.assign(sku=catalog["sku"].astype(str).astype(sku_dtype))
+        return compute_abc(df, encoded, ctx.classification.abc_cutoffs)
+    df = df.sort_index(kind="stable")
+    if name == "coverage":  # as compute_coverage_days
+        return df.sort_values("coverage_days", ascending=True)
+    if name == "dormant":  # as compute_dormant_stock
+        return df.sort_values("on_hand_qty", ascending=False)
+    if name == "aging":  # as compute_stock_aging
+        return df.sort_values(
+            ["days_since_last_sale", "stock_value"], ascending=False, na_position="first", kind="stable"
+        )
+    return df  # coverage_history rows for the alerts: the rule sorts them
+
+
+def run_sharded(
+    sales_path: str,
+    stock_path: str,
+    catalog_path: str,
+    out_dir: str,
+    shards: int,
+    workers: int = 1,
+    mapping: Mapping[str, Mapping[str, str]] | None = None,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    profile: bool = False,
+    alert_config: AlertConfig = DEFAULT_ALERT_CONFIG,
+    outputs: Collection[str] | None = None,
+    output_format: str | Mapping[str, str] = "csv",
+    classification: ClassificationConfig = DEFAULT_CLASSIFICATION,
+    aging_horizons: Sequence[int] = DEFAULT_AGING_HORIZONS,
+    work_dir: str | None = None,
+    forecast: ForecastConfig = DEFAULT_FORECAST,
+    alert_history: AlertHistory | None = None,
+    results_db: bool = False,
+) -> RunResult:
+    '''
+    Out-of-core run for inputs larger than memory. Sales and stock are
+    streamed in chunks of `chunksize` rows and hash-partitioned by SKU into
+    `shards` files each (the catalog, one row per SKU, is read whole and
+    split too), under a temporary folder of `work_dir` (default: out_dir)
+    removed at the end. Every shard then holds all the rows of its SKUs:
+    validation, demand, coverage, recency, dormant stock, aging and the
+    per-SKU ABC and ABC/XYZ aggregates run on one shard at a time, on
+    `workers` processes. A merge pass puts the per-SKU results together and
+    computes what spans SKUs: the ABC cumulative shares, the alerts, the
+    report and the index. Demand models per ABC class take one more pass
+    over the shards, for the ABC classes of all SKUs before the coverage.
+
+    Peak memory is about `workers` shards plus the per-SKU results, instead
+    of the whole sales history. Outputs are those of pipeline.run on the
+    same files (same rows, values and order), except coverage_history,
+    which is not produced. Other arguments are as in pipeline.run.
+    '''
+    if shards < 1:
+        raise ValueError(f"shards must be a positive number, got {shards}")
+    if outputs is not None and "coverage_history" in outputs:
+        raise ValueError("coverage_history is not available in sharded runs")
+    wanted = check_outputs(outputs, output_format, SHARDED_OUTPUTS, history=alert_history is not None)
+    out = pathlib.Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    mapping = mapping or {}
+    rec = StageRecorder(profile=profile)
+    ctx = RunContext(
+        sales_path,
+        stock_path,
+        catalog_path,
+        out,
+        mapping,
+        chunksize,
+        None,
+        False,
+        alert_config,
+        rec,
+        output_format,
+        classification,
+        tuple(aging_horizons),
+        forecast=forecast,
+        alert_history=alert_history,
+    )
+    plan = plan_stages(wanted, ctx)
+    logger.info(
+        "event=start_sharded out_dir=%s shards=%s workers=%s stages=%s", out, shards, workers, ",".join(plan)
+    )
+
+    with tempfile.TemporaryDirectory(prefix="troel-shards-", dir=work_dir or out) as tmp:
+        shard_dir = pathlib.Path(tmp)
+        with rec.stage("partition") as m:
+            catalog = coerce_dates(
+                apply_mapping(read_tabular(catalog_path, read_options(mapping, "catalog")), mapping.get("catalog")), []
+            )
+            partitions = {
+                "catalog": _partition([catalog], "catalog", None, shards, shard_dir),
+                **{
+                    dataset: _partition(
+                        iter_tabular(path, chunksize, read_options(mapping, dataset)),
+                        dataset,
+                        mapping.get(dataset),
+                        shards,
+                        shard_dir,
+                    )
+                    for dataset, path in (("sales", sales_path), ("stock", stock_path))
+                },
+            }
+            m.rows += sum(p.rows for p in partitions.values())
+        max_date = partitions["stock"].max_date
+        if max_date is None:
+            raise ValueError("stock: no valid snapshot_date")
+
+        def shard_pass(stages: tuple[str, ...], classes: pd.Series | None = None) -> list[dict[str, Any]]:
+            tasks = [
+                _ShardTask(
+                    shard,
+                    str(shard_dir),
+                    partitions,
+                    stages,
+                    max_date.date(),
+                    ctx.lookback_days,
+                    tuple(ctx.recency_horizons),
+                    classification,
+                    dict(alert_config.params("low_coverage_streak")),
+                    forecast,
+                    classes,
+                )
+                for shard in range(shards)
+            ]
+            with rec.stage("shards") as m:
+                if workers > 1:
+                    with ProcessPoolExecutor(max_workers=workers) as pool:
+                        results = list(pool.map(_run_shard, tasks))
+                else:
+                    results = [_run_shard(task) for task in tasks]
+                m.rows += partitions["sales"].rows + partitions["stock"].rows
+            return results
+
+        def merge(names: Iterable[str], results: list[dict[str, Any]]) -> None:
+            with rec.stage("merge") as m:
+                categories = pd.Index(sorted(set().union(*(r["skus"] for r in results))), dtype="str")
+                sku_dtype = pd.CategoricalDtype(categories)
+                for name in names:
+                    merged[name] = _merge(name, [r.pop(name) for r in results], sku_dtype, catalog, ctx)
+                    m.rows += len(merged[name]) if isinstance(merged[name], pd.DataFrame) else 0
+
+        merged: dict[str, Any] = {}
+        stages = tuple(s for s in SHARD_STAGES if s in plan)
+        classes = None
+        if "demand" in plan and "abc" in stage_needs("demand", ctx):
+            merge(["abc"], shard_pass(("abc",)))
+            classes = pd.Series(merged["abc"]["abc"].to_numpy(), index=merged["abc"]["sku"].astype(str))
+            stages = tuple(s for s in stages if s != "abc")
+        merge(stages, shard_pass(stages, classes))
+
+    for name in plan:
+        stage = STAGES[name]
+        if name in MERGED_STAGES:
+            assert stage.metric is not None
+            with rec.stage(stage.metric):
+                merged[name] = stage.compute(ctx, **{need: merged[need] for need in stage_needs(name, ctx)})
+        elif name not in SHARD_STAGES:
+            continue
+        if name in wanted and stage.output is not None:
+            write_output(ctx, name, merged[name])
+    db_path = write_results(ctx, wanted, merged) if results_db else None
+
+    metrics = rec.finish()
+    if profile:
+        rec.dump_slowest(out)
+    write_metrics(metrics, out / METRICS_FILE)
+    logger.info(
+        "event=metrics wall_s=%.3f cpu_s=%.3f peak_rss_mb=%s %s",
+        metrics.wall_s,
+        metrics.cpu_s,
+        metrics.peak_rss_mb,
+        " ".join(f"{st.stage}_s={st.wall_s:.3f}" for st in metrics.stages),
+    )
+
+    def result(name: str) -> Any:
+        return merged.get(name) if name in wanted else None
+
+    return RunResult(
+        coverage=result("coverage"),
+        abc=result("abc"),
+        dormant=result("dormant"),
+        aging=result("aging"),
+        issues=result("issues"),
+        alerts=result("alerts"),
+        report_path=result("report"),
+        metrics=metrics,
+        index_path=result("index"),
+        issue_counts=result("issues_summary"),
+        alerts_delta=result("alerts_delta"),
+        results_db_path=db_path,
+    )
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import json
+import math
+import mmap
+import os
+import pathlib
+import struct
+from typing import TYPE_CHECKING, Any
+
+from . import __version__
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+SKU_INDEX_FILE = "sku_index.bin"
+MAGIC = b"TROELIDX"
+VERSION = 1
+_HEADER = struct.Struct("<IIII")  # version, n_skus, key_width, meta_len
+# on_hand_qty, avg_daily_demand, coverage_days, dormant, abc, extras offset, extras length
+_RECORD = struct.Struct("<dddB1sQI")
+FIELDS = ("on_hand_qty", "avg_daily_demand", "coverage_days", "dormant", "abc", "category", "description", "alerts")
+
+
+def write_sku_index(
+    coverage: pd.DataFrame,
+    dormant: pd.DataFrame,
+    abc: pd.DataFrame,
+    alerts: pd.DataFrame,
+    path: pathlib.Path,
+) -> pathlib.Path:
+    '''
+    Write the per-SKU results of a run to one binary file, sorted by SKU:
+
+        MAGIC | version, n, key_width, meta_len | meta JSON
+        | n keys (UTF-8, NUL-padded to key_width)
+        | n fixed-size records (_RECORD)
+        | extras blob (per-SKU JSON: category, description, alerts)
+
+    Every SKU of the coverage or ABC table gets a record (NaN where one of
+    them has no row). The file is written next to `path` and renamed over
+    it, so readers never see a partial index.
+    '''
+    import numpy as np
+
+    cov = coverage[["sku", "on_hand_qty", "avg_daily_demand", "coverage_days"]].astype({"sku": str})
+    cls = abc[["sku", "abc", "category", "description"]].astype({"sku": str})
+    df = cov.merge(cls, how="outer", on="sku").drop_duplicates("sku", keep="first")
+    keys = df["sku"].str.encode("utf-8")
+    order = np.argsort(keys.to_numpy(dtype=object).astype(bytes), kind="stable")
+    df, keys = df.iloc[order].reset_index(drop=True), keys.iloc[order].reset_index(drop=True)
+    dormant_skus = set(dormant["sku"].astype(str))
+
+    per_sku: dict[str, list[Any]] = {}
+    alert_rows = alerts.assign(asof=alerts["asof"].astype(str), sku=alerts["sku"].astype(str))
+    for row in alert_rows[["sku", "code", "severity", "message", "metric", "asof"]].to_dict("records"):
+        per_sku.setdefault(str(row.pop("sku")), []).append(row)
+
+    blob = bytearray()
+    records = bytearray()
+    for sku, on_hand, avg, days, klass, category, description in df[
+        ["sku", "on_hand_qty", "avg_daily_demand", "coverage_days", "abc", "category", "description"]
+    ].itertuples(index=False):
+        extras = json.dumps(
+            {
+                "category": None if category is None or category != category else str(category),
+                "description": None if description is None or description != description else str(description),
+                "alerts": per_sku.get(sku, []),
+            },
+            ensure_ascii=False,
+        ).encode("utf-8")
+        records += _RECORD.pack(
+            float(on_hand),
+            float(avg),
+            float(days),
+            sku in dormant_skus,
+            klass.encode()[:1] if isinstance(klass, str) else b"-",
+            len(blob),
+            len(extras),
+        )
+        blob += extras
+
+    width = int(keys.map(len).max()) if len(keys) else 1
+    meta = json.dumps({"kit_version": __version__, "fields": list(FIELDS)}).encode("utf-8")
+    path = pathlib.Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(_HEADER.pack(VERSION, len(df), width, len(meta)))
+        f.write(meta)
+        f.write(b"".join(k.ljust(width, b"\0") for k in keys))
+        f.write(records)
+        f.write(blob)
+    os.replace(tmp, path)
+    return path
+
+
+class SkuIndex:
+    '''
+    Read-only view of a sku_index.bin, memory-mapped: opening it costs one
+    header read, and each `get` is a binary search over the sorted keys
+    (O(log n) page touches), whatever the number of SKUs. Only the standard
+    library is needed, so lookups do not pay the pandas import.
+    '''
+
+    def __init__(self, path: str | pathlib.Path) -> None:
+        self.path = pathlib.Path(path)
+        with open(self.path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[: len(MAGIC)] != MAGIC:
+            self._mm.close()
+            raise ValueError(f"{self.path}: not a SKU index")
+        version, self.n, self._width, meta_len = _HEADER.unpack_from(self._mm, len(MAGIC))
+        if version != VERSION:
+            self._mm.close()
+            raise ValueError(f"{self.path}: unsupported SKU index version {version} (expected {VERSION})")
+        meta_off = len(MAGIC) + _HEADER.size
+        self.meta = json.loads(self._mm[meta_off : meta_off + meta_len])
+        self._keys = meta_off + meta_len
+        self._records = self._keys + self.n * self._width
+        self._blob = self._records + self.n * _RECORD.size
+
+    def __len__(self) -> int:
+        return self.n
+
+    def __enter__(self) -> SkuIndex:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._mm.close()
+
+    def _key(self, i: int) -> bytes:
+        start = self._keys + i * self._width
+        return self._mm[start : start + self._width]
+
+    def _find(self, sku: str) -> int | None:
+        key = sku.encode("utf-8")
+        if len(key) > self._width:
+            return None
+        key = key.ljust(self._width, b"\0")
+        lo, hi = 0, self.n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < self.n and self._key(lo) == key else None
+
+    def get(self, sku: str) -> dict[str, Any] | None:
+        'Stored results of `sku`, or None. Missing numbers are NaN; coverage_days is inf without demand.'
+        i = self._find(sku)
+        if i is None:
+            return None
+        on_hand, avg, days, dormant, klass, off, length = _RECORD.unpack_from(self._mm, self._records + i * _RECORD.size)
+        extras = json.loads(self._mm[self._blob + off : self._blob + off + length])
+        return {
+            "sku": sku,
+            "on_hand_qty": on_hand,
+            "avg_daily_demand": avg,
+            "coverage_days": days,
+            "dormant": bool(dormant),
+            "abc": None if klass == b"-" else klass.decode(),
+            **extras,
+        }
+
+
+def jsonable(record: dict[str, Any]) -> dict[str, Any]:
+    'Record with non-finite floats (NaN, inf) as None, for strict JSON output.'
+    return {k: None if isinstance(v, float) and not math.isfinite(v) else v for k, v in record.items()}
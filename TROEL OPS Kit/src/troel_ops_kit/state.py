@@ -0,0 +1,301 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import tempfile
+import weakref
+from collections.abc import Iterable, Iterator, Mapping
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from .cache import decode_frame, encode_frame
+from .io import ReadOptions, apply_mapping, coerce_dates, ensure_columns
+from .kpis import combine_daily_demand, fold_daily_demand
+from .validate import (
+    checks_of,
+    duplicate_sales_issues,
+    duplicate_sales_rows,
+    repeated_key_rows,
+    validate_frame,
+)
+
+logger = logging.getLogger(__name__)
+
+COMPACT_MIN_ROWS = 250_000  # pending chunk aggregate rows before they are combined, at the least
+
+STATE_FILE = "sales_state.npz"  # the fold's (date, sku) aggregate, column by column
+STATE_META_FILE = "sales_state.json"  # fingerprint, folded bytes and digests, fold counters
+ISSUES_SPILL_FILE = "sales_state_issues.csv"  # sales issues of the folded rows, next to STATE_FILE
+STATE_FORMAT = 5  # bump when SalesFold fields change: older states are refolded
+
+
+@dataclass
+class SalesFold:
+    '''
+    Running result of folding sales chunks: everything later stages need from
+    the sales history, without the raw rows. Sales issues are appended to the
+    `spill` CSV as chunks are validated (a temporary file, removed with the
+    fold, when no path is given); only their count per check is kept.
+    '''
+
+    demand: pd.DataFrame | None = None  # combined kpis.fold_daily_demand aggregate
+    pending: list[pd.DataFrame] = field(default_factory=list)  # chunk aggregates not combined yet
+    spill: pathlib.Path | None = None
+    spill_bytes: int = 0  # size of `spill` once the issues of the folded rows are written
+    issue_counts: dict[str, int] = field(default_factory=dict)  # sales issues per check
+    n_rows: int = 0
+
+    def add(self, chunk: pd.DataFrame, known_skus: pd.Index) -> None:
+        'Validate a mapped, date-coerced chunk and fold it in.'
+        chunk.index = pd.RangeIndex(self.n_rows, self.n_rows + len(chunk))
+        self._spill(
+            [
+                duplicate_sales_issues(duplicate_sales_rows(chunk)),
+                *validate_frame(chunk, "sales", known_skus, checks=("row_contract", "unknown_sku")),
+            ]
+        )
+        self.pending.append(fold_daily_demand(chunk, row_offset=self.n_rows))
+        self.n_rows += len(chunk)
+        pending = sum(len(part) for part in self.pending)
+        if pending >= max(COMPACT_MIN_ROWS, len(self.demand) if self.demand is not None else 0):
+            self.compact()
+        logger.debug("event=sales_chunk rows=%s pending_rows=%s", self.n_rows, pending)
+
+    def _spill(self, frames: list[pd.DataFrame]) -> None:
+        'Append issue frames to the spill file and count them.'
+        frames = [f for f in frames if len(f)]
+        if not frames:
+            return
+        issues = pd.concat(frames, ignore_index=True)
+        for check, n in issues["check"].value_counts().items():
+            self.issue_counts[str(check)] = self.issue_counts.get(str(check), 0) + int(n)
+        if self.spill is None:
+            fd, name = tempfile.mkstemp(prefix="troel-sales-", suffix=".issues.csv")
+            os.close(fd)
+            self.spill = pathlib.Path(name)
+            weakref.finalize(self, self.spill.unlink, True)
+        issues.to_csv(self.spill, mode="a" if self.spill_bytes else "w", header=not self.spill_bytes, index=False)
+        self.spill_bytes = self.spill.stat().st_size
+
+    def resume(self) -> bool:
+        '''
+        Ready a persisted fold for more chunks: drop whatever an interrupted
+        run appended to the spill after the state was saved. False when the
+        spill is missing or shorter than recorded.
+        '''
+        if not self.spill_bytes:
+            return True
+        if self.spill is None or not self.spill.exists() or self.spill.stat().st_size < self.spill_bytes:
+            return False
+        with open(self.spill, "r+b") as f:
+            f.truncate(self.spill_bytes)
+        return True
+
+    def compact(self) -> None:
+        '''
+        Combine the pending chunk aggregates with the running one in a single
+        groupby, finding the keys repeated across chunks on the way. Pending
+        rows are only combined once they outnumber the running aggregate, so
+        every row is regrouped a bounded number of times on average, whatever
+        the number of chunks.
+        '''
+        if not self.pending:
+            return
+        parts = pd.concat([self.demand, *self.pending] if self.demand is not None else self.pending, ignore_index=True)
+        self._spill([duplicate_sales_issues(repeated_key_rows(parts))])
+        self.demand = combine_daily_demand(parts)
+        self.pending = []
+        logger.debug("event=sales_compact rows=%s aggregate_rows=%s", self.n_rows, len(self.demand))
+
+    @property
+    def totals(self) -> pd.DataFrame | None:
+        'Per sku: first_sale, total_qty (None before any chunk).'
+        self.compact()
+        if self.demand is None:
+            return None
+        return (
+            self.demand.assign(first_sale=pd.to_datetime(self.demand["date"]))
+            .groupby("sku")
+            .agg(first_sale=("first_sale", "min"), total_qty=("demand_qty", "sum"))
+        )
+
+    def issue_frames(self) -> list[pd.DataFrame]:
+        'Sales issues, read back from the spill in the order validate_frame gives for the whole file.'
+        self.compact()
+        if not self.spill_bytes or self.spill is None:
+            return []
+        dtypes = {"level": "str", "dataset": "str", "row": "int64", "field": "str", "message": "str", "check": "str"}
+        issues = pd.read_csv(self.spill, dtype=dtypes, keep_default_na=False)
+        # Chunks spill duplicates found later after their other issues: back to check order within a row.
+        rank = issues["check"].map({check: i for i, check in enumerate(checks_of("sales"))}).to_numpy()
+        return [issues.iloc[np.lexsort((rank, issues["row"].to_numpy()))].reset_index(drop=True)]
+
+    def daily_demand(self) -> pd.DataFrame:
+        'Same frame as kpis.compute_daily_demand on the folded rows.'
+        self.compact()
+        if self.demand is None:
+            return pd.DataFrame(columns=["date", "sku", "demand_qty"])
+        out = self.demand.dropna(subset=["date", "sku"]).sort_values(["date", "sku"])
+        return out[["date", "sku", "demand_qty"]].reset_index(drop=True)
+
+    def sales_rows(self) -> pd.DataFrame:
+        '''
+        The (date, sku) aggregate as (date, sku, qty) rows, missing keys
+        included: stands in for raw sales wherever qty is only summed.
+        '''
+        self.compact()
+        if self.demand is None:
+            return pd.DataFrame(columns=["date", "sku", "qty"])
+        return self.demand[["date", "sku", "demand_qty"]].rename(columns={"demand_qty": "qty"})
+
+    def sales_totals(self) -> pd.DataFrame:
+        'One (sku, qty) row per sku: stands in for raw sales in kpis.compute_abc.'
+        totals = self.totals
+        if totals is None:
+            return pd.DataFrame(columns=["sku", "qty"])
+        return totals.rename_axis("sku").reset_index()[["sku", "total_qty"]].rename(
+            columns={"total_qty": "qty"}
+        )
+
+
+def fold_sales(
+    fold: SalesFold,
+    chunks: Iterable[pd.DataFrame],
+    sales_map: Mapping[str, str] | None,
+    known_skus: pd.Index,
+) -> SalesFold:
+    for chunk in chunks:
+        chunk = apply_mapping(chunk, sales_map)
+        ensure_columns(chunk, ["date", "sku", "qty"], "sales")
+        fold.add(coerce_dates(chunk, ["date"]), known_skus)
+    return fold
+
+
+@dataclass
+class SalesState:
+    '''
+    Persisted fold of a sales file, reused by `--incremental` runs.
+
+    `sales_bytes` / `sales_sha256` identify the file content already folded;
+    `fingerprint` holds everything else the fold depends on (kit version,
+    sales mapping, catalog content). Saved as STATE_FILE (the aggregate) plus
+    the STATE_META_FILE JSON sidecar.
+    '''
+
+    fingerprint: dict[str, str]
+    sales_bytes: int
+    sales_sha256: str
+    fold: SalesFold
+
+
+def load_state(out_dir: pathlib.Path) -> SalesState | None:
+    '''
+    The state saved under `out_dir`, or None when there is none or it does not
+    read back. Nothing is unpickled: the output folder may be shared.
+    '''
+    meta_path, path = out_dir / STATE_META_FILE, out_dir / STATE_FILE
+    if not meta_path.exists():
+        return None
+    try:
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        demand = None
+        if meta["fold_sha256"] is not None:
+            with open(path, "rb") as f:
+                if hashlib.file_digest(f, "sha256").hexdigest() != meta["fold_sha256"]:
+                    raise ValueError("fold does not match its metadata")
+            with np.load(path, allow_pickle=False) as npz:
+                demand = decode_frame(npz)
+        fold = SalesFold(
+            demand=demand,
+            spill=out_dir / ISSUES_SPILL_FILE,
+            spill_bytes=int(meta["spill_bytes"]),
+            issue_counts={str(k): int(n) for k, n in meta["issue_counts"].items()},
+            n_rows=int(meta["n_rows"]),
+        )
+        return SalesState(
+            {str(k): str(v) for k, v in meta["fingerprint"].items()},
+            int(meta["sales_bytes"]),
+            str(meta["sales_sha256"]),
+            fold,
+        )
+    except Exception:
+        logger.warning("event=state_corrupt path=%s", meta_path)
+        return None
+
+
+def save_state(out_dir: pathlib.Path, state: SalesState) -> None:
+    '''
+    Write the fold's aggregate to STATE_FILE, then the metadata (with the
+    aggregate's digest) to STATE_META_FILE: a run interrupted in between
+    leaves a pair that does not match, which is refolded.
+    '''
+    fold = state.fold
+    fold.compact()
+    arrays = encode_frame(fold.demand) if fold.demand is not None else {}
+    meta_path, path = out_dir / STATE_META_FILE, out_dir / STATE_FILE
+    if arrays is None:
+        logger.warning("event=state_skip reason=object_columns")
+        meta_path.unlink(missing_ok=True)
+        return
+    fold_digest = None
+    if fold.demand is not None:
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.savez(f, allow_pickle=False, **arrays)
+        with open(tmp, "rb") as f:
+            fold_digest = hashlib.file_digest(f, "sha256").hexdigest()
+        tmp.replace(path)
+    meta = {
+        "fingerprint": state.fingerprint,
+        "sales_bytes": state.sales_bytes,
+        "sales_sha256": state.sales_sha256,
+        "fold_sha256": fold_digest,
+        "spill_bytes": fold.spill_bytes,
+        "issue_counts": fold.issue_counts,
+        "n_rows": fold.n_rows,
+    }
+    tmp = meta_path.with_name(meta_path.name + ".tmp")
+    tmp.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    tmp.replace(meta_path)
+
+
+def hash_file(path: pathlib.Path, prefix_bytes: int) -> tuple[str, str, bytes]:
+    '''
+    One pass over `path`: returns (sha256 of the first `prefix_bytes` bytes,
+    sha256 of the whole file, last byte of the prefix).
+    '''
+    h = hashlib.sha256()
+    prefix_digest = h.hexdigest() if prefix_bytes == 0 else ""
+    last = b""
+    done = 0
+    with open(path, "rb") as f:
+        while block := f.read(1 << 20):
+            if done < prefix_bytes <= done + len(block):
+                cut = prefix_bytes - done
+                h.update(block[:cut])
+                prefix_digest, last = h.hexdigest(), block[cut - 1 : cut]
+                h.update(block[cut:])
+            else:
+                h.update(block)
+            done += len(block)
+    return prefix_digest, h.hexdigest(), last
+
+
+def read_appended_csv(
+    path: pathlib.Path, offset: int, chunksize: int, options: ReadOptions | None = None
+) -> Iterator[pd.DataFrame]:
+    '''
+    CSV rows written after byte `offset`, streamed `chunksize` rows at a time
+    and parsed with the header row and columns `options` select.
+    '''
+    options = options or ReadOptions()
+    columns = pd.read_csv(path, header=options.header, nrows=0).columns.tolist()
+    with open(path, "rb") as f:
+        f.seek(offset)
+        with pd.read_csv(f, header=None, names=columns, usecols=options.keeps, chunksize=chunksize) as reader:
+            yield from (chunk for chunk in reader if len(chunk))
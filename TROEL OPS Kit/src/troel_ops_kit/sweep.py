@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import logging
+import pathlib
+import time
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+
+from .cache import InputCache
+from .config import DEFAULT_GRID, SweepGrid
+from .io import PreparedDatasets, ensure_columns, prepare_datasets, read_options, write_frame
+from .kpis import compute_daily_demand, compute_sales_recency, compute_stock_aging
+from .pipeline import load_input
+from .profiling import StageRecorder
+
+logger = logging.getLogger(__name__)
+
+SWEEP_FILE = "sweep"
+SWEEP_COLUMNS = [
+    "window_days",
+    "threshold_days",
+    "lookback_days",
+    "low_coverage",
+    "low_coverage_value",
+    "low_coverage_streak",
+    "low_coverage_streak_value",
+    "dead_sku",
+    "dead_sku_value",
+    "alerts",
+    "affected_value",
+]
+
+
+def _cumulative_demand(data: PreparedDatasets) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    '''
+    Daily demand as per-SKU running totals, sorted by (sku code, day): codes,
+    days, cumulative qty, plus the first demand day of every sku code
+    (int64 max for SKUs without demand).
+    '''
+    demand = compute_daily_demand(data.sales)
+    codes = demand["sku"].cat.codes.to_numpy(dtype=np.int64)
+    days = demand["date"].to_numpy(dtype="datetime64[D]").astype(np.int64)
+    order = np.lexsort((days, codes))
+    codes, days = codes[order], days[order]
+    qty = demand["demand_qty"].to_numpy(dtype=float)[order]
+    cum = pd.Series(qty).groupby(codes).cumsum().to_numpy()  # per SKU, not one running sum over all of them
+    first = np.full(len(data.sku_dtype.categories), np.iinfo(np.int64).max)
+    np.minimum.at(first, codes, days)
+    return codes, days, cum, first
+
+
+def sweep_alerts(data: PreparedDatasets, grid: SweepGrid = DEFAULT_GRID) -> pd.DataFrame:
+    '''
+    Alert counts and affected stock value (on_hand_qty * unit_cost) for every
+    combination of `grid`, as a full run with those parameters would raise
+    them: low_coverage at the last snapshot, low_coverage_streak over the
+    stock history, dead_sku at the last snapshot. `affected_value` counts each
+    SKU with at least one alert once, at its latest stock row.
+
+    Daily demand is aggregated and accumulated once; the trailing mean of
+    any window at any snapshot is then a difference of two running totals,
+    and every threshold is a binary search over the coverage sorted once per
+    window. The dead_sku lookbacks come from one sales recency index.
+    '''
+    codes, days, cum, first = _cumulative_demand(data)
+    stock = data.stock.sort_values(["sku", "snapshot_date"], kind="stable")
+    st_codes = stock["sku"].cat.codes.to_numpy(dtype=np.int64)
+    st_days = stock["snapshot_date"].to_numpy(dtype="datetime64[D]").astype(np.int64)
+    on_hand = stock["on_hand_qty"].to_numpy(dtype=float)
+    asof = int(st_days.max())
+
+    cost = data.catalog[["sku", "unit_cost"]] if "unit_cost" in data.catalog.columns else None
+    unit_cost = np.zeros(len(data.sku_dtype.categories))
+    if cost is not None:
+        cost = cost.dropna(subset=["sku"]).drop_duplicates("sku")
+        unit_cost[cost["sku"].cat.codes.to_numpy()] = np.nan_to_num(pd.to_numeric(cost["unit_cost"], errors="coerce"))
+    value = np.nan_to_num(on_hand * unit_cost[np.maximum(st_codes, 0)]) * (st_codes >= 0)
+
+    # Running demand total of each stock row's SKU on any day, by binary search over (code, day) keys.
+    d0 = min(int(days.min()) if len(days) else asof, int(st_days.min()))
+    span = max(int(days.max()) if len(days) else asof, asof) - d0 + 2
+    keys = codes * span + (days - d0)
+
+    def demand_upto(day: np.ndarray) -> np.ndarray:
+        pos = np.searchsorted(keys, st_codes * span + np.clip(day - d0, -1, span - 1), side="right") - 1
+        hit = (pos >= 0) & (codes[np.maximum(pos, 0)] == st_codes) if len(keys) else np.zeros(len(day), dtype=bool)
+        return np.where(hit, cum[np.maximum(pos, 0)] if len(keys) else 0.0, 0.0)
+
+    started = first[np.maximum(st_codes, 0)]
+    active = (st_codes >= 0) & (started <= st_days)
+    upto_now = demand_upto(st_days)
+
+    # Per SKU: its rows are contiguous (sorted by sku, date); latest row and its rows at the last
+    # min_snapshots snapshot dates of the whole stock (a streak needs a row at each of them).
+    block_end = np.r_[st_codes[1:] != st_codes[:-1], True]
+    block = np.cumsum(np.r_[True, block_end[:-1]]) - 1
+    sku_value = value[block_end]
+    snapshots = np.unique(st_days)
+    streak_rows = st_days >= snapshots[max(len(snapshots) - grid.min_snapshots, 0)]
+    new_day = np.r_[True, (block[1:] != block[:-1]) | (st_days[1:] != st_days[:-1])]
+    streak_days = np.bincount(block[streak_rows & new_day], minlength=len(sku_value))
+    at_asof = st_days == asof
+
+    recency = compute_sales_recency(data.sales, pd.Timestamp(asof, unit="D").date(), grid.lookbacks)
+    aging = compute_stock_aging(data.stock, recency, data.catalog, grid.lookbacks)
+    aging_codes = aging["sku"].cat.codes.to_numpy()
+    aging_value = np.nan_to_num(aging["stock_value"].to_numpy(dtype=float))
+    block_of_code = np.full(len(data.sku_dtype.categories) + 1, -1)
+    block_of_code[st_codes[block_end]] = np.arange(len(sku_value))
+
+    thresholds = np.array(sorted(set(grid.thresholds)), dtype=float)
+    rows: list[pd.DataFrame] = []
+    for window in sorted(set(grid.windows)):
+        n_days = np.minimum(window, st_days - started + 1)
+        avg = np.where(active, (upto_now - demand_upto(st_days - window)) / np.where(active, n_days, 1), 0.0)
+        coverage = np.where(avg > 0, on_hand / np.where(avg > 0, avg, 1.0), np.inf)
+        below_key = np.where(np.isnan(coverage), np.inf, coverage)  # NaN is never below a threshold
+
+        low = np.sort(below_key[at_asof])
+        low_value = np.r_[0.0, np.cumsum(value[at_asof][np.argsort(below_key[at_asof], kind="stable")])]
+        n_low = np.searchsorted(low, thresholds, side="left")
+
+        streak_max = np.full(len(sku_value), -np.inf)
+        np.maximum.at(streak_max, block[streak_rows], below_key[streak_rows])
+        streak_max[streak_days < grid.min_snapshots] = np.inf
+        streak_order = np.argsort(streak_max, kind="stable")
+        n_streak = np.searchsorted(streak_max[streak_order], thresholds, side="left")
+        streak_value = np.r_[0.0, np.cumsum(sku_value[streak_order])]
+
+        # First threshold each SKU gets any coverage alert at: min of its last-snapshot coverage and streak max.
+        sku_low = np.full(len(sku_value), np.inf)
+        np.minimum.at(sku_low, block[at_asof], below_key[at_asof])
+        flagged_at = np.minimum(sku_low, streak_max)
+        flag_order = np.argsort(flagged_at, kind="stable")
+        n_flagged = np.searchsorted(flagged_at[flag_order], thresholds, side="left")
+        flagged_value = np.r_[0.0, np.cumsum(sku_value[flag_order])]
+
+        for lookback in sorted(set(grid.lookbacks)):
+            dead = aging[f"dormant_{lookback}d"].to_numpy(dtype=bool)
+            dead_sku = np.zeros(len(sku_value), dtype=bool)
+            dead_blocks = block_of_code[aging_codes[dead]]
+            dead_sku[dead_blocks[dead_blocks >= 0]] = True
+            # Value of dead SKUs that no coverage alert already counts, per threshold.
+            dead_not_flagged = np.r_[0.0, np.cumsum((sku_value * dead_sku)[flag_order])]
+            dead_total = dead_not_flagged[-1]
+            n_dead = int(dead.sum())
+            rows.append(
+                pd.DataFrame(
+                    {
+                        "window_days": window,
+                        "threshold_days": thresholds,
+                        "lookback_days": lookback,
+                        "low_coverage": n_low,
+                        "low_coverage_value": low_value[n_low],
+                        "low_coverage_streak": n_streak,
+                        "low_coverage_streak_value": streak_value[n_streak],
+                        "dead_sku": n_dead,
+                        "dead_sku_value": aging_value[dead].sum(),
+                        "alerts": n_low + n_streak + n_dead,
+                        "affected_value": flagged_value[n_flagged] + dead_total - dead_not_flagged[n_flagged],
+                    }
+                )
+            )
+    out = pd.concat(rows, ignore_index=True)
+    return out.sort_values(["window_days", "threshold_days", "lookback_days"], kind="stable", ignore_index=True)[
+        SWEEP_COLUMNS
+    ]
+
+
+def run_sweep(
+    sales_path: str,
+    stock_path: str,
+    catalog_path: str,
+    out_dir: str,
+    grid: SweepGrid = DEFAULT_GRID,
+    mapping: Mapping[str, Mapping[str, str]] | None = None,
+    cache: InputCache | None = None,
+    output_format: str = "csv",
+) -> tuple[pd.DataFrame, pathlib.Path]:
+    '''
+    Read the inputs once and write the sweep_alerts matrix of `grid` to
+    sweep.csv (or `output_format`) under `out_dir`; returns it and its path.
+    '''
+    start = time.perf_counter()
+    mapping = mapping or {}
+    rec = StageRecorder()
+    frames = {}
+    for dataset, source, date_cols in (
+        ("sales", sales_path, ["date"]),
+        ("stock", stock_path, ["snapshot_date"]),
+        ("catalog", catalog_path, []),
+    ):
+        frames[dataset] = load_input(source, mapping.get(dataset), date_cols, cache, rec, read_options(mapping, dataset))
+    ensure_columns(frames["sales"], ["date", "sku", "qty"], "sales")
+    ensure_columns(frames["stock"], ["snapshot_date", "sku", "on_hand_qty"], "stock")
+    ensure_columns(frames["catalog"], ["sku"], "catalog")
+    data = prepare_datasets(frames["sales"], frames["stock"], frames["catalog"])
+    del frames
+
+    matrix = sweep_alerts(data, grid)
+    out = pathlib.Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    path = write_frame(matrix, out / SWEEP_FILE, output_format)
+    logger.info(
+        "event=sweep combinations=%s windows=%s thresholds=%s lookbacks=%s seconds=%.3f",
+        len(matrix),
+        len(set(grid.windows)),
+        len(set(grid.thresholds)),
+        len(set(grid.lookbacks)),
+        time.perf_counter() - start,
+    )
+    return matrix, path
@@ -1,7 +1,11 @@
 from __future__ import annotations
 
+from collections.abc import Collection, Iterable
 from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Any, get_args
 
+import numpy as np
 import pandas as pd
 from pydantic import BaseModel, ValidationError
 
@@ -15,9 +19,166 @@ class ValidationIssue:
     row: int
     field: str
     message: str
+    check: str = "row_contract"  # see CHECK_LEVELS
 
 
-def _validate_rows(df: pd.DataFrame, model: type[BaseModel], dataset: str) -> list[ValidationIssue]:
+def _probe_message(model: type[BaseModel], row: dict[str, Any], field: str) -> str:
+    'The message Pydantic reports for `field` when validating `row` against `model`.'
+    try:
+        model.model_validate(row)
+    except ValidationError as e:
+        for err in e.errors():
+            if err["loc"] == (field,):
+                return err["msg"]
+    raise RuntimeError(f"{model.__name__}.{field} accepts {row.get(field)!r}")
+
+
+# Pydantic messages reproduced by the columnar engine (see _validate_columns),
+# taken from the installed Pydantic so they follow its wording.
+_FIELD_REQUIRED = _probe_message(SalesRow, {}, "date")
+_DATE_TYPE = _probe_message(SalesRow, {"date": None}, "date")
+_DATE_INEXACT = _probe_message(SalesRow, {"date": datetime(2026, 1, 1, 12)}, "date")
+_STRING_TYPE = _probe_message(SalesRow, {"sku": 0}, "sku")
+_FLOAT_TYPE = _probe_message(SalesRow, {"qty": None}, "qty")
+# infer_dtype results of object columns whose every cell Pydantic takes as a number.
+_NUMBER_KINDS = ("floating", "integer", "mixed-integer-float")
+
+
+@dataclass(frozen=True)
+class _ColumnRule:
+    name: str
+    kind: type  # date | str | float
+    required: bool
+    nullable: bool
+    min_length: int | None
+    non_negative: bool
+    too_short: str | None = None  # Pydantic messages of the min_length and >= 0 checks
+    negative: str | None = None
+
+
+def _column_rules(model: type[BaseModel]) -> list[_ColumnRule] | None:
+    '''
+    Derive column-wise checks from a row contract.
+
+    Returns None when the contract uses anything the columnar engine cannot
+    reproduce exactly (other types, constraints or validators), in which case
+    rows are validated one by one with Pydantic.
+    '''
+    decorators = model.__pydantic_decorators__
+    if decorators.model_validators or decorators.root_validators:
+        return None
+    non_negative = set(getattr(model, "non_negative_fields", ()))
+    for dec in decorators.field_validators.values():
+        if not set(dec.info.fields) <= non_negative:
+            return None
+
+    rules: list[_ColumnRule] = []
+    for name, info in model.model_fields.items():
+        args = get_args(info.annotation) or (info.annotation,)
+        kinds = [a for a in args if a is not type(None)]
+        if len(kinds) != 1 or kinds[0] not in (date, str, float):
+            return None
+        min_length: int | None = None
+        for meta in info.metadata:
+            if getattr(meta, "min_length", None) is not None and kinds[0] is str:
+                min_length = int(meta.min_length)
+            else:
+                return None
+        rules.append(
+            _ColumnRule(
+                name=name,
+                kind=kinds[0],
+                required=info.is_required(),
+                nullable=type(None) in args,
+                min_length=min_length,
+                non_negative=name in non_negative,
+                too_short=_probe_message(model, {name: ""}, name) if min_length else None,
+                negative=_probe_message(model, {name: -1.0}, name) if name in non_negative else None,
+            )
+        )
+    return rules
+
+
+def _is_type(values: np.ndarray, *types: type) -> np.ndarray:
+    'Cells whose exact type is one of `types`: one Python call per cell, for mixed object columns only.'
+    cell_types = pd.Series(np.frompyfunc(type, 1, 1)(values), dtype=object)
+    return cell_types.isin(types).to_numpy(dtype=bool)
+
+
+def _check_date(s: pd.Series, rule: _ColumnRule) -> tuple[np.ndarray, np.ndarray]:
+    msgs = np.full(len(s), None, dtype=object)
+    if pd.api.types.is_datetime64_any_dtype(s):
+        missing = s.isna().to_numpy()
+        msgs[missing] = _DATE_TYPE
+        msgs[~missing & (s != s.dt.normalize()).to_numpy()] = _DATE_INEXACT
+        return msgs, np.zeros(len(s), dtype=bool)
+    if isinstance(s.dtype, pd.StringDtype) or pd.api.types.is_numeric_dtype(s):
+        return msgs, np.ones(len(s), dtype=bool)  # date strings and numbers: Pydantic decides
+
+    values = s.to_numpy(dtype=object)
+    # NaT is not a valid date (Pydantic raises a TypeError on it instead of an error).
+    missing = _is_type(values, type(None), type(pd.NaT))
+    msgs[missing] = _DATE_TYPE
+    return msgs, ~(missing | _is_type(values, date))
+
+
+def _check_str(s: pd.Series, rule: _ColumnRule) -> tuple[np.ndarray, np.ndarray]:
+    msgs = np.full(len(s), None, dtype=object)
+    unknown = np.zeros(len(s), dtype=bool)
+    if isinstance(s.dtype, pd.StringDtype):
+        bad = s.isna().to_numpy()
+        is_str = ~bad
+    elif pd.api.types.is_numeric_dtype(s) or pd.api.types.is_datetime64_any_dtype(s):
+        bad = np.ones(len(s), dtype=bool)
+        is_str = ~bad
+    elif pd.api.types.infer_dtype(values := s.to_numpy(dtype=object), skipna=False) == "string":
+        bad = np.zeros(len(s), dtype=bool)
+        is_str = ~bad
+    else:
+        is_str = _is_type(values, str)
+        is_none = _is_type(values, type(None))
+        bad = np.fromiter(
+            (isinstance(v, int | float | np.number) for v in values), dtype=bool, count=len(values)
+        )
+        if not rule.nullable:
+            bad |= is_none
+        unknown = ~(is_str | is_none | bad)
+    msgs[bad] = _STRING_TYPE
+    if rule.min_length is not None and is_str.any():
+        idx = np.flatnonzero(is_str)
+        too_short = idx[s.iloc[idx].str.len().to_numpy() < rule.min_length]
+        msgs[too_short] = rule.too_short
+    return msgs, unknown
+
+
+def _check_float(s: pd.Series, rule: _ColumnRule) -> tuple[np.ndarray, np.ndarray]:
+    msgs = np.full(len(s), None, dtype=object)
+    if pd.api.types.is_bool_dtype(s):
+        return msgs, np.zeros(len(s), dtype=bool)
+    if pd.api.types.is_numeric_dtype(s) and not isinstance(s.dtype, pd.api.extensions.ExtensionDtype):
+        numbers = s.to_numpy(dtype=float)
+        is_number = np.ones(len(s), dtype=bool)
+        unknown = np.zeros(len(s), dtype=bool)
+    elif pd.api.types.infer_dtype(values := s.to_numpy(dtype=object), skipna=False) in _NUMBER_KINDS:
+        numbers = values.astype(float)
+        is_number = np.ones(len(s), dtype=bool)
+        unknown = np.zeros(len(s), dtype=bool)
+    else:
+        is_number = _is_type(values, float, int, np.float64, np.float32, np.int64, np.int32)
+        is_none = _is_type(values, type(None))
+        if not rule.nullable:
+            msgs[is_none] = _FLOAT_TYPE
+        numbers = np.where(is_number, values, 0.0).astype(float)
+        unknown = ~(is_number | is_none)
+    if rule.non_negative:
+        msgs[is_number & (numbers < 0)] = rule.negative
+    return msgs, unknown
+
+
+_CHECKS = {date: _check_date, str: _check_str, float: _check_float}
+
+
+def _validate_records(df: pd.DataFrame, model: type[BaseModel], dataset: str) -> list[ValidationIssue]:
     issues: list[ValidationIssue] = []
     for i, row in enumerate(df.to_dict(orient="records")):
         try:
@@ -37,49 +198,237 @@ def _validate_rows(df: pd.DataFrame, model: type[BaseModel], dataset: str) -> li
     return issues
 
 
+def _validate_columns(
+    df: pd.DataFrame, rules: list[_ColumnRule], model: type[BaseModel]
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''
+    Vectorized equivalent of _validate_records: one mask per contract field.
+    Returns (positional rows, fields, messages) ordered by row, then field.
+
+    Cells whose Python type the masks do not cover (e.g. dates still stored as
+    strings) send their row back to Pydantic, so the issues stay identical.
+    '''
+    n = len(df)
+    unknown = np.zeros(n, dtype=bool)
+    per_field: list[np.ndarray] = []
+    for rule in rules:
+        if rule.name not in df.columns:
+            msgs = np.full(n, _FIELD_REQUIRED if rule.required else None, dtype=object)
+        else:
+            msgs, field_unknown = _CHECKS[rule.kind](df[rule.name].reset_index(drop=True), rule)
+            unknown |= field_unknown
+        per_field.append(msgs)
+
+    row_parts: list[np.ndarray] = []
+    field_parts: list[np.ndarray] = []
+    for k, msgs in enumerate(per_field):
+        idx = np.flatnonzero(pd.notna(msgs) & ~unknown)
+        row_parts.append(idx)
+        field_parts.append(np.full(len(idx), k))
+    row_arr = np.concatenate(row_parts)
+    field_arr = np.concatenate(field_parts)
+    order = np.lexsort((field_arr, row_arr))
+    row_arr, field_arr = row_arr[order], field_arr[order]
+    names = np.array([rule.name for rule in rules], dtype=object)
+    rows, fields = row_arr, names[field_arr]
+    messages = np.stack(per_field)[field_arr, row_arr] if len(row_arr) else np.empty(0, dtype=object)
+
+    fallback_rows = np.flatnonzero(unknown)
+    if len(fallback_rows):
+        fallback = _validate_records(df.iloc[fallback_rows], model, "")
+        rows = np.concatenate([rows, fallback_rows[[i.row for i in fallback]].astype(rows.dtype)])
+        fields = np.concatenate([fields, np.array([i.field for i in fallback], dtype=object)])
+        messages = np.concatenate([messages, np.array([i.message for i in fallback], dtype=object)])
+        order = np.argsort(rows, kind="stable")
+        rows, fields, messages = rows[order], fields[order], messages[order]
+    return rows, fields, messages
+
+
+def _validate_rows(df: pd.DataFrame, model: type[BaseModel]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    rules = _column_rules(model)
+    if rules is not None:
+        return _validate_columns(df, rules, model)
+    issues = _validate_records(df, model, "")
+    return (
+        np.array([i.row for i in issues], dtype=np.int64),
+        np.array([i.field for i in issues], dtype=object),
+        np.array([i.message for i in issues], dtype=object),
+    )
+
+
+ISSUE_COLUMNS = ["level", "dataset", "row", "field", "message", "check"]
+# Level of the issues each check reports; per dataset, checks run (and are listed) in this order.
+CHECK_LEVELS = {"duplicate_key": "warning", "missing_sku": "error", "row_contract": "error", "unknown_sku": "warning"}
+
+
+@dataclass(frozen=True)
+class _DatasetChecks:
+    model: type[BaseModel]
+    key: tuple[str, ...]  # duplicate key columns (empty: no duplicate check)
+    missing_sku: bool  # missing SKUs are their own error (rows are then checked with sku "")
+    unknown_sku: bool  # SKUs are looked up in the catalog
+
+
+DATASET_CHECKS = {
+    "sales": _DatasetChecks(SalesRow, ("date", "sku"), missing_sku=False, unknown_sku=True),
+    "stock": _DatasetChecks(StockRow, ("snapshot_date", "sku"), missing_sku=False, unknown_sku=True),
+    "catalog": _DatasetChecks(CatalogRow, (), missing_sku=True, unknown_sku=False),
+}
+
+
+def checks_of(dataset: str) -> list[str]:
+    spec = DATASET_CHECKS[dataset]
+    enabled = {
+        "duplicate_key": bool(spec.key),
+        "missing_sku": spec.missing_sku,
+        "row_contract": True,
+        "unknown_sku": spec.unknown_sku,
+    }
+    return [check for check in CHECK_LEVELS if enabled[check]]
+
+
+def _issue_frame(dataset: str, check: str, rows: Any, field: Any, message: Any) -> pd.DataFrame:
+    rows = np.asarray(rows, dtype=np.int64)
+    return pd.DataFrame(
+        {
+            "level": np.full(len(rows), CHECK_LEVELS[check], dtype=object),
+            "dataset": dataset,
+            "row": rows,
+            "field": field,
+            "message": message,
+            "check": check,
+        },
+        columns=ISSUE_COLUMNS,
+    )
+
+
+def sku_dictionary(catalog: pd.DataFrame) -> pd.Index:
+    '''
+    Catalog SKUs as a unique string Index. Its hash table is built on the
+    first lookup and then shared by every unknown-SKU check of a run.
+    '''
+    return pd.Index(catalog["sku"].dropna().astype(str).unique())
+
+
+def validate_frame(
+    df: pd.DataFrame,
+    dataset: str,
+    known_skus: pd.Index | None = None,
+    checks: Collection[str] | None = None,
+) -> list[pd.DataFrame]:
+    '''
+    Every check of `dataset` (see checks_of) in one pass over `df`: duplicate
+    keys, missing SKUs, row contracts and, with `known_skus` (sku_dictionary),
+    SKUs absent from the catalog. The sku column is hashed once and its codes
+    serve all SKU checks. `checks` restricts the pass to some of them.
+
+    Returns one ISSUE_COLUMNS frame per check that found something, in
+    CHECK_LEVELS order, without any cap; `row` holds labels of df.index.
+    '''
+    spec = DATASET_CHECKS[dataset]
+    wanted = [c for c in checks_of(dataset) if checks is None or c in checks]
+    labels = df.index.to_numpy()
+    codes, uniques = pd.factorize(df["sku"])
+    frames: list[pd.DataFrame] = []
+
+    if "duplicate_key" in wanted:
+        key = np.zeros(len(df), dtype=np.int64)
+        for col in spec.key:
+            col_codes, col_uniques = (codes, uniques) if col == "sku" else pd.factorize(df[col])
+            key = key * (len(col_uniques) + 1) + col_codes + 1
+        dup = pd.Series(key).duplicated(keep=False).to_numpy()
+        frames.append(_issue_frame(dataset, "duplicate_key", labels[dup], ",".join(spec.key), "duplicate key"))
+
+    missing = codes < 0
+    if "missing_sku" in wanted:
+        frames.append(_issue_frame(dataset, "missing_sku", labels[missing], "sku", "sku is missing"))
+
+    if "row_contract" in wanted:
+        checked = df.fillna(value={"sku": ""}) if spec.missing_sku and missing.any() else df
+        rows, fields, messages = _validate_rows(checked, spec.model)
+        frames.append(_issue_frame(dataset, "row_contract", labels[rows], fields, messages))
+
+    if "unknown_sku" in wanted and known_skus is not None:
+        # One lookup per distinct SKU, then rows by code (missing SKUs are never known).
+        known = known_skus.get_indexer(pd.Index(uniques).astype(str)) >= 0
+        unknown = ~np.append(known, False)[codes]
+        frames.append(_issue_frame(dataset, "unknown_sku", labels[unknown], "sku", "sku not found in catalog"))
+    return [f for f in frames if len(f)]
+
+
+def duplicate_sales_rows(chunk: pd.DataFrame) -> list[int]:
+    'Rows of `chunk` sharing a (date, sku) key with another row of the chunk.'
+    return chunk.index[chunk.duplicated(subset=["date", "sku"], keep=False)].tolist()
+
+
+def repeated_key_rows(parts: pd.DataFrame) -> list[int]:
+    '''
+    Rows repeating a (date, sku) key across chunks: `parts` stacks
+    kpis.fold_daily_demand aggregates (one row per key each), and the
+    `first_row` of a key found in more than one of them is a duplicate
+    unless it was its only row there. Aggregates of several rows had all of
+    them reported already (by duplicate_sales_rows or an earlier call), so
+    every row is reported once.
+    '''
+    repeated = parts.duplicated(subset=["date", "sku"], keep=False) & (parts["n_rows"] == 1)
+    return parts.loc[repeated, "first_row"].tolist()
+
+
+def duplicate_sales_issues(rows: Iterable[int]) -> pd.DataFrame:
+    'Duplicate-key warnings for rows collected over a streamed file (same frame as validate_frame).'
+    unique_rows = np.unique(np.fromiter(rows, dtype=np.int64))
+    return _issue_frame("sales", "duplicate_key", unique_rows, ",".join(DATASET_CHECKS["sales"].key), "duplicate key")
+
+
+def issues_frame(frames: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    'The issues table: all frames, ordered by level, dataset and row (checks keep their order within a row).'
+    parts = [f for f in frames if len(f)]
+    if not parts:
+        return pd.DataFrame(columns=ISSUE_COLUMNS)
+    return pd.concat(parts, ignore_index=True).sort_values(["level", "dataset", "row"], kind="stable")
+
+
+def issue_counts(issues: pd.DataFrame, datasets: Iterable[str] = tuple(DATASET_CHECKS)) -> pd.DataFrame:
+    'Issues per dataset and check, zero for checks that found nothing (the issues_summary output).'
+    found = issues.groupby(["dataset", "check"]).size() if len(issues) else pd.Series(dtype="int64")
+    rows = [
+        (dataset, check, CHECK_LEVELS[check], int(found.get((dataset, check), 0)))
+        for dataset in datasets
+        for check in checks_of(dataset)
+    ]
+    return pd.DataFrame(rows, columns=["dataset", "check", "level", "issues"])
+
+
+def _as_issues(frames: list[pd.DataFrame]) -> list[ValidationIssue]:
+    return [
+        ValidationIssue(level, dataset, int(row), field, message, check)
+        for f in frames
+        for level, dataset, row, field, message, check in f[ISSUE_COLUMNS].itertuples(index=False)
+    ]
+
+
 def validate_sales(df: pd.DataFrame) -> list[ValidationIssue]:
-    issues: list[ValidationIssue] = []
-    if df.duplicated(subset=["date", "sku"]).any():
-        dup_idx = df[df.duplicated(subset=["date", "sku"], keep=False)].index.tolist()[:25]
-        for i in dup_idx:
-            issues.append(ValidationIssue("warning", "sales", int(i), "date,sku", "duplicate key"))
-    issues += _validate_rows(df, SalesRow, "sales")
-    return issues
+    return _as_issues(validate_frame(df, "sales"))
 
 
 def validate_stock(df: pd.DataFrame) -> list[ValidationIssue]:
-    issues: list[ValidationIssue] = []
-    if df.duplicated(subset=["snapshot_date", "sku"]).any():
-        dup_idx = df[df.duplicated(subset=["snapshot_date", "sku"], keep=False)].index.tolist()[:25]
-        for i in dup_idx:
-            issues.append(ValidationIssue("warning", "stock", int(i), "snapshot_date,sku", "duplicate key"))
-    issues += _validate_rows(df, StockRow, "stock")
-    return issues
+    return _as_issues(validate_frame(df, "stock"))
 
 
 def validate_catalog(df: pd.DataFrame) -> list[ValidationIssue]:
-    issues: list[ValidationIssue] = []
-    if df["sku"].isna().any():
-        idx = df[df["sku"].isna()].index.tolist()[:25]
-        for i in idx:
-            issues.append(ValidationIssue("error", "catalog", int(i), "sku", "sku is missing"))
-    issues += _validate_rows(df.fillna(value={"sku": ""}), CatalogRow, "catalog")
-    return issues
+    return _as_issues(validate_frame(df, "catalog"))
 
 
 def validate_cross_datasets(
     sales: pd.DataFrame, stock: pd.DataFrame, catalog: pd.DataFrame
 ) -> list[ValidationIssue]:
-    issues: list[ValidationIssue] = []
-    cat_skus = set(catalog["sku"].astype(str))
-    for ds_name, df in [("sales", sales), ("stock", stock)]:
-        unknown = df[~df["sku"].astype(str).isin(cat_skus)]
-        for i in unknown.index.tolist()[:25]:
-            issues.append(ValidationIssue("warning", ds_name, int(i), "sku", "sku not found in catalog"))
-    return issues
+    known = sku_dictionary(catalog)
+    return [
+        issue
+        for dataset, df in [("sales", sales), ("stock", stock)]
+        for issue in _as_issues(validate_frame(df, dataset, known, checks=("unknown_sku",)))
+    ]
 
 
 def issues_to_frame(issues: list[ValidationIssue]) -> pd.DataFrame:
-    if not issues:
-        return pd.DataFrame(columns=["level", "dataset", "row", "field", "message"])
-    return pd.DataFrame([i.__dict__ for i in issues]).sort_values(["level", "dataset", "row"])
+    return issues_frame([pd.DataFrame([i.__dict__ for i in issues], columns=ISSUE_COLUMNS)])
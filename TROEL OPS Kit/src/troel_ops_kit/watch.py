@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable, Iterable
+from typing import Any
+
+from .pipeline import RunResult, StageMemo
+from .pipeline import run as run_pipeline
+
+logger = logging.getLogger(__name__)
+
+DATASETS = ("sales", "stock", "catalog")
+
+
+def file_digest(path: str | os.PathLike[str]) -> str:
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+class WatchSession:
+    '''
+    Reruns the pipeline when input files change. Files are polled by size
+    and mtime; a change is acted on once they have been stable for
+    `debounce_s` (an export still being copied is not read half-written),
+    and only if the content hash of a changed file differs from the last
+    run. Runs share a StageMemo: unchanged inputs are not re-read and the
+    stages that only depend on them are reused, so a stock-only change skips
+    the demand, recency and ABC recomputation. Outputs are replaced
+    atomically by the pipeline. Other keyword arguments go to pipeline.run.
+    '''
+
+    def __init__(
+        self,
+        sales_path: str,
+        stock_path: str,
+        catalog_path: str,
+        out_dir: str,
+        debounce_s: float = 2.0,
+        on_run: Callable[[RunResult, list[str], list[str], float], None] | None = None,
+        clock: Callable[[], float] = time.monotonic,
+        **run_kwargs: Any,
+    ) -> None:
+        self.paths = dict(zip(DATASETS, (sales_path, stock_path, catalog_path), strict=True))
+        self.out_dir = out_dir
+        self.debounce_s = debounce_s
+        self.on_run = on_run
+        self.run_kwargs = run_kwargs
+        self.memo = StageMemo()
+        self.runs = 0
+        self.last: RunResult | None = None
+        self._clock = clock
+        self._stats: dict[str, tuple[int, int]] = {}  # at the last run
+        self._pending: dict[str, tuple[int, int]] | None = None  # changed stats waiting for the debounce
+        self._changed_at = 0.0
+
+    def _stat(self) -> dict[str, tuple[int, int]]:
+        stats = {}
+        for name, path in self.paths.items():
+            st = os.stat(path)
+            stats[name] = (st.st_size, st.st_mtime_ns)
+        return stats
+
+    def run(self, changed: Iterable[str] = DATASETS) -> RunResult:
+        'Run now, re-hashing the `changed` inputs first.'
+        changed = list(changed)
+        if not self._stats:
+            self._stats = self._stat()
+        for name in changed:
+            self.memo.digests[name] = file_digest(self.paths[name])
+        return self._run(changed)
+
+    def _run(self, changed: list[str]) -> RunResult:
+        start = time.perf_counter()
+        self.last = run_pipeline(
+            self.paths["sales"],
+            self.paths["stock"],
+            self.paths["catalog"],
+            out_dir=self.out_dir,
+            memo=self.memo,
+            **self.run_kwargs,
+        )
+        seconds = time.perf_counter() - start
+        self.runs += 1
+        reused = list(self.memo.reused)
+        logger.info(
+            "event=watch_run run=%s changed=%s reused=%s seconds=%.3f",
+            self.runs,
+            ",".join(changed),
+            ",".join(reused) or "-",
+            seconds,
+        )
+        if self.on_run is not None:
+            self.on_run(self.last, changed, reused, seconds)
+        return self.last
+
+    def poll(self) -> RunResult | None:
+        'One polling step; returns the result of the run it triggered, if any.'
+        try:
+            stats = self._stat()
+        except FileNotFoundError:  # a file is being replaced: look again next time
+            return None
+        now = self._clock()
+        if stats == self._stats:
+            self._pending = None
+            return None
+        if stats != self._pending:
+            self._pending, self._changed_at = stats, now
+            return None
+        if now - self._changed_at < self.debounce_s:
+            return None
+
+        self._pending = None
+        moved = [name for name in DATASETS if stats[name] != self._stats.get(name)]
+        self._stats = stats
+        digests = {name: file_digest(self.paths[name]) for name in moved}
+        changed = [name for name in moved if digests[name] != self.memo.digests.get(name)]
+        if not changed:
+            logger.info("event=watch_unchanged touched=%s", ",".join(moved))
+            return None
+        self.memo.digests.update(digests)
+        return self._run(changed)
+
+    def watch(self, interval_s: float, stop: threading.Event) -> None:
+        'Poll every `interval_s` seconds until `stop` is set; a failed run is logged and watching goes on.'
+        while not stop.wait(interval_s):
+            try:
+                self.poll()
+            except Exception:
+                logger.exception("event=watch_run_failed")
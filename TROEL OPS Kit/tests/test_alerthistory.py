@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import pathlib
+from datetime import datetime
+
+import pandas as pd
+
+from troel_ops_kit.alerthistory import DELTA_COLUMNS, AlertHistory
+from troel_ops_kit.alerts import ALERT_COLUMNS
+from troel_ops_kit.demo import generate_demo
+from troel_ops_kit.pipeline import run
+
+
+def _alerts(*keys: tuple[str, str]) -> pd.DataFrame:
+    return pd.DataFrame(
+        [(code, "warning", sku, "msg", 1.0, pd.Timestamp("2026-03-01")) for code, sku in keys], columns=ALERT_COLUMNS
+    )
+
+
+def test_record_flags_new_persisting_and_resolved(tmp_path: pathlib.Path):
+    history = AlertHistory(tmp_path / "h.sqlite", keep_runs=2)
+    first = history.record(_alerts(("LOW_COVERAGE", "A"), ("DEAD_SKU", "B")), run_at=datetime(2026, 3, 1))
+    assert first["status"].tolist() == ["new", "new"] and list(first.columns) == DELTA_COLUMNS
+
+    delta = history.record(_alerts(("DEAD_SKU", "B"), ("LOW_COVERAGE", "C")), run_at=datetime(2026, 3, 2))
+
+    assert sorted(zip(delta["status"], delta["sku"], strict=True)) == [("new", "C"), ("resolved", "A")]
+    stored = history.alerts().set_index("sku")
+    assert stored.loc["B", "status"] == "persisting" and stored.loc["B", "first_seen"].startswith("2026-03-01")
+
+    history.record(_alerts(("DEAD_SKU", "B")), run_at=datetime(2026, 3, 3))
+    assert history.runs()["run_at"].str[:10].tolist() == ["2026-03-02", "2026-03-03"]  # pruned to keep_runs
+    assert history.alerts().loc[0, "first_seen"].startswith("2026-03-01")
+
+
+def test_record_keeps_one_row_per_key_for_duplicated_alerts(tmp_path: pathlib.Path):
+    history = AlertHistory(tmp_path / "h.sqlite")
+    duplicated = _alerts(("LOW_COVERAGE", "A"), ("LOW_COVERAGE", "A"), ("DEAD_SKU", "B"))
+
+    deltas = [history.record(duplicated, run_at=datetime(2026, 3, day)) for day in (1, 2, 3, 4)]
+
+    assert [len(d) for d in deltas] == [2, 0, 0, 0]
+    stored = history.alerts()
+    assert len(stored) == 2 and set(stored["status"]) == {"persisting"}
+    assert stored["first_seen"].str.startswith("2026-03-01").all()
+    assert history.runs()["n_alerts"].tolist() == [2, 2, 2, 2]
+
+
+def test_run_writes_alerts_delta(tmp_path: pathlib.Path):
+    data_dir = tmp_path / "data"
+    generate_demo(data_dir, n_skus=50, days=90, seed=1)
+    paths = [str(data_dir / f"{name}.csv") for name in ("sales", "stock", "catalog")]
+    history = AlertHistory(tmp_path / "out" / "alert_history.sqlite")
+
+    first = run(*paths, out_dir=str(tmp_path / "out"), alert_history=history)
+    assert first.alerts is not None and first.alerts_delta is not None
+    assert len(first.alerts_delta) == len(first.alerts)
+
+    stock = pd.read_csv(paths[1])
+    last = stock["snapshot_date"] == stock["snapshot_date"].max()
+    stock.loc[last, "on_hand_qty"] = 0  # every SKU with demand runs out
+    stock.to_csv(paths[1], index=False)
+    second = run(*paths, out_dir=str(tmp_path / "out"), alert_history=history)
+
+    delta = pd.read_csv(tmp_path / "out" / "alerts_delta.csv")
+    assert second.alerts is not None and len(delta) == len(second.alerts_delta)
+    new = delta[delta["status"] == "new"]
+    assert len(new) > 0 and set(new["code"]) <= {"LOW_COVERAGE", "LOW_COVERAGE_STREAK"}
+    persisting = history.alerts()["status"].eq("persisting").sum()
+    assert persisting + len(new) == len(second.alerts)
+    assert run(*paths, out_dir=str(tmp_path / "plain"), outputs=["alerts"]).alerts_delta is None
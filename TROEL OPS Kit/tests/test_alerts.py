@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import json
+import pathlib
+from dataclasses import replace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from troel_ops_kit.alerts import (
+    DEFAULT_ALERT_CONFIG,
+    evaluate_rules,
+    load_alert_config,
+    low_coverage_streak_rows,
+    rule_dead_sku,
+    rule_low_coverage_streak,
+)
+
+
+def test_low_coverage_streak_needs_consecutive_snapshots() -> None:
+    history = pd.DataFrame(
+        {
+            "snapshot_date": ["2026-02-20", "2026-02-21", "2026-02-22"] * 2,
+            "sku": ["SKU-0001"] * 3 + ["SKU-0002"] * 3,
+            "coverage_days": [2.0, 3.0, 4.0, 2.0, 9.0, 4.0],
+        }
+    )
+
+    alerts = rule_low_coverage_streak(history, threshold_days=7.0, min_snapshots=3)
+
+    assert alerts["sku"].tolist() == ["SKU-0001"]
+    assert alerts["metric"].tolist() == [4.0]
+
+
+def test_low_coverage_streak_runs_over_the_snapshots_of_the_whole_history() -> None:
+    dates = ["2026-01-05", "2026-01-12", "2026-01-19", "2026-01-26"]
+    history = pd.DataFrame(
+        {
+            "snapshot_date": pd.to_datetime(dates[:3] + [dates[0], dates[1], dates[3]] + dates),
+            "sku": ["GONE"] * 3 + ["GAP"] * 3 + ["LOW"] * 4,  # GONE is not in the latest snapshot, GAP skips one
+            "coverage_days": [1.0] * 10,
+        }
+    )
+
+    alerts = rule_low_coverage_streak(history, threshold_days=7.0, min_snapshots=2)
+
+    assert alerts["sku"].tolist() == ["LOW"]
+    assert alerts["asof"].tolist() == [pd.Timestamp("2026-01-26")]
+    assert alerts["message"].str.contains(" 4 snapshots").all()
+
+
+def test_low_coverage_streak_rows_keep_the_alerts() -> None:
+    history = pd.DataFrame(
+        {
+            "snapshot_date": pd.to_datetime(["2026-02-18", "2026-02-19", "2026-02-20", "2026-02-21", "2026-02-22"] * 3),
+            "sku": ["A"] * 5 + ["B"] * 5 + ["C"] * 5,
+            "coverage_days": [1.0, 9.0, 2.0, 3.0, 4.0, 1.0, 2.0, 3.0, 4.0, 5.0, 9.0, 9.0, 1.0, 9.0, 2.0],
+        }
+    ).sort_values(["snapshot_date", "sku"])
+
+    rows = low_coverage_streak_rows(history, threshold_days=7.0)
+
+    assert rows.groupby("sku")["coverage_days"].apply(list).to_dict() == {
+        "A": [1.0, 9.0, 2.0, 3.0, 4.0],  # A also keeps the dates: the first row of each
+        "B": [1.0, 2.0, 3.0, 4.0, 5.0],
+        "C": [9.0, 2.0],
+    }
+    pd.testing.assert_frame_equal(rule_low_coverage_streak(rows), rule_low_coverage_streak(history))
+
+
+def test_evaluate_rules_uses_config_thresholds_and_explicit_cap(tmp_path: pathlib.Path) -> None:
+    coverage = pd.DataFrame(
+        {
+            "snapshot_date": pd.to_datetime(["2026-02-22"] * 4),
+            "sku": ["A", "B", "C", "D"],
+            "coverage_days": [1.0, 4.0, 9.0, np.inf],
+        }
+    )
+    frames = {
+        "coverage": coverage,
+        "coverage_history": coverage,
+        "aging": coverage.iloc[:0].assign(on_hand_qty=[]),
+        "issues": pd.DataFrame({"level": ["error", "warning"]}),
+    }
+    config_path = tmp_path / "alerts.json"
+    config_path.write_text(
+        json.dumps({"rules": [{"rule": "low_coverage", "threshold_days": 10}, {"rule": "data_quality"}]}),
+        encoding="utf-8",
+    )
+    config = load_alert_config(config_path)
+
+    alerts = evaluate_rules(frames, config)
+    assert alerts["sku"].tolist() == ["*", "A", "B", "C"]
+    assert alerts["severity"].tolist() == ["critical", "critical", "critical", "warning"]
+    assert alerts["message"].tolist()[1] == "Couverture faible (1.0 jours)"
+
+    capped = evaluate_rules(frames, replace(config, max_per_rule=1))
+    assert capped["sku"].tolist() == ["*", "A"]
+
+
+def test_load_alert_config_rejects_unknown_thresholds(tmp_path: pathlib.Path) -> None:
+    config_path = tmp_path / "alerts.json"
+    config_path.write_text(json.dumps({"rules": [{"rule": "dead_sku", "days": 30}]}), encoding="utf-8")
+
+    with pytest.raises(ValueError, match="no parameter"):
+        load_alert_config(config_path)
+
+
+def test_low_coverage_streak_is_opt_in() -> None:
+    example = load_alert_config(pathlib.Path(__file__).parents[1] / "alerts.example.json")
+
+    assert not next(r for r in DEFAULT_ALERT_CONFIG.rules if r.rule == "low_coverage_streak").enabled
+    assert next(r for r in example.rules if r.rule == "low_coverage_streak").enabled
+
+
+def test_dead_sku_alerts_once_per_sku_at_longest_dormant_horizon() -> None:
+    aging = pd.DataFrame(
+        {
+            "snapshot_date": pd.to_datetime(["2026-02-22"] * 3),
+            "sku": ["A", "B", "C"],
+            "on_hand_qty": [5.0, 8.0, 2.0],
+            "dormant_30d": [True, True, False],
+            "dormant_90d": [True, False, False],
+        }
+    )
+
+    alerts = rule_dead_sku(aging, lookback_days=[30, 90], critical_days=90)
+
+    assert alerts[["sku", "severity", "message"]].values.tolist() == [
+        ["B", "warning", "Aucune vente sur 30j avec stock>0"],
+        ["A", "critical", "Aucune vente sur 90j avec stock>0"],
+    ]
+    # JSON configs may give whole days as floats.
+    assert rule_dead_sku(aging, lookback_days=30.0)["sku"].tolist() == ["B", "A"]
+    assert rule_dead_sku(aging, lookback_days=[30.0, 90.0], critical_days=90).equals(alerts)
+    with pytest.raises(ValueError, match="whole days"):
+        rule_dead_sku(aging, lookback_days=30.5)
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import json
+import pathlib
+
+from typer.testing import CliRunner
+
+from troel_ops_kit.batch import load_manifest, run_batch
+from troel_ops_kit.cli import app
+from troel_ops_kit.demo import generate_demo
+
+
+def test_run_batch_isolates_failures_and_consolidates_alerts(tmp_path: pathlib.Path) -> None:
+    for site, seed in [("north", 1), ("south", 2)]:
+        generate_demo(tmp_path / site, n_skus=30, days=60, seed=seed)
+    manifest = tmp_path / "manifest.json"
+    manifest.write_text(
+        json.dumps(
+            {
+                "sites": [
+                    {"site": s, "sales": f"{s}/sales.csv", "stock": f"{s}/stock.csv", "catalog": f"{s}/catalog.csv"}
+                    for s in ("north", "south", "missing")
+                ]
+            }
+        ),
+        encoding="utf-8",
+    )
+
+    out = tmp_path / "out"
+    res = run_batch(load_manifest(manifest, out), out, workers=2, use_cache=False)
+
+    assert [(o.site, o.status) for o in res.outcomes] == [("north", "ok"), ("south", "ok"), ("missing", "failed")]
+    assert "FileNotFoundError" in res.failed[0].error
+    assert set(res.alerts["site"]) == {"north", "south"}
+    assert (out / "north" / "alerts.csv").exists()
+    assert res.alerts_path.exists() and res.summary_path.exists()
+
+
+def test_run_batch_cli_caps_the_input_cache(tmp_path: pathlib.Path) -> None:
+    generate_demo(tmp_path / "north", n_skus=20, days=30, seed=1)
+    manifest = tmp_path / "manifest.json"
+    site = {"site": "north", "sales": "north/sales.csv", "stock": "north/stock.csv", "catalog": "north/catalog.csv"}
+    manifest.write_text(json.dumps({"sites": [site]}), encoding="utf-8")
+
+    for cache_max_mb, entries in (("0", 0), ("10", 3)):
+        cache = tmp_path / f"cache{cache_max_mb}"
+        args = ["run-batch", "--manifest", str(manifest), "--out", str(tmp_path / "out"), "--workers", "1"]
+        result = CliRunner().invoke(app, [*args, "--cache-dir", str(cache), "--cache-max-mb", cache_max_mb])
+        assert result.exit_code == 0, result.output
+        assert len(list(cache.glob("*.npz"))) == entries
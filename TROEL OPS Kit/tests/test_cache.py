@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import os
+import pathlib
+
+import pandas as pd
+
+from troel_ops_kit import pipeline
+from troel_ops_kit.cache import InputCache
+from troel_ops_kit.demo import generate_demo
+
+
+def test_cache_key_follows_content_and_mapping(tmp_path: pathlib.Path) -> None:
+    f = tmp_path / "stock.csv"
+    f.write_text("snapshot_date,sku,on_hand_qty\n2026-02-24,SKU-0001,3\n", encoding="utf-8")
+    cache = InputCache(tmp_path / "cache")
+
+    key = cache.key(f, None, ["snapshot_date"])
+    assert key == cache.key(f, None, ["snapshot_date"])
+    assert key != cache.key(f, {"sku": "SKU"}, ["snapshot_date"])
+
+    f.write_text("snapshot_date,sku,on_hand_qty\n2026-02-24,SKU-0001,4\n", encoding="utf-8")
+    assert key != cache.key(f, None, ["snapshot_date"])
+
+
+def test_cache_evicts_least_recently_used(tmp_path: pathlib.Path) -> None:
+    cache = InputCache(tmp_path, max_bytes=10**9)
+    df = pd.DataFrame({"sku": ["A"] * 100, "qty": range(100)})
+    for i, key in enumerate(["old", "used", "new"]):
+        cache.put(key, df)
+        os.utime(tmp_path / f"{key}.npz", (1000 + i, 1000 + i))
+    cache.get("old")  # touching an entry makes it the most recent one
+
+    cache.max_bytes = 2 * (tmp_path / "new.npz").stat().st_size
+    cache.evict()
+
+    assert sorted(p.stem for p in tmp_path.glob("*.npz")) == ["new", "old"]
+
+
+def test_run_reuses_cached_inputs(tmp_path: pathlib.Path, monkeypatch) -> None:
+    data_dir = tmp_path / "data"
+    generate_demo(data_dir, n_skus=20, days=30, seed=2)
+    paths = [str(data_dir / f"{name}.csv") for name in ("sales", "stock", "catalog")]
+    cache = InputCache(tmp_path / "cache")
+
+    first = pipeline.run(*paths, out_dir=str(tmp_path / "out1"), cache=cache)
+
+    def no_parse(path):
+        raise AssertionError(f"{path} should come from the cache")
+
+    monkeypatch.setattr(pipeline, "read_tabular", no_parse)
+    second = pipeline.run(*paths, out_dir=str(tmp_path / "out2"), cache=cache)
+
+    pd.testing.assert_frame_equal(first.coverage, second.coverage)
+    pd.testing.assert_frame_equal(first.abc, second.abc)
+
+
+def test_cache_round_trips_columns_without_pickle(tmp_path: pathlib.Path) -> None:
+    cache = InputCache(tmp_path)
+    df = pd.DataFrame(
+        {
+            "date": pd.to_datetime(["2026-03-01", None, "2026-03-02"]).as_unit("us"),
+            "sku": pd.Series(["A", None, "é-1"], dtype="str"),
+            "raw": pd.Series(["x", "y", float("nan")], dtype=object),
+            "qty": [1, 2, 3],
+            "cost": [1.5, float("nan"), 2.0],
+            "flag": [True, False, True],
+        }
+    )
+    for key, frame in (("frame", df), ("empty", df.iloc[:0])):
+        cache.put(key, frame)
+        pd.testing.assert_frame_equal(cache.get(key), frame)
+
+    cache.put("mixed", pd.DataFrame({"v": pd.Series([1, "a"], dtype=object)}))
+    assert not (tmp_path / "mixed.npz").exists()  # no pickle-free layout: not cached
+
+    df.to_pickle(tmp_path / "shared.npz")  # never unpickled, even under a cache entry name
+    assert cache.get("shared") is None and not (tmp_path / "shared.npz").exists()
@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+import pathlib
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from troel_ops_kit import demo
+from troel_ops_kit.demo import DemoSpec, generate_dataset
+
+
+def test_generate_dataset_writes_chunks_snapshots_and_scenarios(
+    tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(demo, "CHUNK_CELLS", 100)  # several blocks of days
+    end = date(2026, 3, 31)
+    rows = generate_dataset(tmp_path, DemoSpec(n_skus=40, days=90, snapshots=3), seed=3, end=end)
+
+    sales = pd.read_csv(tmp_path / "sales.csv", parse_dates=["date"])
+    stock = pd.read_csv(tmp_path / "stock.csv")
+    assert len(sales) == rows > 0
+    assert sales["date"].is_monotonic_increasing
+    assert sales["date"].min() >= pd.Timestamp("2026-01-01") and sales["date"].max() <= pd.Timestamp(end)
+    assert (sales["qty"] > 0).all()
+    assert sorted(stock["snapshot_date"].unique()) == ["2026-03-17", "2026-03-24", "2026-03-31"]
+    assert (stock.loc[stock["sku"].isin(["SKU-0001", "SKU-0002", "SKU-0003"]), "on_hand_qty"] == 1).all()
+    recent = sales[sales["date"] >= pd.Timestamp("2026-01-30")]
+    assert "SKU-0005" not in set(recent["sku"])
+
+    again = tmp_path / "again"
+    generate_dataset(again, DemoSpec(n_skus=40, days=90, snapshots=3), seed=3, end=end)
+    assert (again / "sales.csv").read_bytes() == (tmp_path / "sales.csv").read_bytes()
@@ -1,7 +1,15 @@
 import pathlib
+import pickle
+import subprocess
+import sys
+
+import pandas as pd
+import pytest
 
 from troel_ops_kit.demo import generate_demo
-from troel_ops_kit.pipeline import run
+from troel_ops_kit.pipeline import HISTORY_OUTPUTS, OUTPUTS, STAGES, TABLE_OUTPUTS, run
+from troel_ops_kit.skuindex import SkuIndex
+from troel_ops_kit.state import STATE_FILE, load_state
 
 
 def test_end_to_end(tmp_path: pathlib.Path):
@@ -20,3 +28,137 @@ def test_end_to_end(tmp_path: pathlib.Path):
     assert (out_dir / "alerts.csv").exists()
     assert (out_dir / "report.md").exists()
     assert len(res.coverage) > 0
+
+
+@pytest.mark.parametrize("compact_min_rows", [1, 250_000])  # combine chunk aggregates while streaming, or at the end
+def test_streamed_sales_match_full_load(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch, compact_min_rows: int):
+    monkeypatch.setattr("troel_ops_kit.state.COMPACT_MIN_ROWS", compact_min_rows)
+    data_dir = tmp_path / "data"
+    generate_demo(data_dir, n_skus=50, days=90, seed=1)
+    sales = pd.read_csv(data_dir / "sales.csv")
+    pd.concat([sales, sales.iloc[[2, 400]]], ignore_index=True).to_csv(data_dir / "sales.csv", index=False)
+
+    paths = [str(data_dir / f"{name}.csv") for name in ("sales", "stock", "catalog")]
+    full = run(*paths, out_dir=str(tmp_path / "full"))
+    streamed = run(*paths, out_dir=str(tmp_path / "streamed"), sales_chunksize=100)
+
+    pd.testing.assert_frame_equal(full.coverage.reset_index(drop=True), streamed.coverage.reset_index(drop=True))
+    pd.testing.assert_frame_equal(full.dormant.reset_index(drop=True), streamed.dormant.reset_index(drop=True))
+    pd.testing.assert_frame_equal(full.issues.reset_index(drop=True), streamed.issues.reset_index(drop=True))
+    assert full.abc["sku"].tolist() == streamed.abc["sku"].tolist()
+
+
+def test_incremental_run_matches_full_recompute(tmp_path: pathlib.Path):
+    data_dir = tmp_path / "data"
+    generate_demo(data_dir, n_skus=50, days=90, seed=1)
+    sales = pd.read_csv(data_dir / "sales.csv")
+    cut = len(sales) - 120
+    sales.iloc[:cut].to_csv(data_dir / "sales.csv", index=False)
+    paths = [str(data_dir / f"{name}.csv") for name in ("sales", "stock", "catalog")]
+
+    run(*paths, out_dir=str(tmp_path / "inc"), incremental=True)
+    sales.iloc[cut:].to_csv(data_dir / "sales.csv", mode="a", header=False, index=False)
+    incremental = run(*paths, out_dir=str(tmp_path / "inc"), incremental=True)
+    full = run(*paths, out_dir=str(tmp_path / "full"))
+
+    for name in ("coverage", "dormant", "abc", "issues", "alerts"):
+        pd.testing.assert_frame_equal(
+            getattr(full, name).reset_index(drop=True), getattr(incremental, name).reset_index(drop=True)
+        )
+
+    # The fold is stored as npz columns plus a JSON sidecar; a tampered aggregate is refolded, never unpickled.
+    state_path = tmp_path / "inc" / STATE_FILE
+    assert load_state(tmp_path / "inc") is not None and not list((tmp_path / "inc").glob("*.pkl"))
+    state_path.write_bytes(pickle.dumps(pd.DataFrame({"date": [], "sku": []})))
+    assert load_state(tmp_path / "inc") is None
+
+
+def test_incremental_run_applies_read_options(tmp_path: pathlib.Path):
+    data_dir = tmp_path / "data"
+    generate_demo(data_dir, n_skus=50, days=90, seed=1)
+    sales = pd.read_csv(data_dir / "sales.csv").assign(note="x")
+    cut = len(sales) - 120
+    with open(data_dir / "sales.csv", "w", newline="") as f:
+        f.write("exported sales\n")  # column names on the second line
+        sales.iloc[:cut].to_csv(f, index=False)
+    paths = [str(data_dir / f"{name}.csv") for name in ("sales", "stock", "catalog")]
+    mapping = {"read": {"sales": {"header": 1}}}  # default usecols: the kit columns, without `note`
+
+    run(*paths, out_dir=str(tmp_path / "inc"), mapping=mapping, incremental=True)
+    sales.iloc[cut:].to_csv(data_dir / "sales.csv", mode="a", header=False, index=False)
+    incremental = run(*paths, out_dir=str(tmp_path / "inc"), mapping=mapping, incremental=True)
+    full = run(*paths, out_dir=str(tmp_path / "full"), mapping=mapping)
+
+    for name in ("coverage", "abc", "issues"):
+        pd.testing.assert_frame_equal(
+            getattr(full, name).reset_index(drop=True), getattr(incremental, name).reset_index(drop=True)
+        )
+
+
+def test_only_runs_the_stages_requested_outputs_need(tmp_path: pathlib.Path):
+    data_dir = tmp_path / "data"
+    generate_demo(data_dir, n_skus=50, days=90, seed=1)
+    paths = [str(data_dir / f"{name}.csv") for name in ("sales", "stock", "catalog")]
+    full = run(*paths, out_dir=str(tmp_path / "full"))
+
+    res = run(*paths, out_dir=str(tmp_path / "only"), outputs=["coverage"])
+
+    assert sorted(p.name for p in (tmp_path / "only").iterdir()) == ["kpi_coverage.csv", "metrics.json"]
+    assert res.abc is None and res.alerts is None and res.report_path is None
+    assert res.metrics is not None
+    assert [s.stage for s in res.metrics.stages] == ["read", "mapping", "demand", "coverage", "writes"]
+    assert full.coverage is not None and res.coverage is not None
+    pd.testing.assert_frame_equal(full.coverage, res.coverage)
+
+    both = run(*paths, out_dir=str(tmp_path / "both"), outputs=["coverage", "coverage_history"])
+    assert both.metrics is not None
+    demand = both.metrics.stage("demand")
+    assert demand is not None and demand.calls == 1
+
+    # The CLI declares its options from config: its output names must follow the stages.
+    assert tuple(o for o in (*OUTPUTS, *HISTORY_OUTPUTS) if STAGES[o].output is not None) == TABLE_OUTPUTS
+
+
+def test_concurrent_io_writes_the_same_outputs(tmp_path: pathlib.Path):
+    data_dir = tmp_path / "data"
+    generate_demo(data_dir, n_skus=50, days=90, seed=1)
+    paths = [str(data_dir / f"{name}.csv") for name in ("sales", "stock", "catalog")]
+    run(*paths, out_dir=str(tmp_path / "seq"))
+
+    run(*paths, out_dir=str(tmp_path / "par"), io_workers=4, output_format={"coverage": "csv.gz"})
+
+    for name in ("issues", "kpi_coverage_history", "kpi_dormant", "kpi_abc", "alerts"):
+        assert (tmp_path / "par" / f"{name}.csv").read_bytes() == (tmp_path / "seq" / f"{name}.csv").read_bytes()
+    pd.testing.assert_frame_equal(
+        pd.read_csv(tmp_path / "par" / "kpi_coverage.csv.gz"), pd.read_csv(tmp_path / "seq" / "kpi_coverage.csv")
+    )
+
+
+def test_sku_index_answers_point_lookups(tmp_path: pathlib.Path):
+    data_dir = tmp_path / "data"
+    generate_demo(data_dir, n_skus=50, days=90, seed=1)
+    paths = [str(data_dir / f"{name}.csv") for name in ("sales", "stock", "catalog")]
+    res = run(*paths, out_dir=str(tmp_path / "out"))
+    assert res.index_path is not None and res.coverage is not None and res.abc is not None and res.alerts is not None
+
+    with SkuIndex(res.index_path) as ix:
+        assert len(ix) == len(set(res.coverage["sku"].astype(str)) | set(res.abc["sku"].astype(str)))
+        for row in res.coverage.itertuples():
+            rec = ix.get(str(row.sku))
+            assert rec is not None
+            assert rec["on_hand_qty"] == row.on_hand_qty
+            assert rec["coverage_days"] == pytest.approx(row.coverage_days)
+        sku = str(res.alerts["sku"].iloc[0])
+        assert {a["code"] for a in ix.get(sku)["alerts"]} == set(res.alerts.loc[res.alerts["sku"] == sku, "code"])
+        assert ix.get(str(res.abc["sku"].iloc[0]))["abc"] == "A"
+        assert ix.get("SKU-9999") is None and ix.get("") is None
+
+    # `troel-ops query` only reads the index: it must start without the pandas KPI stack.
+    script = (
+        "import sys\n"
+        "from troel_ops_kit.cli import app\n"
+        f"app(['query', '--sku', {sku!r}, '--index', {str(res.index_path)!r}, '--json'], standalone_mode=False)\n"
+        "print('pandas' in sys.modules)\n"
+    )
+    proc = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True)
+    assert sku in proc.stdout and proc.stdout.rstrip().endswith("False")
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import pathlib
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from troel_ops_kit import io
+from troel_ops_kit.io import (
+    ReadOptions,
+    coerce_dates,
+    compact_quantity,
+    iter_tabular,
+    prepare_datasets,
+    read_options,
+    read_tabular,
+    write_frame,
+)
+from troel_ops_kit.kpis import compute_abc, compute_daily_demand, compute_dormant_stock
+
+
+def _inputs() -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    sales = pd.DataFrame(
+        {
+            "date": ["2026-01-01", "2026-01-01", "2026-01-03", "bad"],
+            "sku": ["B", "A", "B", "A"],
+            "qty": [2, 1, 3, 4],
+            "channel": ["web", "shop", "web", "web"],
+        }
+    )
+    stock = pd.DataFrame({"snapshot_date": ["2026-01-03", "2026-01-03"], "sku": ["A", "C"], "on_hand_qty": [5, 7]})
+    catalog = pd.DataFrame(
+        {"sku": ["A", "B", "C"], "unit_cost": [1.0, 2.0, 3.0], "category": "x", "supplier": "y", "description": "z"}
+    )
+    return coerce_dates(sales, ["date"]), coerce_dates(stock, ["snapshot_date"]), catalog
+
+
+def test_prepare_datasets_shares_one_sku_dictionary() -> None:
+    sales, stock, catalog = _inputs()
+    data = prepare_datasets(sales, stock, catalog)
+
+    assert list(data.sales.columns) == ["date", "sku", "qty"]
+    assert data.sales["date"].dtype.kind == "M"
+    assert data.sales["qty"].dtype == np.int32
+    for df in (data.sales, data.stock, data.catalog):
+        assert df["sku"].dtype == data.sku_dtype
+    assert list(data.sku_dtype.categories) == ["A", "B", "C"]
+    assert data.encode_skus(pd.Series(["C", "Z"])).cat.codes.tolist() == [2, -1]
+
+
+def test_compact_quantity_only_narrows_when_exact() -> None:
+    assert compact_quantity(pd.Series([1.0, np.nan, 3.0])).dtype == np.float32
+    assert compact_quantity(pd.Series([1.5, 2.0])).dtype == np.float64
+    assert compact_quantity(pd.Series([2.0**24, 1.0])).dtype == np.float64
+    assert compact_quantity(pd.Series([2**40])).dtype == np.int64
+
+
+def test_kpis_on_prepared_datasets_match_raw_frames() -> None:
+    sales, stock, catalog = _inputs()
+    data = prepare_datasets(sales, stock, catalog)
+
+    raw = compute_daily_demand(sales)
+    prepared = compute_daily_demand(data.sales)
+    assert prepared["date"].tolist() == [pd.Timestamp(d) for d in raw["date"]]
+    assert prepared["sku"].astype(str).tolist() == raw["sku"].tolist()
+    assert prepared["demand_qty"].tolist() == raw["demand_qty"].tolist()
+
+    raw_abc = compute_abc(sales, catalog)
+    prepared_abc = compute_abc(data.sales, data.catalog)
+    pd.testing.assert_frame_equal(prepared_abc.astype({"sku": str}), raw_abc)
+
+    dormant = compute_dormant_stock(data.sales, data.stock, lookback_days=60)
+    assert dormant["sku"].astype(str).tolist() == ["C"]
+
+
+def _workbook(path: pathlib.Path) -> pd.DataFrame:
+    sales = pd.DataFrame(
+        {
+            "Date": pd.to_datetime(["2026-01-01", "2026-01-02", None, "2026-01-04", "2026-01-05"]),
+            "Article": ["A", "B", "A", None, "C"],
+            "Quantite": [1, 2.5, 3, 4, 5],
+            "Commentaire": ["x", None, "y", "z", "w"],
+        }
+    )
+    with pd.ExcelWriter(path, engine="openpyxl") as writer:
+        pd.DataFrame({"notes": ["other sheet"]}).to_excel(writer, sheet_name="Lisez-moi", index=False)
+        sales.to_excel(writer, sheet_name="Ventes", index=False, startrow=2)
+    return sales
+
+
+def test_read_options_default_to_mapped_kit_columns() -> None:
+    doc = {"sales": {"sku": "Article"}, "read": {"sales": {"sheet": "Ventes", "header": 2}, "stock": {"usecols": "all"}}}
+    assert read_options(doc, "sales") == ReadOptions("Ventes", 2, ("date", "Article", "qty"))
+    assert read_options(doc, "stock").usecols is None
+    assert read_options(None, "catalog").usecols == io.KIT_COLUMNS["catalog"]
+
+
+def test_streamed_excel_matches_pandas(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    path = tmp_path / "sales.xlsx"
+    _workbook(path)
+    monkeypatch.setattr(io, "excel_engine", lambda: "openpyxl")
+    options = ReadOptions(sheet="Ventes", header=2, usecols=("Date", "Article", "Quantite"))
+
+    expected = pd.read_excel(path, sheet_name="Ventes", header=2, usecols=["Date", "Article", "Quantite"])
+    pd.testing.assert_frame_equal(read_tabular(path, options), expected)
+
+    chunks = list(iter_tabular(path, 2, options))
+    assert [len(c) for c in chunks] == [2, 2, 1]
+    pd.testing.assert_frame_equal(pd.concat(chunks), expected)
+    assert list(read_tabular(path, ReadOptions(sheet=1, header=2)).columns) == list(expected.columns) + ["Commentaire"]
+
+
+def test_calamine_engine_matches_stream(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    pytest.importorskip("python_calamine")
+    path = tmp_path / "sales.xlsx"
+    _workbook(path)
+    options = ReadOptions(sheet="Ventes", header=2, usecols=("Date", "Article", "Quantite"))
+
+    fast = read_tabular(path, options)
+    monkeypatch.setattr(io, "excel_engine", lambda: "openpyxl")
+    pd.testing.assert_frame_equal(fast, read_tabular(path, options), check_dtype=False)
+
+
+def test_write_frame_formats(tmp_path: pathlib.Path) -> None:
+    df = pd.DataFrame({"sku": pd.Categorical(["A", "B"]), "qty": [1, 2]})
+    gz = write_frame(df, tmp_path / "kpi", "csv.gz")
+    assert gz.name == "kpi.csv.gz"
+    pd.testing.assert_frame_equal(pd.read_csv(gz), df.astype({"sku": str}), check_dtype=False)
+    with pytest.raises(ValueError):
+        write_frame(df, tmp_path / "kpi", "xml")
+
+    pytest.importorskip("pyarrow")
+    pd.testing.assert_frame_equal(pd.read_parquet(write_frame(df, tmp_path / "kpi", "parquet")), df)
@@ -1,8 +1,24 @@
 from __future__ import annotations
 
+import numpy as np
 import pandas as pd
+import pytest
 
-from troel_ops_kit.kpis import compute_avg_daily_demand, compute_coverage_days
+from troel_ops_kit.kpis import (
+    ClassificationConfig,
+    ForecastConfig,
+    classify,
+    compute_abc,
+    compute_abc_xyz,
+    compute_avg_daily_demand,
+    compute_coverage_days,
+    compute_coverage_history,
+    compute_demand_forecast,
+    compute_dormant_stock,
+    compute_sales_recency,
+    compute_stock_aging,
+    forecast_daily_demand,
+)
 
 
 def test_compute_avg_daily_demand_keeps_sku_column() -> None:
@@ -26,6 +42,14 @@ def test_compute_avg_daily_demand_empty_input() -> None:
     assert list(out.columns) == ["date", "sku", "avg_daily_demand"]
     assert out.empty
 
+    # Rows without a date or a sku are dropped: nothing left, with or without an end date.
+    unusable = pd.DataFrame(
+        {"date": pd.to_datetime([None, "2026-02-20"]), "sku": ["A", None], "demand_qty": [1.0, 2.0]}
+    )
+    for end_date in (None, pd.Timestamp("2026-02-24").date()):
+        out = compute_avg_daily_demand(unusable, window_days=28, end_date=end_date)
+        assert list(out.columns) == ["date", "sku", "avg_daily_demand"] and out.empty
+
 
 def test_compute_avg_daily_demand_extends_until_requested_end_date() -> None:
     demand = pd.DataFrame(
@@ -62,3 +86,185 @@ def test_compute_coverage_uses_last_available_avg_demand_before_snapshot() -> No
 
     assert out.iloc[0]["avg_daily_demand"] == 5.0
     assert out.iloc[0]["coverage_days"] == 4.0
+
+
+def test_compute_avg_daily_demand_matches_per_sku_rolling_mean() -> None:
+    demand = pd.DataFrame(
+        {
+            "date": ["2026-02-20", "2026-02-23", "2026-02-21", "2026-02-22", "2026-02-26"],
+            "sku": ["SKU-0002", "SKU-0002", "SKU-0001", "SKU-0001", "SKU-0001"],
+            "demand_qty": [4.0, 8.0, 3.0, 6.0, 9.0],
+        }
+    )
+
+    out = compute_avg_daily_demand(demand, window_days=3, end_date=pd.Timestamp("2026-02-25").date())
+
+    expected: list[pd.Series] = []
+    for _, g in demand.assign(date=pd.to_datetime(demand["date"])).groupby("sku"):
+        days = pd.date_range(g["date"].min(), max(g["date"].max(), pd.Timestamp("2026-02-25")), freq="D")
+        series = g.set_index("date")["demand_qty"].reindex(days, fill_value=0.0)
+        expected.append(series.rolling(3, min_periods=1).mean())
+
+    assert out["sku"].tolist() == ["SKU-0001"] * 6 + ["SKU-0002"] * 6
+    assert out["avg_daily_demand"].tolist() == pd.concat(expected).tolist()
+
+
+def _reference_forecast(series: list[float], model: str, alpha: float, beta: float) -> float:
+    'One SKU, one model, textbook recursions from its first sale.'
+    level, trend, interval, since = series[0], 0.0, 1.0, 0
+    for y in series[1:]:
+        if model == "ses":
+            level = alpha * y + (1 - alpha) * level
+        elif model == "holt":
+            previous = level
+            level = alpha * y + (1 - alpha) * (level + trend)
+            trend = beta * (level - previous) + (1 - beta) * trend
+        else:
+            since += 1
+            if y > 0:
+                level = alpha * y + (1 - alpha) * level
+                interval = alpha * since + (1 - alpha) * interval
+                since = 0
+    if model == "holt":
+        return max(level + trend, 0.0)
+    if model in ("croston", "sba"):
+        return level / interval * (1 - alpha / 2 if model == "sba" else 1.0)
+    return max(level, 0.0)
+
+
+@pytest.mark.parametrize("model", ["ses", "holt", "croston", "sba"])
+def test_forecast_daily_demand_matches_per_sku_recursion(model: str) -> None:
+    rng = np.random.default_rng(4)
+    days = pd.date_range("2026-01-01", periods=60, freq="D")
+    rows = [
+        (day, f"SKU-{i}", float(rng.integers(1, 20)))
+        for i, p in enumerate([0.9, 0.3, 0.05, 0.6])
+        for day in days[5 * i :]
+        if rng.random() < p
+    ]
+    demand = pd.DataFrame(rows, columns=["date", "sku", "demand_qty"])
+    at = [pd.Timestamp("2026-02-10").date(), pd.Timestamp("2026-03-10").date()]
+
+    out = forecast_daily_demand(demand, at, model, alpha=0.2, beta=0.1)
+
+    for (sku, day), value in out.set_index(["sku", "date"])["avg_daily_demand"].items():
+        g = demand[demand["sku"] == sku].set_index("date")["demand_qty"]
+        series = g.reindex(pd.date_range(g.index.min(), day, freq="D"), fill_value=0.0).tolist()
+        assert value == pytest.approx(_reference_forecast(series, model, 0.2, 0.1)), (sku, day)
+    first = demand.groupby("sku")["date"].min()
+    assert len(out) == sum((first <= pd.Timestamp(d)).sum() for d in at)
+
+
+def test_demand_forecast_per_abc_class() -> None:
+    demand = pd.DataFrame(
+        {
+            "date": pd.to_datetime(["2026-03-01", "2026-03-02", "2026-03-01", "2026-03-03"]),
+            "sku": ["A1", "A1", "C1", "C1"],
+            "demand_qty": [10.0, 20.0, 6.0, 6.0],
+        }
+    )
+    config = ForecastConfig("ses", by_class=(("C", "mean"),), alpha=0.5)
+    classes = pd.Series(["A", "C"], index=["A1", "C1"])
+
+    out = compute_demand_forecast(demand, [pd.Timestamp("2026-03-03").date()], config, classes)
+
+    last = out.sort_values("date").groupby("sku")["avg_daily_demand"].last()
+    assert last["A1"] == 0.5 * (0.5 * 10 + 0.5 * 20)  # ses: 10 -> 15 -> 7.5
+    assert last["C1"] == 12 / 3  # trailing mean, every day of C1
+    assert len(out[out["sku"] == "C1"]) == 3
+    with pytest.raises(ValueError, match="demand model"):
+        ForecastConfig("arima")
+
+
+def test_compute_coverage_history_matches_each_snapshot() -> None:
+    avg_demand = pd.DataFrame(
+        {
+            "date": ["2026-02-20", "2026-02-22", "2026-02-21"],
+            "sku": ["SKU-0001", "SKU-0001", "SKU-0002"],
+            "avg_daily_demand": [2.0, 4.0, 1.0],
+        }
+    )
+    stock = pd.DataFrame(
+        {
+            "snapshot_date": ["2026-02-21", "2026-02-21", "2026-02-23", "2026-02-23"],
+            "sku": ["SKU-0001", "SKU-0002", "SKU-0001", "SKU-0002"],
+            "on_hand_qty": [10.0, 3.0, 10.0, 3.0],
+        }
+    )
+
+    history = compute_coverage_history(stock, avg_demand)
+
+    assert history["coverage_days"].tolist() == [5.0, 3.0, 2.5, 3.0]
+    for snapshot, expected in history.groupby("snapshot_date"):
+        single = compute_coverage_days(stock, avg_demand, asof=snapshot).sort_values("sku")
+        assert single["coverage_days"].tolist() == expected["coverage_days"].tolist()
+
+
+def test_classify_upper_bounds_are_inclusive() -> None:
+    out = classify(np.array([0.1, 0.8, 0.81, 0.95, 1.0, np.nan]), (0.8, 0.95), "ABC")
+    assert out.tolist() == ["A", "A", "B", "B", "C", None]
+    with pytest.raises(ValueError):
+        ClassificationConfig(abc_cutoffs=(0.95, 0.8))
+
+
+def test_compute_abc_xyz_matches_per_period_recomputation() -> None:
+    rng = np.random.default_rng(3)
+    dates = pd.date_range(end="2026-03-31", periods=200, freq="D")
+    sales = pd.DataFrame(
+        {
+            "date": np.repeat(dates, 6),
+            "sku": np.tile(["A", "B", "C", "D", "E", "F"], len(dates)),
+            "qty": rng.poisson([5, 1, 3, 0.2, 8, 2], size=(len(dates), 6)).ravel(),
+        }
+    )
+    sales = sales[sales["qty"] > 0]
+    catalog = pd.DataFrame(
+        {
+            "sku": list("ABCDEF"),
+            "unit_cost": [1.0, 20.0, 2.0, 50.0, 0.5, np.nan],
+            "category": "x",
+            "supplier": "y",
+            "description": "z",
+        }
+    )
+    config = ClassificationConfig(periods=(28, 90), abc_cutoffs=(0.5, 0.9), bucket_days=7)
+
+    out = compute_abc_xyz(sales, catalog, config).set_index("sku")
+
+    age = (dates[-1] - sales["date"]).dt.days
+    for p in config.periods:
+        window = sales[age < p]
+        expected = compute_abc(window, catalog, config.abc_cutoffs).set_index("sku")
+        assert out.loc[expected.index, f"abc_{p}d"].tolist() == expected["abc"].tolist()
+        assert out.loc[expected.index, f"qty_{p}d"].tolist() == expected["total_qty"].tolist()
+
+        weeks = window.assign(week=age[age < p] // 7).query(f"week < {p // 7}")
+        per_week = weeks.pivot_table(index="sku", columns="week", values="qty", aggfunc="sum", fill_value=0)
+        per_week = per_week.reindex(columns=range(p // 7), fill_value=0)
+        cv = per_week.std(axis=1, ddof=0) / per_week.mean(axis=1)
+        assert out.loc[cv.index, f"cv_{p}d"].to_numpy() == pytest.approx(cv.to_numpy())
+        assert set(out[f"class_{p}d"]) <= {a + x for a in "ABC" for x in "XYZ"}
+
+
+def test_stock_aging_matches_dormant_stock_per_horizon() -> None:
+    rng = np.random.default_rng(3)
+    dates = pd.date_range("2025-01-01", "2026-02-28", freq="D")
+    sales = pd.DataFrame({"date": rng.choice(dates, 400), "sku": rng.choice(list("ABCDEFGH"), 400), "qty": 1})
+    sales = sales[~((sales["sku"] == "G") & (sales["date"] > "2025-02-01"))]
+    stock = pd.DataFrame(
+        {"snapshot_date": pd.Timestamp("2026-02-28"), "sku": list("ABCDEFGHZ"), "on_hand_qty": [5.0] * 8 + [2.0]}
+    )
+    catalog = pd.DataFrame({"sku": list("ABCDEFGHZ"), "unit_cost": [2.0] * 8 + [np.nan]})
+    horizons = (30, 60, 365)
+
+    recency = compute_sales_recency(sales, pd.Timestamp("2026-02-28").date(), horizons)
+    aging = compute_stock_aging(stock, recency, catalog, horizons).set_index("sku")
+
+    for h in horizons:
+        dormant = compute_dormant_stock(sales, stock, lookback_days=h)
+        assert set(aging.index[aging[f"dormant_{h}d"]]) == set(dormant["sku"])
+        assert aging[f"dormant_value_{h}d"].sum() == pytest.approx(2.0 * dormant.loc[dormant["sku"] != "Z", "on_hand_qty"].sum())
+    last = sales.groupby("sku")["date"].max()
+    assert aging.loc[last.index, "last_sale"].tolist() == last.tolist()
+    assert aging.loc["G", "aging_bucket"] == ">365d" and pd.isna(aging.loc["Z", "last_sale"])
+    assert aging.index[0] == "Z"  # never sold first
@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+import json
+import pathlib
+import pstats
+
+from troel_ops_kit.demo import generate_demo
+from troel_ops_kit.pipeline import run
+
+STAGES = ["read", "mapping", "validate", "writes", "demand", "coverage", "dormant", "abc", "alerts", "report", "index"]
+
+
+def test_run_records_stage_metrics_and_profile(tmp_path: pathlib.Path) -> None:
+    data_dir = tmp_path / "data"
+    generate_demo(data_dir, n_skus=20, days=30, seed=4)
+    paths = [str(data_dir / f"{name}.csv") for name in ("sales", "stock", "catalog")]
+
+    res = run(*paths, out_dir=str(tmp_path / "out"), profile=True)
+
+    assert res.metrics is not None
+    assert [s.stage for s in res.metrics.stages] == STAGES
+    read = res.metrics.stage("read")
+    assert read is not None and read.calls == 3 and read.rows > 0
+    assert all(s.wall_s >= 0 and s.peak_alloc_mb is not None for s in res.metrics.stages)
+
+    doc = json.loads((tmp_path / "out" / "metrics.json").read_text(encoding="utf-8"))
+    assert [s["stage"] for s in doc["stages"]] == STAGES
+    assert doc["profile_path"] == res.metrics.profile_path
+    assert pstats.Stats(doc["profile_path"]).total_calls > 0
+
+
+def test_run_without_profile_still_writes_metrics(tmp_path: pathlib.Path) -> None:
+    data_dir = tmp_path / "data"
+    generate_demo(data_dir, n_skus=20, days=30, seed=4)
+    paths = [str(data_dir / f"{name}.csv") for name in ("sales", "stock", "catalog")]
+
+    res = run(*paths, out_dir=str(tmp_path / "out"), sales_chunksize=50)
+
+    assert res.metrics is not None and res.metrics.profile_path is None
+    assert all(s.peak_alloc_mb is None for s in res.metrics.stages)
+    assert not list((tmp_path / "out").glob("profile_*.prof"))
+    assert (tmp_path / "out" / "metrics.json").exists()
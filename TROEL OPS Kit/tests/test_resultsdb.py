@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import pathlib
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from troel_ops_kit.demo import generate_demo
+from troel_ops_kit.pipeline import run
+from troel_ops_kit.resultsdb import write_results_db
+
+
+def test_run_loads_outputs_into_indexed_results_db(tmp_path: pathlib.Path):
+    data_dir = tmp_path / "data"
+    generate_demo(data_dir, n_skus=50, days=90, seed=1)
+    paths = [str(data_dir / f"{name}.csv") for name in ("sales", "stock", "catalog")]
+
+    res = run(*paths, out_dir=str(tmp_path / "out"), outputs=["coverage", "abc", "alerts"], results_db=True)
+
+    assert res.results_db_path == tmp_path / "out" / "results.sqlite" and res.abc is not None
+    with sqlite3.connect(res.results_db_path) as conn:
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        assert tables == {"kpi_coverage", "kpi_abc", "alerts", "run_metadata"}
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert {"kpi_coverage_sku", "kpi_abc_category", "kpi_abc_supplier", "kpi_abc_abc"} <= indexes
+        plan = conn.execute("EXPLAIN QUERY PLAN SELECT * FROM kpi_abc WHERE category = 'x'").fetchall()
+        assert "USING INDEX kpi_abc_category" in plan[0][-1]
+        meta = dict(conn.execute("SELECT key, value FROM run_metadata").fetchall())
+        stored = pd.read_sql_query("SELECT * FROM kpi_abc", conn)
+    assert meta["outputs"] == "coverage,abc,alerts" and meta["rows.kpi_abc"] == str(len(res.abc))
+    csv = pd.read_csv(tmp_path / "out" / "kpi_abc.csv", float_precision="round_trip")
+    pd.testing.assert_frame_equal(stored, csv, check_dtype=False)
+    assert not list((tmp_path / "out").glob("*.tmp"))
+
+
+def test_write_results_db_maps_types_and_missing_values(tmp_path: pathlib.Path):
+    df = pd.DataFrame(
+        {
+            "snapshot_date": pd.to_datetime(["2026-03-01", None]),
+            "sku": pd.Categorical(["A", None]),
+            "dormant": [True, False],
+            "qty": np.array([3, 4], dtype=np.int32),
+            "metric": [1.5, np.nan],
+        }
+    )
+
+    path = write_results_db(tmp_path / "r.sqlite", {"t": df}, {"kit_version": "x"})
+
+    with sqlite3.connect(path) as conn:
+        rows = conn.execute("SELECT * FROM t").fetchall()
+        types = [row[2] for row in conn.execute("PRAGMA table_info(t)")]
+    assert rows == [("2026-03-01", "A", 1, 3, 1.5), (None, None, 0, 4, None)]
+    assert types == ["TEXT", "TEXT", "INTEGER", "INTEGER", "REAL"]
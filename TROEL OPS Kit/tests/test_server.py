@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import json
+import os
+import pathlib
+import threading
+import urllib.error
+import urllib.request
+
+import pandas as pd
+import pytest
+
+from troel_ops_kit.demo import generate_demo
+from troel_ops_kit.loadtest import default_paths, run_load_test
+from troel_ops_kit.pipeline import run
+from troel_ops_kit.server import KpiService, make_server
+
+
+@pytest.fixture()
+def served(tmp_path: pathlib.Path):
+    data_dir = tmp_path / "data"
+    generate_demo(data_dir, n_skus=50, days=90, seed=1)
+    paths = [str(data_dir / f"{name}.csv") for name in ("sales", "stock", "catalog")]
+    service = KpiService(*paths, out_dir=str(tmp_path / "serve"))
+    server = make_server(service, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield service, f"http://127.0.0.1:{server.server_address[1]}", paths
+    server.shutdown()
+    server.server_close()
+
+
+def _get(url: str):
+    with urllib.request.urlopen(url) as resp:
+        return json.loads(resp.read())
+
+
+def test_queries_match_pipeline_outputs(served, tmp_path: pathlib.Path):
+    _, url, paths = served
+    res = run(*paths, out_dir=str(tmp_path / "cli"))
+    assert res.coverage is not None and res.alerts is not None
+
+    lowest = res.coverage.iloc[0]
+    body = _get(f"{url}/sku/{lowest['sku']}")
+    assert body["coverage"]["on_hand_qty"] == lowest["on_hand_qty"]
+    assert body["coverage"]["coverage_days"] == pytest.approx(lowest["coverage_days"])
+    assert {a["code"] for a in body["alerts"]} == set(res.alerts.loc[res.alerts["sku"] == lowest["sku"], "code"])
+
+    top = _get(f"{url}/coverage?n=5")
+    assert [r["sku"] for r in top] == res.coverage["sku"].astype(str).head(5).tolist()
+    category = _get(f"{url}/category/{body['coverage']['category']}?n=3")
+    assert category["skus"] > 0 and len(category["lowest_coverage"]) <= 3
+    assert len(_get(f"{url}/alerts?n=1000")) == len(res.alerts)
+
+    with pytest.raises(urllib.error.HTTPError) as err:
+        _get(f"{url}/sku/NOPE")
+    assert err.value.code == 404
+
+
+def test_reload_only_when_inputs_change(served):
+    service, url, paths = served
+    assert not service.maybe_reload()
+
+    stock = pd.read_csv(paths[1])
+    sku = stock["sku"].iloc[-1]
+    stock.loc[stock.index[-1], "on_hand_qty"] = 123_456
+    stock.to_csv(paths[1], index=False)
+    os.utime(paths[1], ns=(0, 0))  # distinct mtime even on coarse filesystem clocks
+
+    assert service.maybe_reload()
+    assert _get(f"{url}/sku/{sku}")["coverage"]["on_hand_qty"] == 123_456
+
+
+def test_load_test_reports_latency(served):
+    _, url, _ = served
+    report = run_load_test(url, default_paths(url, n=20), requests=60, concurrency=3)
+    assert report.requests == 60 and report.errors == 0
+    assert 0 < report.p50_ms <= report.p99_ms <= report.max_ms
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import pathlib
+
+import pandas as pd
+import pytest
+from typer.testing import CliRunner
+
+from troel_ops_kit.cli import app
+from troel_ops_kit.demo import DemoSpec, generate_dataset
+from troel_ops_kit.kpis import ForecastConfig
+from troel_ops_kit.pipeline import run
+from troel_ops_kit.sharded import SHARDED_OUTPUTS, run_sharded, shard_of
+
+
+def test_sharded_run_matches_whole_run(tmp_path: pathlib.Path):
+    data_dir = tmp_path / "data"
+    generate_dataset(data_dir, DemoSpec(n_skus=60, days=120, snapshots=4), seed=3)
+    sales = pd.read_csv(data_dir / "sales.csv")
+    extra = sales.iloc[[5, 5, 300]].assign(qty=[2.5, 2.5, 1.0])  # duplicates; floats only in the last chunk
+    extra.loc[extra.index[2], "sku"] = "NOT-IN-CATALOG"
+    pd.concat([sales, extra], ignore_index=True).to_csv(data_dir / "sales.csv", index=False)
+    paths = [str(data_dir / f"{name}.csv") for name in ("sales", "stock", "catalog")]
+
+    run(*paths, out_dir=str(tmp_path / "whole"))
+    res = run_sharded(*paths, out_dir=str(tmp_path / "sharded"), shards=3, workers=2, chunksize=500)
+
+    for path in sorted((tmp_path / "sharded").iterdir()):
+        if path.name != "metrics.json":
+            assert path.read_bytes() == (tmp_path / "whole" / path.name).read_bytes(), path.name
+    assert len(list((tmp_path / "sharded").iterdir())) == len(SHARDED_OUTPUTS) + 1
+    assert res.metrics is not None and res.metrics.stage("partition") is not None
+    assert not list((tmp_path / "sharded").glob("troel-shards-*"))
+
+
+def test_sharded_forecast_per_abc_class_matches_whole_run(tmp_path: pathlib.Path):
+    data_dir = tmp_path / "data"
+    generate_dataset(data_dir, DemoSpec(n_skus=60, days=120, snapshots=4), seed=5)
+    paths = [str(data_dir / f"{name}.csv") for name in ("sales", "stock", "catalog")]
+    forecast = ForecastConfig("ses", by_class=(("A", "holt"), ("C", "sba")))
+    outputs = ["coverage", "abc", "alerts"]
+
+    run(*paths, out_dir=str(tmp_path / "mean"), outputs=outputs)
+    run(*paths, out_dir=str(tmp_path / "whole"), outputs=outputs, forecast=forecast)
+    res = run_sharded(*paths, out_dir=str(tmp_path / "sharded"), shards=3, outputs=outputs, forecast=forecast)
+
+    for name in ("kpi_coverage.csv", "kpi_abc.csv", "alerts.csv"):
+        assert (tmp_path / "sharded" / name).read_bytes() == (tmp_path / "whole" / name).read_bytes(), name
+    assert (tmp_path / "whole" / "kpi_coverage.csv").read_bytes() != (tmp_path / "mean" / "kpi_coverage.csv").read_bytes()
+    assert res.metrics is not None and res.metrics.stage("shards") is not None
+
+
+def test_shard_of_is_stable_and_keeps_skus_together():
+    skus = pd.Series(["A", "B", None, "A", 17])
+    shards = shard_of(skus, 4)
+    assert shards[0] == shards[3] and shards[2] == 0
+    assert shards[4] == shard_of(pd.Series(["17"]), 4)[0]  # SKUs are hashed as labels
+    with pytest.raises(ValueError, match="coverage_history"):
+        run_sharded("s.csv", "st.csv", "c.csv", "out", shards=2, outputs=["coverage_history"])
+
+
+def test_run_cli_rejects_options_sharded_runs_ignore(tmp_path: pathlib.Path):
+    paths = ["--sales", "s.csv", "--stock", "st.csv", "--catalog", "c.csv", "--out", str(tmp_path)]
+    for option in (["--io-workers", "4"], ["--no-cache"], ["--cache-dir", str(tmp_path)], ["--cache-max-mb", "64"]):
+        result = CliRunner().invoke(app, ["run", *paths, "--shards", "4", *option])
+        assert result.exit_code == 2 and "cannot be combined with --shards" in result.output
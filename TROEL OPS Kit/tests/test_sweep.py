@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import pathlib
+
+import pandas as pd
+import pytest
+
+from troel_ops_kit.alerts import AlertConfig, RuleConfig
+from troel_ops_kit.config import parse_days
+from troel_ops_kit.demo import DemoSpec, generate_dataset
+from troel_ops_kit.kpis import ForecastConfig
+from troel_ops_kit.pipeline import run
+from troel_ops_kit.sweep import SweepGrid, run_sweep
+
+
+@pytest.mark.parametrize(("window", "threshold", "lookback"), [(28, 7.0, 60), (7, 21.0, 30), (56, 12.0, 90)])
+def test_sweep_matches_full_runs(tmp_path: pathlib.Path, window: int, threshold: float, lookback: int):
+    data_dir = tmp_path / "data"
+    generate_dataset(data_dir, DemoSpec(n_skus=80, days=150, snapshots=6), seed=2)
+    paths = [str(data_dir / f"{name}.csv") for name in ("sales", "stock", "catalog")]
+    stock = pd.read_csv(paths[1])
+    dates = sorted(stock["snapshot_date"].unique())
+    gaps = (stock["sku"].isin(stock["sku"].unique()[:10])) & stock["snapshot_date"].isin([dates[-1], dates[-3]])
+    stock[~gaps].to_csv(paths[1], index=False)  # SKUs missing from the latest or a middle snapshot break streaks
+    grid = SweepGrid(thresholds=(7.0, 12.0, 21.0), windows=(7, 28, 56), lookbacks=(30, 60, 90))
+
+    matrix, path = run_sweep(*paths, out_dir=str(tmp_path / "sweep"), grid=grid)
+
+    assert path.name == "sweep.csv" and len(matrix) == 27
+    alert_config = AlertConfig(
+        rules=(
+            RuleConfig("low_coverage", {"threshold_days": threshold}),
+            RuleConfig("low_coverage_streak", {"threshold_days": threshold, "min_snapshots": 3}),
+            RuleConfig("dead_sku", {"lookback_days": lookback}),
+        )
+    )
+    res = run(
+        *paths,
+        out_dir=str(tmp_path / "run"),
+        alert_config=alert_config,
+        forecast=ForecastConfig(window_days=window),
+        outputs=["alerts"],
+    )
+    assert res.alerts is not None
+    counts = res.alerts["code"].value_counts()
+    row = matrix.set_index(["window_days", "threshold_days", "lookback_days"]).loc[(window, threshold, lookback)]
+    assert row["low_coverage"] == counts.get("LOW_COVERAGE", 0)
+    assert row["low_coverage_streak"] == counts.get("LOW_COVERAGE_STREAK", 0)
+    assert row["dead_sku"] == counts.get("DEAD_SKU", 0)
+    assert row["alerts"] == len(res.alerts)
+
+    stock = pd.read_csv(paths[1]).sort_values("snapshot_date", kind="stable").groupby("sku").tail(1)
+    cost = pd.read_csv(paths[2]).set_index("sku")["unit_cost"]
+    value = (stock.set_index("sku")["on_hand_qty"] * cost).fillna(0.0)
+    assert row["affected_value"] == pytest.approx(value[res.alerts["sku"].unique()].sum())
+
+
+def test_parse_days_and_grid_checks():
+    assert parse_days("3-5,7") == (3.0, 4.0, 5.0, 7.0)
+    with pytest.raises(ValueError, match="windows"):
+        SweepGrid(windows=(0, 7))
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from troel_ops_kit.contracts import CatalogRow, SalesRow
+from troel_ops_kit.state import SalesFold, fold_sales
+from troel_ops_kit.validate import (
+    _validate_records,
+    issue_counts,
+    issues_frame,
+    sku_dictionary,
+    validate_catalog,
+    validate_frame,
+    validate_sales,
+)
+
+
+def _as_tuples(issues: list) -> list[tuple]:
+    return [(i.level, i.dataset, i.row, i.field, i.message) for i in issues]
+
+
+def test_columnar_sales_validation_matches_pydantic_rows() -> None:
+    sales = pd.DataFrame(
+        {
+            "date": [date(2026, 2, 20), None, "2026-02-21", "not a date"],
+            "sku": ["SKU-0001", "", None, "SKU-0002"],
+            "qty": [1.0, -2.0, "x", -1],
+        },
+        dtype=object,
+    )
+
+    assert _as_tuples(validate_sales(sales)) == _as_tuples(_validate_records(sales, SalesRow, "sales"))
+
+
+def test_uniform_object_columns_match_pydantic_rows() -> None:
+    # Object columns holding only strings or only numbers skip the per-cell type checks.
+    sales = pd.DataFrame(
+        {
+            "date": [date(2026, 2, 20), date(2026, 2, 21), date(2026, 2, 22)],
+            "sku": ["SKU-0001", "", np.str_("SKU-0002")],
+            "qty": [np.float16(1.5), -2, np.uint8(3)],
+        },
+        dtype=object,
+    )
+
+    assert _as_tuples(validate_sales(sales)) == _as_tuples(_validate_records(sales, SalesRow, "sales"))
+    assert [i.message for i in validate_sales(sales)] == [
+        "String should have at least 1 character",
+        "Value error, qty must be >= 0",
+    ]
+
+
+def test_columnar_catalog_validation_matches_pydantic_rows() -> None:
+    catalog = pd.DataFrame(
+        {
+            "sku": ["SKU-0001", None, "SKU-0003"],
+            "category": ["AUDIO", None, float("nan")],
+            "unit_cost": [1.5, float("nan"), 3.0],
+        }
+    )
+
+    expected = _validate_records(catalog.fillna(value={"sku": ""}), CatalogRow, "catalog")
+    row_issues = [i for i in validate_catalog(catalog) if i.message != "sku is missing"]
+    assert _as_tuples(row_issues) == _as_tuples(expected)
+
+
+def test_unparseable_dates_are_reported_as_issues() -> None:
+    sales = pd.DataFrame({"date": [date(2026, 2, 20), pd.NaT], "sku": ["A", "B"], "qty": [1.0, 2.0]})
+    sales["date"] = sales["date"].astype(object)
+
+    issues = validate_sales(sales)
+
+    assert _as_tuples(issues) == [("error", "sales", 1, "date", "Input should be a valid date")]
+
+
+def test_fused_validation_reports_every_issue_per_check() -> None:
+    sales = pd.DataFrame(
+        {
+            "date": pd.to_datetime(["2026-02-20"] * 40 + ["2026-02-21"] * 20),
+            "sku": ["SKU-0001"] * 30 + [f"X-{i}" for i in range(30)],
+            "qty": [1.0] * 59 + [-1.0],
+        }
+    )
+    catalog = pd.DataFrame({"sku": ["SKU-0001", None]})
+
+    issues = issues_frame(
+        validate_frame(sales, "sales", sku_dictionary(catalog)) + validate_frame(catalog, "catalog")
+    )
+
+    by_check = issues.groupby(["dataset", "check"]).size().to_dict()
+    assert by_check == {
+        ("catalog", "missing_sku"): 1,
+        ("catalog", "row_contract"): 1,
+        ("sales", "duplicate_key"): 30,
+        ("sales", "row_contract"): 1,
+        ("sales", "unknown_sku"): 30,
+    }
+    # Errors first, then by dataset and row; checks keep their order within a row.
+    assert issues[["dataset", "row", "check"]].head(3).values.tolist() == [
+        ["catalog", 1, "missing_sku"],
+        ["catalog", 1, "row_contract"],
+        ["sales", 59, "row_contract"],
+    ]
+    counts = issue_counts(issues).set_index(["dataset", "check"])["issues"]
+    assert counts[("stock", "unknown_sku")] == 0 and counts[("sales", "unknown_sku")] == 30
+
+
+def test_folded_sales_spill_issues_and_keep_counts(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr("troel_ops_kit.state.COMPACT_MIN_ROWS", 1)
+    sales = pd.DataFrame(
+        {
+            "date": pd.to_datetime(["2026-02-20", "2026-02-21", "2026-02-20", "2026-02-22", "2026-02-20", "2026-02-21"]),
+            "sku": ["A", "B", "A", "X", "A", "C"],
+            "qty": [1, -2, 3, 4, 5, 6],
+        }
+    )
+    known = sku_dictionary(pd.DataFrame({"sku": ["A", "B", "C"]}))
+    fold = SalesFold()
+
+    fold_sales(fold, (sales.iloc[i : i + 2] for i in range(0, len(sales), 2)), None, known)
+
+    expected = issues_frame(validate_frame(sales, "sales", known))
+    pd.testing.assert_frame_equal(issues_frame(fold.issue_frames()).reset_index(drop=True), expected.reset_index(drop=True))
+    assert fold.issue_counts == {"duplicate_key": 3, "row_contract": 1, "unknown_sku": 1}
+    assert fold.spill is not None and fold.spill.stat().st_size == fold.spill_bytes
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import os
+import pathlib
+
+import pandas as pd
+
+from troel_ops_kit.demo import generate_demo
+from troel_ops_kit.pipeline import run
+from troel_ops_kit.watch import WatchSession
+
+COMPARED = ("kpi_coverage.csv", "kpi_dormant.csv", "kpi_stock_aging.csv", "kpi_abc.csv", "kpi_abc_xyz.csv", "alerts.csv")
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _settle(session: WatchSession, clock: _Clock):
+    'Poll until the debounce has elapsed: first sighting, then stable past debounce_s.'
+    assert session.poll() is None
+    clock.now += session.debounce_s
+    return session.poll()
+
+
+def _same_outputs(a: pathlib.Path, b: pathlib.Path) -> None:
+    for name in COMPARED:
+        assert (a / name).read_bytes() == (b / name).read_bytes(), name
+
+
+def test_stock_change_reuses_sales_stages_and_matches_full_run(tmp_path: pathlib.Path):
+    data_dir = tmp_path / "data"
+    generate_demo(data_dir, n_skus=50, days=90, seed=1)
+    paths = [str(data_dir / f"{name}.csv") for name in ("sales", "stock", "catalog")]
+    clock = _Clock()
+    session = WatchSession(*paths, out_dir=str(tmp_path / "watch"), debounce_s=1.0, clock=clock, incremental=True)
+    session.run()
+
+    os.utime(paths[2])  # touched, same content: no rerun
+    assert _settle(session, clock) is None and session.runs == 1
+
+    stock = pd.read_csv(paths[1])
+    stock.loc[stock.index[-5:], "on_hand_qty"] = 0
+    stock.to_csv(paths[1], index=False)
+    os.utime(paths[1], ns=(0, 0))
+    res = _settle(session, clock)
+
+    assert res is not None and session.runs == 2
+    assert set(session.memo.reused) == {"demand", "recency", "abc", "abc_xyz"}
+    run(*paths, out_dir=str(tmp_path / "full"))
+    _same_outputs(tmp_path / "watch", tmp_path / "full")
+
+
+def test_sales_append_recomputes_demand(tmp_path: pathlib.Path):
+    data_dir = tmp_path / "data"
+    generate_demo(data_dir, n_skus=50, days=90, seed=1)
+    paths = [str(data_dir / f"{name}.csv") for name in ("sales", "stock", "catalog")]
+    sales = pd.read_csv(paths[0])
+    sales.iloc[:-100].to_csv(paths[0], index=False)
+    clock = _Clock()
+    session = WatchSession(*paths, out_dir=str(tmp_path / "watch"), debounce_s=0.5, clock=clock, incremental=True)
+    session.run()
+
+    sales.iloc[-100:].to_csv(paths[0], mode="a", header=False, index=False)
+    assert _settle(session, clock) is not None
+    assert session.memo.reused == []
+    run(*paths, out_dir=str(tmp_path / "full"))
+    _same_outputs(tmp_path / "watch", tmp_path / "full")
+    assert not list((tmp_path / "watch").glob("*.tmp"))